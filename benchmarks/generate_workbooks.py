@@ -0,0 +1,204 @@
+# This Python file uses the following encoding: utf-8
+"""
+Synthetic road survey workbooks for benchmarks and fixtures.
+
+Every sheet follows the survey template: a title row, an empty row, the column groups with "NO" and
+"KOORDINAT AWAL" merged over their LATITUDE/LONGITUDE sub-headers, a REKAP column, coordinates written in the
+formats found in the field (decimal, comma-decimal, DMS and scaled integers) and photos anchored in the
+DOKUMENTASI, RAMBU and RPPJ columns.
+
+    python benchmarks/generate_workbooks.py <output folder> --files 4 --rows 500 --images 20
+
+A matching boundary shapefile (batas_wilayah.shp) is written next to the workbooks.
+"""
+import io
+import os
+import sys
+import random
+import argparse
+
+from openpyxl import Workbook
+from openpyxl.drawing.image import Image as XLImage
+from openpyxl.utils import get_column_letter
+from PIL import Image
+
+# Sheet layouts: name column, whether rows carry end coordinates and the extra photo column of the sheet type
+SHEET_TYPES = {
+    "RAMBU": {"name": "NAMA RAMBU", "end": False, "photo": "FOTO RAMBU", "values": ["Larangan", "Peringatan", "Perintah", "Petunjuk"]},
+    "MARKA": {"name": "JENIS MARKA", "end": True, "photo": None, "values": ["Garis Utuh", "Garis Putus", "Zebra Cross"]},
+    "PAGAR PENGAMAN": {"name": "TIPE PAGAR", "end": True, "photo": None, "values": ["Guardrail", "Beton"]},
+    "RPPJ": {"name": "JENIS TIANG", "end": False, "photo": "FOTO RPPJ", "values": ["Tiang F", "Tiang L", "Gantry"]},
+    "PJU": {"name": "JENIS LAMPU", "end": False, "photo": None, "values": ["LED", "SON-T", "Solar Cell"]},
+    "APILL": {"name": "JENIS APILL", "end": False, "photo": None, "values": ["3 Aspek", "2 Aspek", "Pedestrian"]},
+    "CERMIN TIKUNG": {"name": "DIAMETER", "end": False, "photo": None, "values": ["60 cm", "80 cm", "100 cm"]},
+    "ZOSS": {"name": "LOKASI", "end": False, "photo": None, "values": ["SD", "SMP", "SMA"]},
+    "WARNING LIGHT": {"name": "JENIS LAMPU", "end": False, "photo": None, "values": ["Flasher", "Solar"]},
+    "FAS PENYEBRANGAN": {"name": "JENIS FASILITAS", "end": False, "photo": None, "values": ["JPO", "Pelican Crossing"]},
+}
+
+DEFAULT_SHEETS = ("RAMBU", "MARKA", "PAGAR PENGAMAN", "RPPJ", "PJU", "APILL")
+
+# Survey area and the boundary grid laid over it, rows fall inside one of the cells
+AREA = (-7.1, 107.4, -6.7, 107.8) # min lat, min lon, max lat, max lon
+BOUNDARY_NAMES = ("Kota Bandung", "Kabupaten Bandung", "Kota Cimahi", "Kabupaten Bandung Barat")
+
+# Template rows, data starts below the header block
+FIRST_DATA_ROW = 5
+
+
+def format_coordinate(value, kind, style): # One coordinate in one of the formats found in survey sheets
+    if style == 0:
+        return value
+    if style == 1:
+        return str(value).replace(".", ",")
+    if style == 2:
+        degrees = abs(value)
+        whole = int(degrees)
+        minutes = int((degrees - whole) * 60)
+        seconds = ((degrees - whole) * 60 - minutes) * 60
+        hemisphere = ("S" if value < 0 else "N") if kind == "lat" else ("W" if value < 0 else "E")
+        return f"{whole}°{minutes}'{seconds:.2f}\"{hemisphere}"
+    return int(value * (1_000_000 if kind == "lat" else 10_000_000))
+
+
+def photo_bytes(rng, size, image_format): # A noisy photo-like image, so encoding costs are realistic
+    image = Image.effect_noise(size, 40 + rng.random() * 40).convert("RGB")
+    tint = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    buffer = io.BytesIO()
+    Image.blend(image, tint, 0.5).save(buffer, format=image_format)
+    buffer.seek(0)
+    return buffer
+
+
+def add_sheet(wb, sheet_name, rows, images, image_size, rng): # Write one survey sheet, returns its row and image counts
+    layout = SHEET_TYPES[sheet_name]
+    ws = wb.create_sheet(sheet_name)
+
+    # Header block as in the survey template: the title row the converter takes as header row, an empty row, the
+    # column groups with "KOORDINAT AWAL/AKHIR" merged over two columns, then their LATITUDE/LONGITUDE sub-headers.
+    # Column names come from the group and sub-header rows, the REKAP column is dropped by the converter.
+    groups = ["NO", layout["name"], "KOORDINAT AWAL", None]
+    sub_header = [None, None, "LATITUDE", "LONGITUDE"]
+    if layout["end"]:
+        groups += ["KOORDINAT AKHIR", None]
+        sub_header += ["LATITUDE", "LONGITUDE"]
+    photo_columns = ["DOKUMENTASI"] + ([layout["photo"]] if layout["photo"] else [])
+    groups += photo_columns + ["REKAP", "KONDISI", "KETERANGAN"]
+    sub_header += [None] * (len(photo_columns) + 3)
+
+    ws.append([f"DATA {sheet_name}"])
+    ws.append([None] * len(groups))
+    ws.append(groups)
+    ws.append(sub_header)
+    ws.merge_cells("C3:D3")
+    if layout["end"]:
+        ws.merge_cells("E3:F3")
+
+    min_lat, min_lon, max_lat, max_lon = AREA
+    for i in range(rows):
+        lat = round(min_lat + rng.random() * (max_lat - min_lat), 6)
+        lon = round(min_lon + rng.random() * (max_lon - min_lon), 6)
+        row = [i + 1, rng.choice(layout["values"]), format_coordinate(lat, "lat", i % 4), format_coordinate(lon, "lon", i % 4)]
+        if i % 50 == 49:
+            # A few DMS values typed with the letter O for a zero end up in the coordinate error log
+            row[2] = "7°O5'12.30\"S"
+        if layout["end"]:
+            # Some segments miss their end longitude, as in the field data
+            end_lon = None if i % 5 == 0 else format_coordinate(round(lon + 0.001, 6), "lon", (i + 1) % 4)
+            row += [format_coordinate(round(lat + 0.001, 6), "lat", (i + 1) % 4), end_lon]
+        row += [None] * len(photo_columns)
+        row += [1, "BAIK" if i % 3 else "RUSAK", f"Ruas {i % 17}" if i % 2 else None]
+        ws.append(row)
+
+    # Photos anchored in the data rows of every photo column, PNG and JPEG media mixed
+    image_count = 0
+    first_photo_column = groups.index("DOKUMENTASI") + 1
+    for offset in range(len(photo_columns)):
+        column_letter = get_column_letter(first_photo_column + offset)
+        for i in range(min(images, rows)):
+            image_format = "JPEG" if i % 2 else "PNG"
+            ws.add_image(XLImage(photo_bytes(rng, image_size, image_format)), f"{column_letter}{FIRST_DATA_ROW + i}")
+            image_count += 1
+
+    return rows, image_count
+
+
+def build_workbook(path, sheets=DEFAULT_SHEETS, rows=200, images=10, image_size=(320, 240), seed=1): # Write one survey workbook, returns its row and image counts
+    rng = random.Random(seed)
+    wb = Workbook()
+    wb.remove(wb.active)
+
+    total_rows = 0
+    total_images = 0
+    for sheet_name in sheets:
+        sheet_rows, sheet_images = add_sheet(wb, sheet_name, rows, images, image_size, rng)
+        total_rows += sheet_rows
+        total_images += sheet_images
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    wb.save(path)
+    return {"rows": total_rows, "images": total_images}
+
+
+def build_boundaries(path): # Boundary shapefile covering the survey area, one NAMOBJ per grid cell
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    min_lat, min_lon, max_lat, max_lon = AREA
+    mid_lat = (min_lat + max_lat) / 2
+    mid_lon = (min_lon + max_lon) / 2
+    cells = [
+        box(min_lon, mid_lat, mid_lon, max_lat),
+        box(mid_lon, mid_lat, max_lon, max_lat),
+        box(min_lon, min_lat, mid_lon, mid_lat),
+        box(mid_lon, min_lat, max_lon, mid_lat),
+    ]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    gpd.GeoDataFrame({"NAMOBJ": list(BOUNDARY_NAMES)}, geometry=cells, crs="EPSG:4326").to_file(path)
+    return path
+
+
+def build_dataset(folder, files=4, sheets=DEFAULT_SHEETS, rows=200, images=10, image_size=(320, 240), seed=1): # Folder of workbooks plus batas_wilayah.shp, returns paths and totals
+    workbooks = []
+    total_rows = 0
+    total_images = 0
+    for i in range(files):
+        path = os.path.join(folder, f"Survey_{i + 1:03d}.xlsx").replace(os.path.sep, '/')
+        counts = build_workbook(path, sheets, rows, images, image_size, seed + i)
+        workbooks.append(path)
+        total_rows += counts["rows"]
+        total_images += counts["images"]
+
+    boundaries = build_boundaries(os.path.join(folder, "boundaries", "batas_wilayah.shp").replace(os.path.sep, '/'))
+    return {"files": workbooks, "rows": total_rows, "images": total_images, "boundaries": boundaries}
+
+
+def parse_size(value): # "320x240" -> (320, 240)
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic road survey workbooks.")
+    parser.add_argument("output", help="Folder for the workbooks")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=200, help="Data rows per sheet")
+    parser.add_argument("--images", type=int, default=10, help="Photos per photo column of a sheet")
+    parser.add_argument("--image-size", type=parse_size, default=(320, 240), help="Photo size as WIDTHxHEIGHT (default: 320x240)")
+    parser.add_argument("--sheets", default=",".join(DEFAULT_SHEETS), help=f"Comma separated sheet types out of: {', '.join(SHEET_TYPES)}")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    sheets = [sheet.strip().upper() for sheet in args.sheets.split(",") if sheet.strip()]
+    unknown = [sheet for sheet in sheets if sheet not in SHEET_TYPES]
+    if unknown:
+        parser.error(f"unknown sheet type(s): {', '.join(unknown)}")
+
+    dataset = build_dataset(args.output, args.files, sheets, args.rows, args.images, args.image_size, args.seed)
+    print(f"{len(dataset['files'])} workbooks, {dataset['rows']} rows, {dataset['images']} images in {args.output}")
+    print(f"Boundaries: {dataset['boundaries']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
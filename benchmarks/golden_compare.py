@@ -0,0 +1,275 @@
+# This Python file uses the following encoding: utf-8
+"""
+Golden-output check: runs a reference and a candidate engine on the same corpus and compares what they wrote.
+
+    python benchmarks/golden_compare.py --reference HEAD~1 --generate small
+    python benchmarks/golden_compare.py --reference HEAD~3 --corpus <folder> --batas-wilayah <shp> --workers 4
+
+The reference is a git revision exported to a temporary folder, the candidate is the working tree (or --candidate
+<revision>). Both run Process.process_folder in their own interpreter on their own copy of the corpus, then
+- the file layout (Extract Shapefile/GeoJSON/Images, error logs, anything else written) is compared,
+- layers are compared feature by feature: columns, attributes (numbers within --tolerance) and geometries,
+- images by hash, media whose bytes differ but whose pixels match are reported as re-encoded,
+- Coordinate_Error_Log rows are compared cell by cell.
+Diffs are listed with both run times, the exit code is 1 when any diff was found.
+"""
+import io
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import tarfile
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Timestamps in output names, e.g. Coordinate_Error_Log_20240101_120000.xlsx
+TIMESTAMP = re.compile(r"\d{8}_\d{6}")
+
+# Bookkeeping files that only newer engines write, they are not outputs
+IGNORED = re.compile(r"(^|/)(Run_Report_TS\.json|run_manifest\.json|\.checkpoints/.*|Run Profiles/.*)$")
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+LAYER_EXTENSIONS = (".shp", ".geojson")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".emf", ".wmf")
+# Parts of a shapefile compared through the layer itself
+LAYER_SIDECARS = (".dbf", ".shx")
+
+RUNNER = """
+import sys, json, time, inspect
+sys.path.insert(0, {tree!r})
+from src.converter_service import Process
+options = {options!r}
+accepted = inspect.signature(Process.__init__).parameters
+process = Process({output!r}, {jenis_jalan!r}, {tipe_jalan!r}, **{{key: value for key, value in options.items() if key in accepted}})
+start = time.perf_counter()
+process.process_folder({input!r}, None, qml_folder={qml_folder!r}, batas_wilayah_path={batas_wilayah!r})
+print(json.dumps({{"seconds": time.perf_counter() - start}}))
+"""
+
+
+def export_revision(revision, destination): # Source tree of a git revision, unpacked into destination
+    archive = subprocess.run(["git", "-C", ROOT, "archive", "--format=tar", revision], capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(destination)
+    return destination
+
+
+def run_engine(tree, corpus, engine_dir, args, max_workers): # Convert a copy of the corpus with the engine in tree, returns the run time
+    input_folder = os.path.join(engine_dir, "input").replace(os.path.sep, '/')
+    output_folder = os.path.join(engine_dir, "output").replace(os.path.sep, '/')
+    os.makedirs(input_folder, exist_ok=True)
+    for name in sorted(os.listdir(corpus)):
+        if name.lower().endswith(EXCEL_EXTENSIONS):
+            shutil.copy2(os.path.join(corpus, name), input_folder)
+
+    code = RUNNER.format(
+        tree=tree,
+        options={"max_workers": max_workers},
+        output=output_folder,
+        jenis_jalan=args.jenis_jalan,
+        tipe_jalan=args.tipe_jalan,
+        input=input_folder,
+        qml_folder=os.path.join(tree, "assets", "qml_files").replace(os.path.sep, '/'),
+        batas_wilayah=args.batas_wilayah,
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=tree, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Engine in {tree} failed:\n{result.stderr[-4000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])["seconds"]
+
+
+def collect_files(engine_dir): # Written files by normalized path, the copied workbooks left out
+    input_folder = os.path.join(engine_dir, "input")
+    corpus_files = {name for name in os.listdir(input_folder) if name.lower().endswith(EXCEL_EXTENSIONS)}
+    files = {}
+    for folder, _, names in os.walk(engine_dir):
+        for name in names:
+            path = os.path.join(folder, name)
+            if folder == input_folder and name in corpus_files:
+                continue
+            key = TIMESTAMP.sub("TS", os.path.relpath(path, engine_dir).replace(os.path.sep, '/'))
+            if not IGNORED.search(key):
+                files[key] = path
+    return files
+
+
+def sha256(path):
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def normalize_frame(df, engine_dir): # Attribute table with the engine folder taken out of path values
+    import pandas as pd
+    engine_dir = os.path.abspath(engine_dir).replace(os.path.sep, '/')
+    df = pd.DataFrame(df).reset_index(drop=True)
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].map(lambda value: value.replace(engine_dir, "<engine>") if isinstance(value, str) else value)
+    return df
+
+
+def compare_frames(reference, candidate, tolerance): # Differing cells per column, numbers within tolerance
+    import numpy as np
+    import pandas as pd
+    diffs = []
+    if list(reference.columns) != list(candidate.columns):
+        return [f"columns {list(reference.columns)} != {list(candidate.columns)}"]
+    if len(reference) != len(candidate):
+        return [f"{len(reference)} rows != {len(candidate)} rows"]
+
+    for column in reference.columns:
+        a, b = reference[column], candidate[column]
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            same = np.isclose(a.astype(float), b.astype(float), rtol=0, atol=tolerance, equal_nan=True)
+        else:
+            same = (a.isna() & b.isna()) | (a.astype(str) == b.astype(str))
+        mismatched = np.flatnonzero(~np.asarray(same))
+        if len(mismatched):
+            row = mismatched[0]
+            diffs.append(f"column '{column}': {len(mismatched)} rows differ, first at row {row}: {a.iloc[row]!r} != {b.iloc[row]!r}")
+    return diffs
+
+
+def compare_layers(reference_path, candidate_path, reference_dir, candidate_dir, tolerance): # Features, attributes and geometries of two layers
+    import geopandas as gpd
+    reference = gpd.read_file(reference_path)
+    candidate = gpd.read_file(candidate_path)
+
+    diffs = compare_frames(
+        normalize_frame(reference.drop(columns=reference.geometry.name), reference_dir),
+        normalize_frame(candidate.drop(columns=candidate.geometry.name), candidate_dir),
+        tolerance,
+    )
+    if len(reference) == len(candidate):
+        mismatched = (~reference.geometry.geom_equals_exact(candidate.geometry, tolerance)).sum()
+        if mismatched:
+            diffs.append(f"geometry: {mismatched} features differ")
+    return diffs
+
+
+def compare_images(reference_path, candidate_path): # None when equal, "re-encoded" when only the bytes differ, else a diff
+    if sha256(reference_path) == sha256(candidate_path):
+        return None
+    from PIL import Image, ImageChops
+    with Image.open(reference_path) as reference, Image.open(candidate_path) as candidate:
+        if reference.size == candidate.size and ImageChops.difference(reference.convert("RGBA"), candidate.convert("RGBA")).getbbox() is None:
+            return "re-encoded"
+        return f"pixels differ ({reference.size} vs {candidate.size})"
+
+
+def compare_outputs(reference_dir, candidate_dir, tolerance=1e-9, strict_images=False): # Diffs between the files two engines wrote, plus counts per kind
+    import pandas as pd
+    reference_files = collect_files(reference_dir)
+    candidate_files = collect_files(candidate_dir)
+
+    diffs = []
+    for key in sorted(set(reference_files) - set(candidate_files)):
+        diffs.append(f"only in reference: {key}")
+    for key in sorted(set(candidate_files) - set(reference_files)):
+        diffs.append(f"only in candidate: {key}")
+
+    counts = {"layers": 0, "images": 0, "re-encoded images": 0, "error logs": 0, "other files": 0}
+    for key in sorted(set(reference_files) & set(candidate_files)):
+        reference_path, candidate_path = reference_files[key], candidate_files[key]
+        extension = os.path.splitext(key)[1].lower()
+
+        if extension in LAYER_EXTENSIONS:
+            counts["layers"] += 1
+            diffs.extend(f"{key}: {diff}" for diff in compare_layers(reference_path, candidate_path, reference_dir, candidate_dir, tolerance))
+        elif extension in IMAGE_EXTENSIONS:
+            counts["images"] += 1
+            result = compare_images(reference_path, candidate_path)
+            if result == "re-encoded":
+                counts["re-encoded images"] += 1
+                if strict_images:
+                    diffs.append(f"{key}: bytes differ, pixels match")
+            elif result is not None:
+                diffs.append(f"{key}: {result}")
+        elif extension in EXCEL_EXTENSIONS:
+            counts["error logs"] += 1
+            reference_rows = normalize_frame(pd.read_excel(reference_path), reference_dir)
+            candidate_rows = normalize_frame(pd.read_excel(candidate_path), candidate_dir)
+            diffs.extend(f"{key}: {diff}" for diff in compare_frames(reference_rows, candidate_rows, tolerance))
+        elif extension not in LAYER_SIDECARS:
+            counts["other files"] += 1
+            if sha256(reference_path) != sha256(candidate_path):
+                diffs.append(f"{key}: bytes differ")
+
+    return diffs, counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the outputs of a reference and a candidate engine on one corpus.")
+    parser.add_argument("--reference", default="HEAD", help="Git revision of the reference engine (default: HEAD)")
+    parser.add_argument("--candidate", help="Git revision of the candidate engine, the working tree by default")
+    corpus = parser.add_mutually_exclusive_group(required=True)
+    corpus.add_argument("--corpus", help="Folder of Excel workbooks")
+    corpus.add_argument("--generate", help="Generate a synthetic corpus of a benchmark scale (small, medium, large)")
+    parser.add_argument("--batas-wilayah", help="Boundary shapefile, the generated one with --generate")
+    parser.add_argument("--jenis-jalan", default="Jalan Prioritas")
+    parser.add_argument("--tipe-jalan", default="Eksisting")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes of the candidate (default: 1)")
+    parser.add_argument("--reference-workers", type=int, default=1, help="Worker processes of the reference (default: 1)")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="Allowed difference of coordinates and numbers (default: 1e-9)")
+    parser.add_argument("--strict-images", action="store_true", help="Count re-encoded images with identical pixels as diffs")
+    parser.add_argument("--work-dir", help="Keep the engines and their outputs in this folder instead of a temporary one")
+    parser.add_argument("--json", help="Write the diffs, counts and timings to this file")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="golden_compare_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        corpus_folder = args.corpus
+        if args.generate:
+            from run_benchmarks import SCALES
+            from generate_workbooks import build_dataset
+            if args.generate not in SCALES:
+                parser.error(f"unknown scale '{args.generate}', expected one of {', '.join(SCALES)}")
+            files, rows, images = SCALES[args.generate]
+            corpus_folder = os.path.join(work_dir, "corpus").replace(os.path.sep, '/')
+            dataset = build_dataset(corpus_folder, files, rows=rows, images=images)
+            args.batas_wilayah = args.batas_wilayah or dataset["boundaries"]
+        if args.batas_wilayah:
+            args.batas_wilayah = os.path.abspath(args.batas_wilayah).replace(os.path.sep, '/')
+
+        reference_tree = export_revision(args.reference, os.path.join(work_dir, "reference_engine"))
+        candidate_tree = export_revision(args.candidate, os.path.join(work_dir, "candidate_engine")) if args.candidate else ROOT
+
+        reference_dir = os.path.join(work_dir, "reference").replace(os.path.sep, '/')
+        candidate_dir = os.path.join(work_dir, "candidate").replace(os.path.sep, '/')
+        for folder in (reference_dir, candidate_dir):
+            shutil.rmtree(folder, ignore_errors=True)
+
+        reference_seconds = run_engine(reference_tree, corpus_folder, reference_dir, args, args.reference_workers)
+        candidate_seconds = run_engine(candidate_tree, corpus_folder, candidate_dir, args, args.workers)
+        diffs, counts = compare_outputs(reference_dir, candidate_dir, args.tolerance, args.strict_images)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    for diff in diffs:
+        print(f"❌ {diff}")
+    print(f"Compared {', '.join(f'{count} {kind}' for kind, count in counts.items())}: {len(diffs)} diffs")
+    print(f"{'engine':<12}{'seconds':>10}")
+    print(f"{'reference':<12}{reference_seconds:>10.2f}  ({args.reference}, {args.reference_workers} workers)")
+    print(f"{'candidate':<12}{candidate_seconds:>10.2f}  ({args.candidate or 'working tree'}, {args.workers} workers, {reference_seconds / candidate_seconds:.2f}x)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({
+                "reference": {"revision": args.reference, "workers": args.reference_workers, "seconds": round(reference_seconds, 3)},
+                "candidate": {"revision": args.candidate, "workers": args.workers, "seconds": round(candidate_seconds, 3)},
+                "counts": counts,
+                "diffs": diffs,
+            }, file, indent=4)
+    return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
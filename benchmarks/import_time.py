@@ -0,0 +1,65 @@
+# This Python file uses the following encoding: utf-8
+"""
+Import time of the modules loaded before the UI window appears, each measured in a fresh interpreter.
+
+    python benchmarks/import_time.py [--budget 0.1] [--repeat 5]
+
+Exits with 1 when a module takes longer than the budget (best of the repeats) or loads one of the heavy
+conversion libraries at import time.
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the GUI and the command line import before a conversion starts
+STARTUP_MODULES = ("src.converter_service", "cli")
+
+# Libraries that must only be imported once a conversion starts
+HEAVY_MODULES = ("pkg_resources", "pandas", "geopandas", "shapely", "openpyxl", "pyarrow", "numpy", "PIL")
+
+MEASURE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+def measure(module): # Seconds to import the module in a new interpreter and the heavy libraries it loaded
+    code = MEASURE.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed, _, heavy = result.stdout.strip().partition(" ")
+    return float(elapsed), [name for name in heavy.split(",") if name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the start-up import time budget.")
+    parser.add_argument("--budget", type=float, default=0.1, help="Seconds allowed per module (default: 0.1)")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module, the best run counts (default: 5)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in STARTUP_MODULES:
+        runs = [measure(module) for _ in range(args.repeat)]
+        best = min(elapsed for elapsed, _ in runs)
+        heavy = runs[0][1]
+
+        status = "ok"
+        if best > args.budget:
+            status = f"over budget ({args.budget:.3f}s)"
+            failed = True
+        if heavy:
+            status = f"imports {', '.join(heavy)}"
+            failed = True
+        print(f"{module}: {best * 1000:.1f} ms, {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# This Python file uses the following encoding: utf-8
+"""
+Conversion benchmarks on synthetic survey workbooks (see generate_workbooks.py).
+
+    python benchmarks/run_benchmarks.py --scales small,medium --workers 1,4 --output results.json
+
+For every scale a dataset is generated once, then Process.process_single_file is timed on its first workbook and
+Process.process_folder on the whole folder for each worker count. Rows/s and images/s are computed from the
+generated totals, the best of --repeat runs counts. Outputs go to a fresh folder per run.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_workbooks import build_dataset
+from src.converter_service import Process
+
+# files, data rows per sheet, photos per photo column
+SCALES = {
+    "small": (2, 100, 5),
+    "medium": (4, 1000, 25),
+    "large": (8, 5000, 100),
+}
+
+QML_FOLDER = os.path.join(ROOT, "assets", "qml_files").replace(os.path.sep, '/')
+
+
+def timed_run(run, output_folder, repeat): # Best wall time of repeat runs, each into an empty output folder
+    best = None
+    for _ in range(repeat):
+        shutil.rmtree(output_folder, ignore_errors=True)
+        start = time.perf_counter()
+        run(output_folder)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_scale(scale, work_dir, workers, repeat, seed): # Results of one scale, one entry per timed call
+    files, rows, images = SCALES[scale]
+    data_folder = os.path.join(work_dir, scale, "input").replace(os.path.sep, '/')
+    output_folder = os.path.join(work_dir, scale, "output").replace(os.path.sep, '/')
+
+    start = time.perf_counter()
+    dataset = build_dataset(data_folder, files, rows=rows, images=images, seed=seed)
+    print(f"[{scale}] generated {files} workbooks, {dataset['rows']} rows, {dataset['images']} images in {time.perf_counter() - start:.1f}s")
+
+    def single_file(output):
+        Process(output, "Jalan Prioritas", "Eksisting").process_single_file(dataset["files"][0], qml_folder=QML_FOLDER, batas_wilayah_path=dataset["boundaries"])
+
+    results = []
+    cases = [("process_single_file", 1, single_file, dataset["rows"] / files, dataset["images"] / files)]
+    for max_workers in workers:
+        def folder(output, max_workers=max_workers):
+            Process(output, "Jalan Prioritas", "Eksisting", max_workers=max_workers).process_folder(data_folder, qml_folder=QML_FOLDER, batas_wilayah_path=dataset["boundaries"])
+        cases.append(("process_folder", max_workers, folder, dataset["rows"], dataset["images"]))
+
+    for name, max_workers, run, case_rows, case_images in cases:
+        seconds = timed_run(run, output_folder, repeat)
+        result = {
+            "scale": scale,
+            "call": name,
+            "workers": max_workers,
+            "seconds": round(seconds, 3),
+            "rows": int(case_rows),
+            "images": int(case_images),
+            "rows_per_second": round(case_rows / seconds, 1),
+            "images_per_second": round(case_images / seconds, 1),
+        }
+        results.append(result)
+        print(f"[{scale}] {name} workers={max_workers}: {seconds:.2f}s, {result['rows_per_second']} rows/s, {result['images_per_second']} images/s")
+
+    shutil.rmtree(output_folder, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time Process.process_single_file and process_folder on synthetic workbooks.")
+    parser.add_argument("--scales", default="small,medium", help=f"Comma separated scales out of: {', '.join(SCALES)} (default: small,medium)")
+    parser.add_argument("--workers", default="1", help="Comma separated worker counts for process_folder (default: 1)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, the best counts (default: 3)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--work-dir", help="Folder for the generated data, a temporary folder by default")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    workers = [int(count) for count in args.workers.split(",") if count.strip()]
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="conversion_benchmark_")
+    results = []
+    try:
+        for scale in scales:
+            results.extend(benchmark_scale(scale, work_dir, workers, args.repeat, args.seed))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=4)
+        print(f"Results saved to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
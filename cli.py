@@ -0,0 +1,109 @@
+# This Python file uses the following encoding: utf-8
+"""
+Command-line runner for batch servers, converts an Excel file or a folder of Excel files without the Qt UI.
+
+    python cli.py <input file or folder> <output folder> --jenis-jalan "Jalan Prioritas" --tipe-jalan Eksisting
+
+Exits with 0 when every file was converted, 1 when a file failed or the run was aborted.
+"""
+import os
+import sys
+import argparse
+
+from src.converter_service import Process
+from src.output_formats import OUTPUT_FORMATS, DEFAULT_FORMATS, IMAGE_MODES
+
+JENIS_JALAN = ("Jalan Prioritas", "Jalan Non-Prioritas")
+TIPE_JALAN = ("Eksisting", "Kebutuhan")
+
+
+def parse_formats(value): # Comma separated output formats, e.g. "shapefile,geojson"
+    formats = [output_format.strip().lower() for output_format in value.split(",") if output_format.strip()]
+    unknown = [output_format for output_format in formats if output_format not in OUTPUT_FORMATS]
+    if not formats or unknown:
+        raise argparse.ArgumentTypeError(f"expected a comma separated subset of {', '.join(OUTPUT_FORMATS)}")
+    return formats
+
+
+def parse_workers(value): # Worker process count, 0 uses every core
+    workers = int(value)
+    if workers < 0:
+        raise argparse.ArgumentTypeError("worker count can not be negative")
+    return workers or None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Convert road survey Excel files to Shapefile, GeoJSON, GeoPackage, GeoParquet and images.")
+    parser.add_argument("input", help="Excel file or folder of Excel files")
+    parser.add_argument("output", help="Output folder")
+    parser.add_argument("--jenis-jalan", choices=JENIS_JALAN, default=JENIS_JALAN[0])
+    parser.add_argument("--tipe-jalan", choices=TIPE_JALAN, default=TIPE_JALAN[0])
+    parser.add_argument("--batas-wilayah", help="Boundary shapefile joined to the outputs")
+    parser.add_argument("--qml-folder", help="Folder of the QML styles copied next to the shapefiles")
+    parser.add_argument("--workers", type=parse_workers, default=1, help="Worker processes for a folder, 0 uses every core (default: 1)")
+    parser.add_argument("--formats", type=parse_formats, default=list(DEFAULT_FORMATS), help=f"Comma separated outputs out of {', '.join(OUTPUT_FORMATS)} (default: {','.join(DEFAULT_FORMATS)})")
+    parser.add_argument("--image-mode", choices=IMAGE_MODES, default="png")
+    parser.add_argument("--compact-geojson", action="store_true", help="Write GeoJSON without indentation")
+    parser.add_argument("--precision", type=int, help="Decimals kept in GeoJSON coordinates")
+    parser.add_argument("--boundary-cache-dir", help="Folder for the cached boundary layer")
+    parser.add_argument("--incremental", action="store_true", help="Skip files unchanged since the last run into the output folder")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted or partly failed folder run")
+    parser.add_argument("--profile", action="store_true", help="Write a cProfile dump per file to <output>/Run Profiles")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if not os.path.exists(args.input):
+        print(f"❌ Input not found: {args.input}", file=sys.stderr)
+        return 1
+    if args.batas_wilayah and not os.path.exists(args.batas_wilayah):
+        print(f"❌ Boundary shapefile not found: {args.batas_wilayah}", file=sys.stderr)
+        return 1
+
+    def log_callback(message):
+        print(message, flush=True)
+
+    processor = Process(
+        args.output,
+        args.jenis_jalan,
+        args.tipe_jalan,
+        max_workers=args.workers,
+        boundary_cache_dir=args.boundary_cache_dir,
+        geojson_pretty=not args.compact_geojson,
+        geojson_precision=args.precision,
+        image_mode=args.image_mode,
+        incremental=args.incremental,
+        formats=args.formats,
+        profile=args.profile
+    )
+
+    try:
+        if os.path.isdir(args.input):
+            failed_files = processor.process_folder(
+                args.input,
+                log_callback,
+                qml_folder=args.qml_folder,
+                batas_wilayah_path=args.batas_wilayah,
+                resume=args.resume
+            )
+        else:
+            failed_files = processor.process_single_file(
+                args.input,
+                log_callback,
+                qml_folder=args.qml_folder,
+                batas_wilayah_path=args.batas_wilayah
+            )
+    except Exception as e:
+        print(f"❌ Conversion aborted: {str(e)}", file=sys.stderr)
+        return 1
+
+    if failed_files:
+        print(f"❌ {len(failed_files)} file(s) could not be converted", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
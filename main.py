@@ -5,13 +5,18 @@ from PyQt6.QtCore import QThread, pyqtSignal
 from ui.ui_main import Ui_Main
 
 from src.converter_service import Process
+from src.log_sink import BufferedLogSink
+from src.cancellation import CancellationToken
+
+# Lines kept in the log view, older ones are dropped as new ones arrive
+MAX_LOG_LINES = 5000
 
 class ConversionThread(QThread):
     progress = pyqtSignal(int)
     log_message = pyqtSignal(str)
     finished = pyqtSignal()
 
-    def __init__(self, file_path=None, directory_path=None, out_directory_path=None, qml_folder=None, batas_wilayah_path=None, jenis_jalan = None, tipe_jalan = None) -> None:
+    def __init__(self, file_path=None, directory_path=None, out_directory_path=None, qml_folder=None, batas_wilayah_path=None, jenis_jalan = None, tipe_jalan = None, max_workers = 1) -> None:
         super().__init__()
         self.file_path = file_path
         self.directory_path = directory_path
@@ -20,13 +25,19 @@ class ConversionThread(QThread):
         self.tipe_jalan = tipe_jalan
         self.qml_folder = qml_folder
         self.batas_wilayah_path = batas_wilayah_path
+        self.max_workers = max_workers
         self.running = True
+        # Worker messages reach the UI in batches, a run with thousands of images would otherwise flood the event loop
+        self.log_sink = BufferedLogSink(self.log_message.emit)
+        # Checked by the converter between files, sheets and images
+        self.cancel_token = CancellationToken()
 
     def run(self):
-        processor = Process(self.out_directory_path, self.jenis_jalan, self.tipe_jalan, self.progress.emit)
+        # Summary lines only, per-image and per-layer messages stay out of the log view
+        processor = Process(self.out_directory_path, self.jenis_jalan, self.tipe_jalan, self.progress.emit, max_workers=self.max_workers, log_details=False, cancel_token=self.cancel_token)
         try:
             if self.file_path:
-                self.log_message.emit(f"Processing file: {self.file_path}")
+                self.log_sink(f"Processing file: {self.file_path}")
                 processor.process_single_file(
                     self.file_path, 
                     self.log_callback,
@@ -34,28 +45,32 @@ class ConversionThread(QThread):
                     batas_wilayah_path=self.batas_wilayah_path
                 )
             elif self.directory_path:
-                self.log_message.emit(f"Processing directory: {self.directory_path}")
+                self.log_sink(f"Processing directory: {self.directory_path}")
                 processor.process_folder(
                     self.directory_path, 
                     self.log_callback,
                     qml_folder=self.qml_folder,
                     batas_wilayah_path=self.batas_wilayah_path
                 )
-            self.log_message.emit("Conversion completed!")
+            # A cancelled run returns normally, it did not complete
+            if not self.cancel_token.cancelled:
+                self.log_sink("Conversion completed!")
         except Exception as e:
-            self.log_message.emit(f"Error: {str(e)}")
+            self.log_sink(f"Error: {str(e)}")
             import traceback
-            self.log_message.emit(traceback.format_exc())
+            self.log_sink(traceback.format_exc())
         finally:
+            self.log_sink.close()
             self.finished.emit()
 
     def log_callback(self, message):
-        self.log_message.emit(message)
+        self.log_sink(message)
 
     def stop(self):
         self.running = False
+        # The run stops at its next checkpoint and emits finished, the GUI thread does not block on it
+        self.cancel_token.cancel()
         self.quit()
-        self.wait()
 
 class Main(QMainWindow):
     def __init__(self, parent=None):
@@ -66,6 +81,10 @@ class Main(QMainWindow):
         # Init progressBar value
         self.ui.progressBar.setValue(0)
 
+        # The log view keeps the latest lines only and no undo history, long runs stay responsive
+        self.ui.textLog.document().setMaximumBlockCount(MAX_LOG_LINES)
+        self.ui.textLog.setUndoRedoEnabled(False)
+
         # Connect buttons to functions
         self.ui.btnSingleBrowsePath.clicked.connect(self.browse_single_file)
         self.ui.btnBulkBrowseDir.clicked.connect(self.browse_directory)
@@ -81,6 +100,9 @@ class Main(QMainWindow):
         # Optional parameters - set to None by default
         self.qml_folder = None
         self.batas_wilayah_path = None
+
+        # Worker processes used for folder conversion, None uses every core
+        self.max_workers = 1
         
         # We'll use the existing UI without adding new buttons for now
 
@@ -166,7 +188,8 @@ class Main(QMainWindow):
             qml_folder=self.qml_folder,
             batas_wilayah_path=self.batas_wilayah_path,
             jenis_jalan=jenis_jalan if jenis_jalan else None,
-            tipe_jalan=tipe_jalan if tipe_jalan else None
+            tipe_jalan=tipe_jalan if tipe_jalan else None,
+            max_workers=self.max_workers
         )
         self.conversion_thread.progress.connect(self.ui.progressBar.setValue)
         self.conversion_thread.log_message.connect(self.ui.textLog.append)
@@ -176,12 +199,15 @@ class Main(QMainWindow):
     def cancel_conversion(self):
         if self.conversion_thread:
             self.conversion_thread.stop()
-            self.ui.textLog.append("Conversion canceled.")
-            self.ui.btnConvert.setEnabled(True)
+            self.ui.textLog.append("Canceling, stopping after the current layer or image...")
+            # Convert is enabled again by conversion_finished, once the thread is done
             self.ui.btnCancel.setEnabled(False)
 
     def conversion_finished(self):
-        self.ui.textLog.append("Conversion finished.")
+        if self.conversion_thread and self.conversion_thread.cancel_token.cancelled:
+            self.ui.textLog.append("Conversion canceled.")
+        else:
+            self.ui.textLog.append("Conversion finished.")
         self.ui.btnConvert.setEnabled(True)
         self.ui.btnCancel.setEnabled(False)
         self.ui.progressBar.setValue(0)
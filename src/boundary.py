@@ -0,0 +1,97 @@
+import os
+import pickle
+import hashlib
+import geopandas as gpd
+
+# Bump when the pickled layout changes so stale cache files are ignored
+CACHE_VERSION = 1
+
+# Boundaries already loaded in this process, keyed like the disk cache
+_loaded = {}
+
+
+class BoundaryProvider:
+    """
+    City/regency boundaries (Batas_Kota_Kabupaten_JABAR) prepared once for every spatial join of a run.
+    The layer is reduced to NAMOBJ + geometry and reprojected to EPSG:4326 once, and its spatial index is kept
+    with it, so sheets only pay for the STRtree query.
+    """
+    def __init__(self, boundaries) -> None:
+        if boundaries.crs is None:
+            boundaries = boundaries.set_crs("EPSG:4326")
+        elif boundaries.crs != "EPSG:4326":
+            boundaries = boundaries.to_crs("EPSG:4326")
+
+        self.boundaries = boundaries[['geometry', 'NAMOBJ']]
+
+    @property
+    def crs(self):
+        return self.boundaries.crs
+
+    @property
+    def sindex(self): # STRtree built on first use and reused by every join
+        return self.boundaries.sindex
+
+    def join(self, gdf): # Left join of the sheet features with the region they intersect, same result as gpd.sjoin
+        if gdf.crs != self.crs:
+            gdf = gdf.to_crs(self.crs)
+
+        # sjoin queries the right frame's index, which is cached on self.boundaries
+        self.sindex
+        return gpd.sjoin(gdf, self.boundaries, how="left", predicate="intersects")
+
+    def __getstate__(self):
+        return {"boundaries": self.boundaries}
+
+    def __setstate__(self, state):
+        self.boundaries = state["boundaries"]
+
+    @classmethod
+    def load(cls, batas_wilayah_path, cache_dir=None): # Load the boundary shapefile, reusing the in-memory or on-disk cache when the source is unchanged
+        key = cls.source_key(batas_wilayah_path)
+        provider = _loaded.get(key)
+        if provider is not None:
+            return provider
+
+        cache_path = None
+        if cache_dir:
+            digest = hashlib.sha1(repr((CACHE_VERSION,) + key).encode("utf-8")).hexdigest()[:16]
+            stem = os.path.splitext(os.path.basename(batas_wilayah_path))[0]
+            cache_path = os.path.join(cache_dir, f"{stem}_{digest}.pkl").replace(os.path.sep, '/')
+
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "rb") as file:
+                    provider = pickle.load(file)
+            except Exception:
+                provider = None
+
+        if provider is None:
+            provider = cls(gpd.read_file(batas_wilayah_path))
+
+            if cache_path:
+                try:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+                    with open(temp_path, "wb") as file:
+                        pickle.dump(provider, file, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(temp_path, cache_path)
+                except OSError:
+                    pass
+
+        _loaded.clear()
+        _loaded[key] = provider
+        return provider
+
+    @staticmethod
+    def source_key(batas_wilayah_path): # Absolute path plus mtime and size of the .shp and its .dbf
+        batas_wilayah_path = os.path.abspath(batas_wilayah_path)
+        base = os.path.splitext(batas_wilayah_path)[0]
+        key = [batas_wilayah_path]
+
+        # Other vector formats have no .dbf, their own file stamp is used instead
+        for part_path in dict.fromkeys([batas_wilayah_path, base + ".shp", base + ".dbf"]):
+            if os.path.exists(part_path):
+                stat = os.stat(part_path)
+                key.append((os.path.basename(part_path), stat.st_mtime_ns, stat.st_size))
+        return tuple(key)
@@ -0,0 +1,31 @@
+import threading
+
+
+class ConversionCancelled(BaseException):
+    """
+    Raised at the next checkpoint once a run has been cancelled.
+    A BaseException like KeyboardInterrupt, so the per-sheet and per-file `except Exception` handlers let it through
+    instead of logging it as a conversion error.
+    """
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation flag shared by the UI and the converter.
+    The converter calls check() between files, sheets and images, so a run stops at the next boundary and never
+    in the middle of writing a layer or an image. Backed by a threading.Event, pool workers get one wrapping a
+    multiprocessing Event.
+    """
+    def __init__(self, event=None) -> None:
+        self.event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def check(self): # Stop the run here if it has been cancelled
+        if self.event.is_set():
+            raise ConversionCancelled()
@@ -0,0 +1,74 @@
+import os
+import json
+import shutil
+import hashlib
+from src.run_manifest import json_value
+
+CHECKPOINT_DIR = ".checkpoints"
+
+# Stages of convert_excel_file, in the order they run
+STAGES = ("vectors", "images")
+
+
+class CheckpointStore:
+    """
+    Per-file, per-stage completion markers of a folder run, kept in <output folder>/.checkpoints until a batch ends without failures.
+    Each marker is written atomically once a stage of a file is done, so a restarted run with resume=True
+    continues at the first incomplete file/stage. Markers of a file edited since are ignored, and a run with
+    other options starts over.
+    """
+    def __init__(self, output_folder, options) -> None:
+        self.folder = os.path.join(output_folder, CHECKPOINT_DIR).replace(os.path.sep, '/')
+        self.options = options
+
+    def start(self, resume=False): # Keep the markers of an interrupted run with the same options when resuming, returns True if they are kept
+        run_path = os.path.join(self.folder, "run.json").replace(os.path.sep, '/')
+        if resume:
+            try:
+                with open(run_path, "r", encoding="utf-8") as file:
+                    if json.load(file).get("options") == self.options:
+                        return True
+            except (OSError, ValueError):
+                pass
+
+        self.clear()
+        self._write_json(run_path, {"options": self.options})
+        return False
+
+    def clear(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def _marker_path(self, file_path, stage):
+        file_path = os.path.abspath(file_path)
+        digest = hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.folder, f"{os.path.basename(file_path)}_{digest}.{stage}.json").replace(os.path.sep, '/')
+
+    def _stamp(self, file_path): # Size and modification time of the input, a marker only holds for the file it was written for
+        stat = os.stat(file_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def completed(self, file_path, stage): # Data stored with the stage marker, None if the stage still has to run
+        try:
+            with open(self._marker_path(file_path, stage), "r", encoding="utf-8") as file:
+                marker = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if marker.get("stamp") != self._stamp(file_path):
+            return None
+        return marker.get("data", {})
+
+    def mark(self, file_path, stage, error_logs=None, outputs=None): # Record a finished stage with the errors and files it produced
+        self._write_json(self._marker_path(file_path, stage), {
+            "stamp": self._stamp(file_path),
+            "data": {
+                "error_logs": [{key: json_value(value) for key, value in error.items()} for error in error_logs or []],
+                "outputs": list(outputs or []),
+            },
+        })
+
+    def _write_json(self, path, data): # Temporary file then rename, a crash never leaves a half written marker
+        os.makedirs(self.folder, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(temp_path, path)
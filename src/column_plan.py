@@ -0,0 +1,126 @@
+import re
+import pandas as pd
+
+# Leftover "None" header parts, dropped or stripped from the final property names
+NONE_COLUMN = re.compile(r"^None$|None_")
+NONE_WORD = re.compile(r"\sNone\b")
+
+
+class ColumnPlan:
+    """
+    Column layout of one sheet template, compiled once from its header block and applied to every sheet sharing it.
+    Holds the raw columns kept, their normalized names, the coordinate column roles and the final property names,
+    so a sheet is normalized with one select/rename instead of the REKAP passes, the header merge loop and the
+    name cleaning.
+    """
+    def __init__(self, positions, columns, roles, property_positions, property_names) -> None:
+        self.positions = positions # Raw sheet columns kept, in order
+        self.columns = columns # Normalized (lower case) names of the kept columns, used to find coordinates and sheet types
+        self.roles = roles # start_lat/start_lon/end_lat/end_lon normalized column names, None when missing
+        self.property_positions = property_positions # Columns of the normalized frame (geometry included) that become the output
+        self.property_names = property_names # Final names of those columns
+
+    @property
+    def has_start_coords(self):
+        return self.roles["start_lat"] is not None and self.roles["start_lon"] is not None
+
+    @property
+    def has_end_coords(self):
+        return self.roles["end_lat"] is not None and self.roles["end_lon"] is not None
+
+    @staticmethod
+    def fingerprint(df, header_index, non_empty): # Everything the plan depends on: header row, the two merged header rows and the empty columns
+        header_row, first_row, second_row = [df.iloc[i].astype(str) for i in (header_index, header_index + 2, header_index + 3)]
+        return (
+            header_index,
+            tuple(header_row.str.strip()),
+            tuple(first_row.replace('None', '').replace('nan', '')),
+            tuple(second_row.replace('None', '').replace('nan', '')),
+            tuple(non_empty),
+        )
+
+    @classmethod
+    def compile(cls, fingerprint, converter): # Resolve the plan of a template, converter provides the naming helpers
+        _, header_row, first_row, second_row, non_empty = fingerprint
+
+        # Remove empty columns, then first pass of REKAP filtering
+        positions = [i for i, keep in enumerate(non_empty) if keep and "rekap" not in header_row[i].lower()]
+
+        # Smart merging to avoid duplication
+        merged_header = []
+        for i in positions:
+            a = first_row[i].strip()
+            b = second_row[i].strip()
+
+            # Skip columns with "REKAP" in the name
+            if "rekap" in a.lower() or "rekap" in b.lower():
+                merged_header.append("TO_BE_REMOVED")  # Mark for removal
+                continue
+
+            if not a and not b:
+                merged_header.append("Column_" + str(len(merged_header)))
+            elif not a:
+                merged_header.append(b)
+            elif not b:
+                merged_header.append(a)
+            else:
+                if a.lower() in b.lower():
+                    merged_header.append(b)
+                elif b.lower() in a.lower():
+                    merged_header.append(a)
+                else:
+                    merged_header.append(f"{a} {b}")
+
+        # Ensure column names are unique, drop the columns marked for removal and the REKAP ones (second pass)
+        columns = []
+        kept_positions = []
+        for i, name in zip(positions, converter.unique_column_names(merged_header)):
+            if "TO_BE_REMOVED" in name or "rekap" in name.lower():
+                continue
+            # Normalize column names for consistent detection (third REKAP pass on the normalized name)
+            name = name.lower().strip()
+            if "rekap" in name:
+                continue
+            columns.append(name)
+            kept_positions.append(i)
+
+        # Find all coordinate columns using the improved function
+        columns_only = pd.DataFrame(columns=columns)
+        roles = {
+            "start_lat": converter.find_coordinate_columns(columns_only, 'start', 'lat'),
+            "start_lon": converter.find_coordinate_columns(columns_only, 'start', 'lon'),
+            "end_lat": converter.find_coordinate_columns(columns_only, 'end', 'lat'),
+            "end_lon": converter.find_coordinate_columns(columns_only, 'end', 'lon'),
+        }
+
+        plan = cls(kept_positions, columns, roles, [], [])
+        plan.property_positions, plan.property_names = plan.resolve_properties(converter)
+        return plan
+
+    def resolve_properties(self, converter): # Output columns and their final names, the coordinate columns are left out
+        # Coordinate columns are excluded from properties, the geometry column is appended after the sheet columns
+        exclude_cols = [self.roles["start_lat"], self.roles["start_lon"]]
+        if self.has_end_coords:
+            exclude_cols.extend([self.roles["end_lat"], self.roles["end_lon"]])
+        exclude_cols.append("geometry")
+
+        frame_columns = self.columns + ([] if "geometry" in self.columns else ["geometry"])
+        properties_cols = [col for col in frame_columns if col not in exclude_cols]
+
+        # Label selection semantics: a duplicated name selects every column carrying it
+        selected = [i for label in properties_cols + ["geometry"] for i, col in enumerate(frame_columns) if col == label]
+        names = converter.clean_column_names([frame_columns[i] for i in selected])
+
+        property_positions = []
+        property_names = []
+        for i, name in zip(selected, names):
+            if "rekap" in name.lower() or NONE_COLUMN.match(name):
+                continue
+            property_positions.append(i)
+            property_names.append(NONE_WORD.sub("", name).strip())
+        return property_positions, property_names
+
+    def select(self, df, header_index): # Data rows of the kept columns under their normalized names
+        df = df.iloc[header_index + 4:, self.positions].reset_index(drop=True)
+        df.columns = self.columns
+        return df
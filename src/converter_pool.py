@@ -0,0 +1,174 @@
+import os
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from src.converter_worker import ExcelConverter
+from src.geopackage_writer import GeoPackageWriter
+from src.cancellation import CancellationToken, ConversionCancelled
+
+# State of the current pool process, filled once by _init_worker
+_worker_state = {}
+
+
+def _init_worker(output_base_folder, message_queue, batas_wilayah, qml_folder, jenis_jalan, tipe_jalan, checkpoints, converter_options): # Runs once in every pool process and builds its own ExcelConverter
+    def log_callback(message):
+        message_queue.put(f"[{_worker_state.get('file_name', os.getpid())}] {message}")
+
+    converter = ExcelConverter(output_base_folder, log_callback, **converter_options)
+
+    _worker_state.update({
+        "converter": converter,
+        "output_base_folder": output_base_folder,
+        "batas_wilayah": batas_wilayah,
+        "qml_folder": qml_folder,
+        "jenis_jalan": jenis_jalan,
+        "tipe_jalan": tipe_jalan,
+        "checkpoints": checkpoints,
+    })
+
+
+def _convert_file(file_path): # Convert one Excel file inside a pool process, returns its coordinate error logs, written files, stage timings and failed output count
+    _worker_state["file_name"] = os.path.basename(file_path)
+    converter = _worker_state["converter"]
+    file_errors = converter.convert_excel_file(
+        file_path,
+        _worker_state["output_base_folder"],
+        _worker_state["batas_wilayah"],
+        _worker_state["qml_folder"],
+        _worker_state["jenis_jalan"],
+        _worker_state["tipe_jalan"],
+        _worker_state["checkpoints"]
+    )
+    return file_errors, converter.output_files, converter.timings.files.pop(_worker_state["file_name"], None), converter.output_errors
+
+
+def _relay_messages(message_queue, converter): # Forward worker log messages to the parent log callback
+    while True:
+        try:
+            converter._log(message_queue.get_nowait())
+        except queue.Empty:
+            return
+
+
+def process_excel_folder_parallel(converter, input_folder, output_base_folder, qml_folder=None, batas_wilayah_path=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting", max_workers=None, incremental=False, resume=False):
+    """
+    Spreads the Excel files of a folder over a ProcessPoolExecutor, one file per task.
+    converter is the parent-side ExcelConverter: it relays worker logs, reports progress and writes the merged Coordinate_Error_Log.
+    With incremental=True the parent also keeps the run manifest and only submits new or changed files.
+    Workers write the checkpoint markers of the stages they finish, resume=True honors those of an interrupted run.
+    Cancelling converter.cancel_token stops the workers at their next sheet or image and drops the queued files.
+    """
+    # Boundaries are loaded and reprojected once in the parent and shipped to every worker at start-up
+    batas_wilayah = converter.load_batas_wilayah(batas_wilayah_path)
+    qml_folder = converter.resolve_qml_folder(qml_folder)
+
+    excel_files = converter.list_excel_files(input_folder)
+    total_files = len(excel_files)
+    if total_files == 0:
+        converter._log("⚠️ No Excel files found in the specified folder.")
+        converter._update_progress(100)
+        return
+
+    error_logs_by_file = {}
+    failed_files = []
+    completed = 0
+
+    # Unchanged files keep their outputs and error logs from the manifest
+    manifest = None
+    digests = {}
+    submitted_files = excel_files
+    if incremental:
+        manifest = converter.load_run_manifest(output_base_folder, batas_wilayah_path, qml_folder, jenis_jalan, tipe_jalan)
+        digests, skipped = converter.split_unchanged_files(manifest, excel_files)
+        error_logs_by_file.update(skipped)
+        completed = len(skipped)
+        submitted_files = [file_path for file_path in excel_files if file_path in digests]
+
+    # Every finished stage is marked, so an interrupted run can be resumed
+    checkpoints = converter.start_checkpoints(output_base_folder, batas_wilayah_path, qml_folder, jenis_jalan, tipe_jalan, resume)
+
+    # Nothing to start a pool for when every file is unchanged
+    if submitted_files:
+        max_workers = min(max_workers or os.cpu_count() or 1, len(submitted_files))
+        converter._log(f"Converting {len(submitted_files)} files with {max_workers} worker processes")
+
+        with multiprocessing.Manager() as manager:
+            message_queue = manager.Queue()
+            # Workers get the same output and log settings as the parent converter, detail lines are dropped before the queue
+            # The parent token lives in this process only, workers share a multiprocessing Event set once it is cancelled
+            worker_token = CancellationToken(multiprocessing.Event())
+            # Workers append to the same GeoPackages, a shared lock lets one of them write at a time
+            geopackage_writer = GeoPackageWriter(manager.Lock())
+            # Workers also align the schemas of each other's GeoParquet files, one of them at a time
+            geoparquet_lock = manager.Lock()
+            converter_options = {"geojson_writer": converter.geojson_writer, "image_mode": converter.image_mode, "formats": converter.formats, "log_details": converter.log_details, "cancel_token": worker_token, "profile": converter.profile, "geopackage_writer": geopackage_writer, "geoparquet_lock": geoparquet_lock}
+            initargs = (output_base_folder, message_queue, batas_wilayah, qml_folder, jenis_jalan, tipe_jalan, checkpoints, converter_options)
+
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=initargs) as executor:
+                futures = {executor.submit(_convert_file, file_path): file_path for file_path in submitted_files}
+                pending = set(futures)
+
+                while pending:
+                    done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                    _relay_messages(message_queue, converter)
+
+                    if converter.cancel_token.cancelled and not worker_token.cancelled:
+                        worker_token.cancel()
+                        for future in pending:
+                            future.cancel()
+
+                    for future in done:
+                        # Files dropped or stopped by a cancel are neither done nor failed
+                        if future.cancelled() or isinstance(future.exception(), ConversionCancelled):
+                            continue
+
+                        completed += 1
+                        file_name = os.path.basename(futures[future])
+                        try:
+                            file_errors, output_files, file_timings, output_errors = future.result()
+                            converter.timings.add_file(file_name, file_timings)
+                            error_logs_by_file[futures[future]] = file_errors
+                            if file_errors:
+                                converter._log(f"⚠️ Found {len(file_errors)} coordinate errors in {file_name}")
+                            # A file with failed outputs goes down the failed path, the manifest forgets it
+                            converter.check_output_errors(output_errors)
+                            converter._log(f"✅ [{completed}/{total_files}] Completed processing: {file_name}")
+                            if manifest is not None:
+                                manifest.record(futures[future], digests[futures[future]], output_files, file_errors)
+                                manifest.save()
+                        except Exception as e:
+                            failed_files.append(file_name)
+                            converter._log(f"❌ Error processing {file_name}: {str(e)}")
+                            if manifest is not None:
+                                manifest.forget(futures[future])
+                                manifest.save()
+
+                        # Update progress dynamically
+                        converter._update_progress(int(completed * 100 / total_files))
+
+            _relay_messages(message_queue, converter)
+
+    # A cancelled batch keeps its checkpoints, so it can be resumed
+    converter.cancel_token.check()
+
+    # The batch went through, the next run starts fresh, after failures a resume only redoes the failed files
+    if not failed_files:
+        checkpoints.clear()
+
+    converter.failed_files.extend(failed_files)
+    if failed_files:
+        converter._log("\nFiles that could not be processed:")
+        for file in failed_files:
+            converter._log(f"- {file}")
+
+    # One error log for the whole batch, in the same file order as a sequential run
+    all_error_logs = []
+    for file_path in excel_files:
+        all_error_logs.extend(error_logs_by_file.get(file_path, []))
+    if all_error_logs:
+        converter.log_coordinate_errors(all_error_logs, output_base_folder)
+    converter.save_run_report(output_base_folder)
+
+    converter._log(f"\n🎉 All Excel files processed. Output saved to: {output_base_folder}")
+    converter._update_progress(100)
@@ -1,84 +1,108 @@
 import os
-from src.converter_worker import ExcelConverter
+from src.cancellation import CancellationToken, ConversionCancelled
+
+# The converter modules pull in pandas, geopandas, shapely and openpyxl, they are imported on the first conversion
+# so the UI can start without them
 
 class Process:
-    def __init__(self, output_folder, jenis_jalan, tipe_jalan, progress_callback=None) -> None:
+    def __init__(self, output_folder, jenis_jalan, tipe_jalan, progress_callback=None, max_workers=1, boundary_cache_dir=None, geojson_pretty=True, geojson_precision=None, image_mode="png", incremental=False, formats=None, log_details=True, cancel_token=None, profile=False) -> None:
         self.output_folder = output_folder
         self.jenis_jalan = jenis_jalan
         self.tipe_jalan = tipe_jalan
         self.progress_callback = progress_callback
+        self.max_workers = max_workers # Worker processes for folder conversion, 1 runs in-process and None uses every core
+        self.boundary_cache_dir = boundary_cache_dir # Folder for the pickled boundary layer, None keeps it in memory only
+        self.geojson_pretty = geojson_pretty # Indented or compact GeoJSON
+        self.geojson_precision = geojson_precision # GeoJSON coordinate decimals, None keeps full precision
+        self.image_mode = image_mode # "png" or "original", see src/image_export.py
+        self.incremental = incremental # Folder runs skip files unchanged since the run manifest in the output folder was written
+        self.formats = formats # Subset of "shapefile", "geojson", "images", "geopackage" and "geoparquet", None writes the first three
+        self.log_details = log_details # False logs only the summary lines, not every saved image and layer
+        self.profile = profile # Dump a cProfile pstats file per converted file, for deeper dives than the run report
+        self.cancel_token = cancel_token if cancel_token is not None else CancellationToken() # Cancelling it stops the run at the next file, sheet or image
         os.makedirs(self.output_folder, exist_ok=True)
-        
+
+    def _converter(self, log_callback=None): # ExcelConverter with the options of this run
+        from src.converter_worker import ExcelConverter
+        from src.geojson_writer import GeoJSONWriter
+
+        geojson_writer = GeoJSONWriter(self.geojson_pretty, self.geojson_precision)
+        return ExcelConverter(self.output_folder, log_callback, self.progress_callback, boundary_cache_dir=self.boundary_cache_dir, geojson_writer=geojson_writer, image_mode=self.image_mode, formats=self.formats, log_details=self.log_details, cancel_token=self.cancel_token, profile=self.profile)
+
     def process_single_file(self, file_path, log_callback=None, qml_folder=None, batas_wilayah_path=None):
         """
         Processes a single Excel file and converts it to GeoJSON, Shapefile, and Extracts Images.
+        Returns the names of the files that could not be converted.
         """
         if log_callback:
             log_callback(f"Processing file: {file_path}")
             
-        converter = ExcelConverter(self.output_folder, log_callback, self.progress_callback)
-            
-        # Process for Shapefile output
-        converter.process_single_excel_file_shapefile(
-            file_path, 
-            self.output_folder,
-            qml_folder=qml_folder,
-            batas_wilayah_path=batas_wilayah_path,
-            jenis_jalan=self.jenis_jalan,
-            tipe_jalan=self.tipe_jalan
-        )
+        converter = self._converter(log_callback)
             
-        # Extract images from Excel
-        converter.process_single_excel_file_images(
-            file_path, 
-            self.output_folder
-        )
-        
-        # Process for GeoJSON output
-        converter.process_single_excel_file_geojson(
-            file_path, 
-            self.output_folder,
-            batas_wilayah_path=batas_wilayah_path,
-            jenis_jalan=self.jenis_jalan,
-            tipe_jalan=self.tipe_jalan
-        )
+        # Shapefile and GeoJSON are written from one normalization pass, then Images are extracted
+        try:
+            converter.process_single_excel_file(
+                file_path, 
+                self.output_folder,
+                qml_folder=qml_folder,
+                batas_wilayah_path=batas_wilayah_path,
+                jenis_jalan=self.jenis_jalan,
+                tipe_jalan=self.tipe_jalan
+            )
+        except ConversionCancelled:
+            if log_callback:
+                log_callback(f"⛔ Conversion of {file_path} cancelled")
+            return converter.failed_files
             
         if log_callback:
             log_callback(f"Finished processing {file_path}")
+        return converter.failed_files
     
-    def process_folder(self, input_folder, log_callback=None, qml_folder=None, batas_wilayah_path=None):
+    def process_folder(self, input_folder, log_callback=None, qml_folder=None, batas_wilayah_path=None, resume=False):
         """
         Processes all Excel files in a folder and converts it to GeoJSON, Shapefile, and Extracts Images.
+        Returns the names of the files that could not be converted.
+        resume=True continues an interrupted run at the first file/stage without a checkpoint marker.
         """
         if log_callback:
             log_callback(f"Processing folder: {input_folder}")
             
-        converter = ExcelConverter(self.output_folder, log_callback, self.progress_callback)
-            
-        # Process for Shapefile output
-        converter.process_excel_folder_shapefile(
-            input_folder, 
-            self.output_folder,
-            qml_folder=qml_folder,
-            batas_wilayah_path=batas_wilayah_path,
-            jenis_jalan=self.jenis_jalan,
-            tipe_jalan=self.tipe_jalan
-        )
-            
-        # Extract images from Excel files
-        converter.process_excel_folder_images(
-            input_folder, 
-            self.output_folder
-        )
-        
-        # Process for GeoJSON output
-        converter.process_excel_folder_geojson(
-            input_folder, 
-            self.output_folder,
-            batas_wilayah_path=batas_wilayah_path,
-            jenis_jalan=self.jenis_jalan,
-            tipe_jalan=self.tipe_jalan
-        )
-            
+        converter = self._converter(log_callback)
+
+        try:
+            if self.max_workers is None or self.max_workers > 1:
+                # Files are spread over a process pool, each worker with its own ExcelConverter
+                from src.converter_pool import process_excel_folder_parallel
+                process_excel_folder_parallel(
+                    converter,
+                    input_folder,
+                    self.output_folder,
+                    qml_folder=qml_folder,
+                    batas_wilayah_path=batas_wilayah_path,
+                    jenis_jalan=self.jenis_jalan,
+                    tipe_jalan=self.tipe_jalan,
+                    max_workers=self.max_workers,
+                    incremental=self.incremental,
+                    resume=resume
+                )
+            else:
+                # Shapefile, Images and GeoJSON are produced file by file so each workbook is loaded once
+                converter.process_excel_folder(
+                    input_folder, 
+                    self.output_folder,
+                    qml_folder=qml_folder,
+                    batas_wilayah_path=batas_wilayah_path,
+                    jenis_jalan=self.jenis_jalan,
+                    tipe_jalan=self.tipe_jalan,
+                    incremental=self.incremental,
+                    resume=resume
+                )
+        except ConversionCancelled:
+            # Finished files, the run manifest and the checkpoints are kept, resume=True continues from here
+            if log_callback:
+                log_callback("⛔ Batch processing cancelled")
+            return converter.failed_files
+
         if log_callback:
-            log_callback("Batch processing completed successfully")
\ No newline at end of file
+            log_callback("Batch processing completed successfully")
+        return converter.failed_files
\ No newline at end of file
@@ -1,38 +1,99 @@
 import sys
 import subprocess
-import pkg_resources
-import json
 import glob
 import os
 import re
-import io
+import time
+import importlib.util
+import importlib.metadata
 import pandas as pd
-from openpyxl import load_workbook
 import geopandas as gpd
 from datetime import datetime
-from shapely.geometry import Point, LineString, MultiPoint
+import shapely
 import geopandas as gpd
 import numpy as np
-from openpyxl_image_loader import SheetImageLoader
 from openpyxl.utils import get_column_letter
+from src.workbook_cache import WorkbookCache
+from src.output_sinks import ShapefileSink, GeoJSONSink, GeoPackageSink, GeoParquetSink
+from src.boundary import BoundaryProvider
+from src.geojson_writer import GeoJSONWriter
+from src.geopackage_writer import GeoPackageWriter
+from src.image_export import export_image, image_extension
+from src.output_formats import OUTPUT_FORMATS, DEFAULT_FORMATS, IMAGE_MODES
+from src.column_plan import ColumnPlan
+from src.run_manifest import RunManifest, file_sha256
+from src.checkpoints import CheckpointStore
+from src.cancellation import CancellationToken
+from src.run_report import RunTimings, PROFILE_DIR, start_profile, dump_profile
+
+# Rows searched for the header row, templates keep it within the first few rows
+HEADER_SCAN_ROWS = 50
+
+
+def text_to_float(text): # float() of a text, NaN when it is not a number
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
 
 
 class ExcelConverter:
-    def __init__(self, output_folder, log_callback = None, progress_callback = None) -> None:
+    def __init__(self, output_folder, log_callback = None, progress_callback = None, workbook_cache = None, boundary_cache_dir = None, geojson_writer = None, image_mode = "png", formats = None, log_details = True, cancel_token = None, profile = False, geopackage_writer = None, geoparquet_lock = None) -> None:
         self.output_folder = output_folder
         self.log_callback = log_callback
         self.progress_callback = progress_callback
         self.list_df = {}
+        self.timings = RunTimings() # Time per stage, file and sheet, written to the run report
+        self.profile = profile # Dump a cProfile pstats file per converted file into "Run Profiles"
+        self.workbook_cache = workbook_cache if workbook_cache is not None else WorkbookCache(timings=self.timings)
+        self.boundary_cache_dir = boundary_cache_dir # Folder for the pickled boundary layer, None keeps it in memory only
+        self.geojson_writer = geojson_writer if geojson_writer is not None else GeoJSONWriter()
+        self.geopackage_writer = geopackage_writer if geopackage_writer is not None else GeoPackageWriter() # Pool workers share one with a lock
+        self.geoparquet_lock = geoparquet_lock # Pool workers share one, so one of them at a time reads and rewrites the GeoParquet dataset
+        self.parquet_schemas = {} # GeoParquet dataset file path -> (size and mtime, schema) of its footer, re-read only once the file changes
+        self.column_plans = {} # Compiled ColumnPlan by header fingerprint, shared by every sheet of the run
+        self.output_files = None # Files written by the current convert_excel_file call, None when not tracked
+        self.output_errors = 0 # Outputs of the current convert_excel_file call that failed, the file is then not recorded as done
+        self.source_rows = {} # Worksheet row of each feature of the last normalized sheet, by GeoDataFrame index
+        self.link_extensions = {} # Image file extension by (category, feature index) for the links of the current sheet
+
+        if image_mode not in IMAGE_MODES:
+            raise ValueError(f"Unknown image mode '{image_mode}', expected one of {IMAGE_MODES}")
+        self.image_mode = image_mode # "png" converts non-PNG media to PNG, "original" copies the media bytes unchanged
+
+        formats = tuple(formats) if formats else DEFAULT_FORMATS
+        unknown = [output_format for output_format in formats if output_format not in OUTPUT_FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown output format(s) {unknown}, expected some of {OUTPUT_FORMATS}")
+        # pyarrow is optional, only GeoParquet output needs it
+        if "geoparquet" in formats and importlib.util.find_spec("pyarrow") is None:
+            raise ValueError("GeoParquet output needs pyarrow, install it with: pip install pyarrow")
+        # The column types are unified with the permissive promotion of pa.unify_schemas, added in pyarrow 14
+        if "geoparquet" in formats and int(importlib.metadata.version("pyarrow").split(".")[0]) < 14:
+            raise ValueError("GeoParquet output needs pyarrow 14 or newer, upgrade it with: pip install --upgrade pyarrow")
+        self.formats = formats # Outputs written by convert_excel_file
+        self.failed_files = [] # Names of the files whose conversion raised or left outputs unwritten, for callers that report a status
+        self.log_details = log_details # False keeps only the summary messages, per-image/per-layer lines are dropped
+        self.cancel_token = cancel_token if cancel_token is not None else CancellationToken() # Checked between files, sheets and images
 
     def _update_progress(self, percent):
         if self.progress_callback:
             self.progress_callback(percent)
 
-    def _log(self, message):
+    def _record_output(self, output_path): # Remember a written file for the run manifest
+        if self.output_files is not None:
+            self.output_files.append(output_path)
+
+    def _log(self, message, detail=False): # detail marks per-item messages, left out when log_details is False
+        if detail and not self.log_details:
+            return
         if self.log_callback:
             self.log_callback(message)
 
     def install_requirements(self): #Install required packages if they are not already installed.
+        # pkg_resources scans every installed distribution on import, only pay for it when asked to check
+        import pkg_resources
+
         required = {
             'pandas': '1.0.0',
             'openpyxl': '3.0.0',
@@ -72,14 +133,14 @@ class ExcelConverter:
                     global pd
                     import pandas as pd
                 if 'openpyxl' in missing or 'openpyxl' in update:
-                    global load_workbook
-                    from openpyxl import load_workbook
+                    global get_column_letter
+                    from openpyxl.utils import get_column_letter
                 if 'geopandas' in missing or 'geopandas' in update:
                     global gpd
                     import geopandas as gpd
                 if 'shapely' in missing or 'shapely.geometry' in update:
-                    global Point, LineString
-                    from shapely.geometry import Point, LineString
+                    global shapely
+                    import shapely
                     
             except Exception as e:
                 self._log(f"Failed to install required packages: {str(e)}")
@@ -168,6 +229,15 @@ class ExcelConverter:
         except Exception as e:
             self._log(f"❌ Error saving coordinate error log: {str(e)}")
 
+    def save_run_report(self, output_base_folder): # Write the stage timings of the run as JSON and log the slowest stages
+        try:
+            report_path = self.timings.save(output_base_folder)
+            for line in self.timings.summary_lines():
+                self._log(line)
+            self._log(f"✅ Run report saved to: {report_path}")
+        except Exception as e:
+            self._log(f"❌ Error saving run report: {str(e)}")
+
     def find_coordinate_columns(self, df, prefix, column_type): #Find coordinate columns with various naming patterns returns column name
         
         patterns = []
@@ -308,6 +378,143 @@ class ExcelConverter:
         except (ValueError, TypeError):
             return pd.NA
 
+    def parse_coordinate_column(self, values): # Vectorized parse_coordinate over a whole column, unparsable values become NaN
+        values = pd.Series(values, dtype=object)
+
+        # Numbers (and booleans) are taken as they are, anything else that is not text cannot be parsed
+        try:
+            stripped = values.str.strip()
+        except AttributeError: # Column without any text at all
+            stripped = pd.Series(None, index=values.index, dtype=object)
+        is_text = stripped.notna()
+        result = pd.to_numeric(values.where(~is_text), errors='coerce').astype(float)
+
+        if not is_text.any():
+            return result
+
+        text = stripped[is_text]
+
+        # float() as the scalar parser uses it, pd.to_numeric rounds long decimals differently and rejects "1_000"
+        def to_float(parts):
+            return parts.map(text_to_float, na_action='ignore').astype(float)
+
+        # Case 1: simple decimals, apostrophes removed and decimal comma turned into a dot
+        cleaned = text.str.replace("'", "", regex=False).str.replace(",", ".", regex=False)
+        simple = to_float(cleaned)
+        is_simple = simple.notna() | cleaned.str.strip().str.lower().isin(['nan', '+nan', '-nan'])
+
+        # Case 2: DMS format like "107°18'40.74"E" or "6°17'23.45"S", text without a degree sign ends up as 0
+        dms = text[~is_simple].str.upper()
+        is_negative = dms.str.contains(r"[SW]$", regex=True)
+        dms = dms.str.replace(r'[NSEW"]', "", regex=True)
+
+        has_degrees = dms.str.contains("°", regex=False)
+        degree_parts = dms.str.split("°", n=2, expand=False)
+        minute_parts = degree_parts.str[1].fillna("")
+        has_minutes = minute_parts.str.contains("'", regex=False)
+        minute_parts = minute_parts.str.split("'", expand=False)
+        seconds_text = minute_parts.str[1].fillna("")
+        has_seconds = has_minutes & (seconds_text != "")
+
+        degrees = to_float(degree_parts.str[0])
+        minutes = to_float(minute_parts.str[0]).where(has_minutes, 0.0)
+        seconds = to_float(seconds_text).where(has_seconds, 0.0)
+
+        decimal_degrees = (degrees + minutes / 60 + seconds / 3600).where(has_degrees, 0.0)
+        decimal_degrees = decimal_degrees.where(~is_negative, -decimal_degrees)
+
+        result.loc[simple.index[is_simple]] = simple[is_simple]
+        result.loc[decimal_degrees.index] = decimal_degrees
+        return result
+
+    def fix_coordinate_columns(self, lat, lon): # Vectorized fix_coordinates: rescale latitude/longitude stored without decimal separator
+        lat = lat.astype(float)
+        lon = lon.astype(float)
+        lat_abs = lat.abs()
+        lon_abs = lon.abs()
+
+        # For values like -6448977 (which should be around -6.4 degrees), conditions are checked in order
+        lat_divisor = np.select(
+            [
+                (lat_abs > 1_000_000) & (lat_abs < 10_000_000) & (np.floor(lat_abs) // 1_000_000 >= 6),
+                lat_abs > 10_000_000,
+                lat_abs > 1_000_000,
+                lat_abs > 90_000,
+            ],
+            [1_000_000, 10_000_000, 1_000_000, 1_000],
+            default=1
+        )
+        lon_divisor = np.select(
+            [
+                (lon_abs > 100_000_000) & (lon_abs < 1_500_000_000),
+                lon_abs > 10_000_000,
+                lon_abs > 1_000_000,
+                lon_abs > 180_000,
+            ],
+            [10_000_000, 10_000_000, 1_000_000, 1_000],
+            default=1
+        )
+        return lat / lat_divisor, lon / lon_divisor
+
+    def coordinate_array(self, values, parse_strings=False): # Coordinate column as a float array, values that are not numbers become NaN
+        if parse_strings:
+            return self.parse_coordinate_column(values).to_numpy(dtype=float)
+        return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+
+    def build_point_geometries(self, df, lat_col, lon_col): # Point per row from the start coordinates, None where a coordinate is missing
+        lon = self.coordinate_array(df[lon_col])
+        lat = self.coordinate_array(df[lat_col])
+        valid = ~np.isnan(lon) & ~np.isnan(lat)
+
+        geometries = np.full(len(df), None, dtype=object)
+        geometries[valid] = shapely.points(lon[valid], lat[valid])
+        return geometries
+
+    def build_multipoint_geometries(self, df, start_lat_col, start_lon_col, end_lat_col=None, end_lon_col=None): # MultiPoint per row from the start and optional end coordinates
+        start_lon = self.coordinate_array(df[start_lon_col])
+        start_lat = self.coordinate_array(df[start_lat_col])
+        start_valid = ~np.isnan(start_lon) & ~np.isnan(start_lat)
+        row_index = [np.flatnonzero(start_valid)]
+        coords = [np.column_stack([start_lon, start_lat])[start_valid]]
+
+        if end_lat_col is not None and end_lon_col is not None:
+            end_lon = self.coordinate_array(df[end_lon_col])
+            end_lat = self.coordinate_array(df[end_lat_col])
+            end_valid = ~np.isnan(end_lon) & ~np.isnan(end_lat)
+            row_index.append(np.flatnonzero(end_valid))
+            coords.append(np.column_stack([end_lon, end_lat])[end_valid])
+
+        # Group the points by row, the stable sort keeps the start point before the end point
+        row_index = np.concatenate(row_index)
+        coords = np.concatenate(coords)
+        order = np.argsort(row_index, kind="stable")
+        row_index, coords = row_index[order], coords[order]
+
+        geometries = np.full(len(df), None, dtype=object)
+        if len(row_index):
+            rows, parts = np.unique(row_index, return_inverse=True)
+            geometries[rows] = shapely.multipoints(coords, indices=parts)
+        return geometries
+
+    def build_linestring_geometries(self, df, start_lat_col, start_lon_col, end_lat_col, end_lon_col, offset=0.0001): # Two-point LineString per row, falls back to a short segment when the end point is missing
+        start_lon = self.coordinate_array(df[start_lon_col], parse_strings=True)
+        start_lat = self.coordinate_array(df[start_lat_col], parse_strings=True)
+        end_lon = self.coordinate_array(df[end_lon_col], parse_strings=True)
+        end_lat = self.coordinate_array(df[end_lat_col], parse_strings=True)
+
+        start_valid = ~np.isnan(start_lon) & ~np.isnan(start_lat)
+        end_valid = ~np.isnan(end_lon) & ~np.isnan(end_lat)
+
+        coords = np.empty((len(df), 2, 2))
+        coords[:, 0, 0] = start_lon
+        coords[:, 0, 1] = start_lat
+        coords[:, 1, 0] = np.where(end_valid, end_lon, start_lon + offset)
+        coords[:, 1, 1] = np.where(end_valid, end_lat, start_lat + offset)
+
+        geometries = np.full(len(df), None, dtype=object)
+        geometries[start_valid] = shapely.linestrings(coords[start_valid])
+        return geometries
+
     def process_coordinates(self, df, lat_col, lon_col, sheet_name=None, excel_name=None): #Process coordinates and error coordinates
         if lat_col is None or lon_col is None:
             self._log(f"⚠️ Cannot process coordinates in '{sheet_name}': Missing coordinate column(s)")
@@ -315,60 +522,34 @@ class ExcelConverter:
             
         df_copy = df.copy()
         error_rows = []
-        
-        # Process each row with better error tracking
-        for idx, row in df_copy.iterrows():
-            try:
-                # Defensive check to make sure the columns exist in the row
-                if lat_col not in row or lon_col not in row:
-                    self._log(f"⚠️ Row {idx} missing coordinate column(s) in '{sheet_name}'")
-                    continue
-                    
-                lat_val = self.parse_coordinate(row[lat_col])
-                lon_val = self.parse_coordinate(row[lon_col])
-                
-                # Error tracking
-                if pd.isna(lat_val) and not pd.isna(row[lat_col]):
-                    error_info = {
-                        'Excel File': excel_name,
-                        'Sheet': sheet_name,
-                        'Row Index': idx,
-                        'Original Lat Value': row[lat_col],
-                        'Original Lon Value': row[lon_col],
-                        'Error': f"Failed to parse latitude: {row[lat_col]}"
-                    }
-                    error_rows.append(error_info)
-                
-                if pd.isna(lon_val) and not pd.isna(row[lon_col]):
-                    error_info = {
-                        'Excel File': excel_name,
-                        'Sheet': sheet_name,
-                        'Row Index': idx,
-                        'Original Lat Value': row[lat_col],
-                        'Original Lon Value': row[lon_col],
-                        'Error': f"Failed to parse longitude: {row[lon_col]}"
-                    }
-                    error_rows.append(error_info)
-                
-                df_copy.at[idx, lat_col] = lat_val
-                df_copy.at[idx, lon_col] = lon_val
-                
-            except Exception as e:
-                error_info = {
-                    'Excel File': excel_name,
-                    'Sheet': sheet_name,
-                    'Row Index': idx,
-                    'Original Lat Value': str(row.get(lat_col, 'Column not found')),
-                    'Original Lon Value': str(row.get(lon_col, 'Column not found')),
-                    'Error': str(e)
-                }
-                error_rows.append(error_info)
-        
-        # Apply fix_coordinates with better error handling
+
+        original_lat = df_copy[lat_col]
+        original_lon = df_copy[lon_col]
+
+        # Parse whole columns at once
+        lat_values = self.parse_coordinate_column(original_lat)
+        lon_values = self.parse_coordinate_column(original_lon)
+
+        # Error tracking, rows that had a value which could not be parsed
+        lat_failed = (lat_values.isna() & original_lat.notna()).to_numpy()
+        lon_failed = (lon_values.isna() & original_lon.notna()).to_numpy()
+
+        for pos in np.flatnonzero(lat_failed | lon_failed):
+            base_info = {
+                'Excel File': excel_name,
+                'Sheet': sheet_name,
+                'Row Index': df_copy.index[pos],
+                'Original Lat Value': original_lat.iloc[pos],
+                'Original Lon Value': original_lon.iloc[pos],
+            }
+            if lat_failed[pos]:
+                error_rows.append({**base_info, 'Error': f"Failed to parse latitude: {original_lat.iloc[pos]}"})
+            if lon_failed[pos]:
+                error_rows.append({**base_info, 'Error': f"Failed to parse longitude: {original_lon.iloc[pos]}"})
+
+        # Rescale values stored with the wrong magnitude
         try:
-            fixed_coords = df_copy.apply(lambda row: self.fix_coordinates(row, lat_col, lon_col), axis=1)
-            df_copy[lat_col] = fixed_coords[0]
-            df_copy[lon_col] = fixed_coords[1]
+            lat_values, lon_values = self.fix_coordinate_columns(lat_values, lon_values)
         except Exception as e:
             error_info = {
                 'Excel File': excel_name,
@@ -379,6 +560,9 @@ class ExcelConverter:
                 'Error': f"Batch coordinate fixing failed: {str(e)}"
             }
             error_rows.append(error_info)
+
+        df_copy[lat_col] = lat_values.to_numpy()
+        df_copy[lon_col] = lon_values.to_numpy()
         
         return df_copy, error_rows
 
@@ -418,52 +602,14 @@ class ExcelConverter:
 
     def save_to_shapefile(self,gdf, output_path, batas_wilayah=None, qml_folder=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting"):  # Save GeoDataFrame to Shapefile
         try:
-            gdf = gdf.copy()
-            
             # Make sure we have a valid geometry column
             if 'geometry' not in gdf.columns and 'Geometry' not in gdf.columns:
                 self._log(f"❌ Error: No geometry column found in data for {os.path.basename(output_path)}")
+                self.output_errors += 1
                 return
                 
-            # Ensure the GeoDataFrame has a proper geometry column set
-            if not isinstance(gdf, gpd.GeoDataFrame):
-                if 'geometry' in gdf.columns:
-                    gdf = gpd.GeoDataFrame(gdf, geometry='geometry', crs="EPSG:4326")
-                elif 'Geometry' in gdf.columns:
-                    gdf = gpd.GeoDataFrame(gdf, geometry='Geometry', crs="EPSG:4326")
-                else:
-                    self._log(f"❌ Error: Cannot create GeoDataFrame - no geometry column found")
-                    return
-            else:
-                # Explicitly set the geometry column even if it's already a GeoDataFrame
-                if 'geometry' in gdf.columns:
-                    gdf = gdf.set_geometry('geometry')
-                elif 'Geometry' in gdf.columns:
-                    gdf = gdf.set_geometry('Geometry')
-            
-            # Ensure the GeoDataFrame has a valid CRS
-            if gdf.crs is None:
-                gdf = gdf.set_crs("EPSG:4326")
-            
-            # Perform spatial join with batas_wilayah if provided
-            if batas_wilayah is not None:
-                try:                
-                    # Make sure we have valid geometries
-                    gdf = gdf[~gdf.geometry.isna()].copy()
-                    
-                    # Make sure CRS matches for join
-                    if gdf.crs != batas_wilayah.crs:
-                        gdf = gdf.to_crs(batas_wilayah.crs)
-                    
-                    # Perform the spatial join
-                    gdf = gpd.sjoin(gdf, batas_wilayah[['geometry', 'NAMOBJ']], how="left", predicate="intersects")
-                    
-                    # Clean up index column created by spatial join
-                    if 'index_right' in gdf.columns:
-                        gdf = gdf.drop(columns=['index_right'])
-                        
-                except Exception as e:
-                    self._log(f"Warning: Error during spatial join: {str(e)}")
+            # Geometry column, CRS and the region of each feature from the boundaries if provided
+            gdf = self.join_batas_wilayah(gdf, batas_wilayah)
             
             # Truncate column names to 10 characters but preserve 'name' or 'nama' fields
             new_columns = {}
@@ -519,9 +665,11 @@ class ExcelConverter:
                     gdf = gdf.drop(columns=[col for col in gdf.columns if 'Column' in col or 'column' in col])
 
                     # Save the shapefile
-                    group.to_file(new_output_path, driver="ESRI Shapefile")
+                    with self.timings.stage("write_shapefile"):
+                        group.to_file(new_output_path, driver="ESRI Shapefile")
+                    self._record_output(new_output_path)
                     
-                    self._log(f"✅ Saved: {new_output_path}")
+                    self._log(f"✅ Saved: {new_output_path}", detail=True)
                     
                     # Apply QML Style if qml_folder is provided
                     if qml_folder is not None:
@@ -532,7 +680,8 @@ class ExcelConverter:
                         if os.path.exists(qml_source_file):
                             import shutil
                             shutil.copy(qml_source_file, qml_target_file)
-                            self._log(f"✅ Applied QML style: {qml_target_file}")
+                            self._record_output(qml_target_file)
+                            self._log(f"✅ Applied QML style: {qml_target_file}", detail=True)
                         else:
                             self._log(f"⚠️ No QML file found for {sheet_name}")
             else:
@@ -548,8 +697,10 @@ class ExcelConverter:
                 gdf = gdf.drop(columns=[col for col in gdf.columns if 'Column' in col or 'column' in col])
 
                 # Save the shapefile
-                gdf.to_file(new_output_path, driver="ESRI Shapefile")
-                self._log(f"✅ Saved: {output_path}")
+                with self.timings.stage("write_shapefile"):
+                    gdf.to_file(new_output_path, driver="ESRI Shapefile")
+                self._record_output(new_output_path)
+                self._log(f"✅ Saved: {output_path}", detail=True)
                 
                 # Apply QML Style if qml_folder is provided
                 if qml_folder is not None:
@@ -560,500 +711,342 @@ class ExcelConverter:
                     if os.path.exists(qml_source_file):
                         import shutil
                         shutil.copy(qml_source_file, qml_target_file)
-                        self._log(f"✅ Applied QML style: {qml_target_file}")
+                        self._record_output(qml_target_file)
+                        self._log(f"✅ Applied QML style: {qml_target_file}", detail=True)
                     else:
                         self._log(f"⚠️ No QML file found for {sheet_name}")
             
         except Exception as e:
             self._log(f"❌ Error saving shapefile {output_path}: {str(e)}")
+            self.output_errors += 1
             import traceback
             traceback.print_exc()
 
-    def flatten_excel_to_shapefile(self,file_path, output_folder, excel_name=None, batas_wilayah=None, qml_folder=None, error_logs=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting"): #Convert an Excel file to Shapefile and collect error logs
-        if error_logs is None:
-            error_logs = []
-        
+    def find_header_row(self, df): # Index of the first row with a cell containing "NO" within the top HEADER_SCAN_ROWS rows, None if there is none
+        top = df.head(HEADER_SCAN_ROWS)
+        header_indices = top[top.apply(lambda x: x.astype(str).str.contains("NO", case=False, na=False)).any(axis=1)].index
+        if len(header_indices) == 0:
+            return None
+        return header_indices[0]
+
+    def normalize_sheet(self, file_path, sheet_name, excel_name, error_logs): # Build the normalized GeoDataFrame of one sheet, shared by every output sink
+        # Convert to DataFrame, merged cells already filled with their top-left value
+        data = self.workbook_cache.sheet_values(file_path, sheet_name)
+        df = pd.DataFrame(data)
+
+        # Check if DataFrame is empty or has too few rows
+        if df.empty or len(df) < 3:
+            self._log(f"⚠️ Skipping '{sheet_name}' (Empty sheet or insufficient data)")
+            return None
+
+        # Find the first row containing "NO", only the top of the sheet is scanned
         try:
-            # If excel_name is not provided, extract it from the file_path
-            if excel_name is None:
-                excel_name = os.path.splitext(os.path.basename(file_path))[0]
-            
-            # Create output folder if it doesn't exist
-            os.makedirs(output_folder, exist_ok=True)
-            
-            # Load workbook
-            wb = load_workbook(file_path, data_only=True)
+            header_index = self.find_header_row(df)
+            if header_index is None:
+                self._log(f"⚠️ Skipping '{sheet_name}' (No header row with 'NO' found)")
+                return None
+        except Exception as e:
+            self._log(f"⚠️ Skipping '{sheet_name}' (Error finding header row: {str(e)})")
+            return None
 
-            # Process each sheet
-            for sheet_name in wb.sheetnames:
-                try:
-                    ws = wb[sheet_name]
+        # Drop rows above and including header, plus the empty row after header
+        if len(df) <= header_index + 2:
+            self._log(f"⚠️ Skipping '{sheet_name}' (Not enough data rows after header)")
+            return None
 
-                    # Unmerge cells and fill values
-                    for merge in list(ws.merged_cells):
-                        ws.unmerge_cells(str(merge))
-                        top_left = ws.cell(merge.min_row, merge.min_col).value
-                        for row in range(merge.min_row, merge.max_row + 1):
-                            for col in range(merge.min_col, merge.max_col + 1):
-                                ws.cell(row, col, top_left)
-
-                    # Convert to DataFrame
-                    data = list(ws.values)
-                    df = pd.DataFrame(data)
-
-                    # Check if DataFrame is empty or has too few rows
-                    if df.empty or len(df) < 3:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (Empty sheet or insufficient data)")
-                        continue
+        # The two rows after the empty row are merged into the column names
+        if len(df) < header_index + 4:
+            self._log(f"⚠️ Skipping '{sheet_name}' (Not enough rows for headers)")
+            return None
 
-                    # Find rows containing "NO" (safer approach)
-                    try:
-                        header_indices = df[df.apply(lambda x: x.astype(str).str.contains("NO", case=False, na=False)).any(axis=1)].index
-                        if len(header_indices) == 0:
-                            self._log(f"⚠️ Skipping '{sheet_name}' (No header row with 'NO' found)")
-                            continue
-                        header_index = header_indices[0]
-                    except Exception as e:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (Error finding header row: {str(e)})")
-                        continue
+        # Sheets sharing a template compile their column plan once
+        fingerprint = ColumnPlan.fingerprint(df, header_index, df.notna().any().tolist())
+        plan = self.column_plans.get(fingerprint)
+        if plan is None:
+            plan = ColumnPlan.compile(fingerprint, self)
+            self.column_plans[fingerprint] = plan
 
-                    # Use the identified header row
-                    df.columns = df.iloc[header_index].astype(str).str.strip()
+        # Keep the data rows of the planned columns only
+        df = plan.select(df, header_index)
 
-                    # Remove empty columns
-                    df = df.dropna(axis=1, how="all")
+        # Check if this sheet is about MARKA or PAGAR PENGAMAN
+        is_marka_sheet = "marka" in sheet_name.lower() or any(col for col in df.columns if isinstance(col, str) and "marka" in col.lower())
+        is_pagar_pengaman_sheet = "pagar pengaman" in sheet_name.lower() or any(col for col in df.columns if isinstance(col, str) and "pagar pengaman" in col.lower())
 
-                    # First pass of REKAP filtering
-                    try:
-                        rekap_mask = df.columns.astype(str).str.contains("REKAP", case=False, na=False)
-                        if rekap_mask.any():
-                            df = df.loc[:, ~rekap_mask]
-                    except Exception as e:
-                        self._log(f"Warning in '{sheet_name}': Error filtering REKAP columns - {str(e)}")
+        # Coordinate columns found when the plan was compiled
+        start_lat_col = plan.roles["start_lat"]
+        start_lon_col = plan.roles["start_lon"]
+        end_lat_col = plan.roles["end_lat"]
+        end_lon_col = plan.roles["end_lon"]
 
-                    # Drop rows above and including header, plus the empty row after header
-                    rows_to_drop = list(range(0, header_index + 2))
-                    if len(df) > max(rows_to_drop) + 1:  # Make sure we have enough rows
-                        df = df.drop(index=rows_to_drop).reset_index(drop=True)
-                    else:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (Not enough data rows after header)")
-                        continue
+        # Check available coordinate patterns
+        has_start_coords = plan.has_start_coords
+        has_end_coords = plan.has_end_coords
 
-                    # Improved header row merging
-                    if len(df) >= 2:
-                        first_row = df.iloc[0].astype(str).replace('None', '').replace('nan', '')
-                        second_row = df.iloc[1].astype(str).replace('None', '').replace('nan', '')
-                        
-                        # Smart merging to avoid duplication
-                        merged_header = []
-                        for a, b in zip(first_row, second_row):
-                            a = a.strip()
-                            b = b.strip()
-                            
-                            # Skip columns with "REKAP" in the name
-                            if "rekap" in a.lower() or "rekap" in b.lower():
-                                merged_header.append("TO_BE_REMOVED")  # Mark for removal
-                                continue
-                            
-                            if not a and not b:
-                                merged_header.append("Column_" + str(len(merged_header)))
-                            elif not a:
-                                merged_header.append(b)
-                            elif not b:
-                                merged_header.append(a)
-                            else:
-                                if a.lower() in b.lower():
-                                    merged_header.append(b)
-                                elif b.lower() in a.lower():
-                                    merged_header.append(a)
-                                else:
-                                    merged_header.append(f"{a} {b}")
-                        
-                        # Ensure column names are unique
-                        df.columns = self.unique_column_names(merged_header)
-                        
-                        # Remove any columns marked for removal
-                        df = df.loc[:, ~df.columns.str.contains("TO_BE_REMOVED")]
-                        
-                        # Remove the first two rows used for headers
-                        df = df.drop(index=[0, 1]).reset_index(drop=True)
-                    else:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (Not enough rows for headers)")
-                        continue
+        if not has_start_coords:
+            self._log(f"⚠️ Skipping '{sheet_name}' (No valid start coordinate columns found)")
+            return None
 
-                    # Second pass of REKAP filtering after merging headers
-                    try:
-                        rekap_mask = df.columns.astype(str).str.contains("REKAP", case=False, na=False)
-                        if rekap_mask.any():
-                            df = df.loc[:, ~rekap_mask]
-                    except Exception as e:
-                        self._log(f"Warning in '{sheet_name}': Error filtering REKAP columns (second pass) - {str(e)}")
-
-                    # Normalize column names for consistent detection
-                    df.columns = [str(col).lower().strip() if col is not None else f"col_{i}" for i, col in enumerate(df.columns)]
-
-                    # Third pass of REKAP filtering after normalizing
-                    try:
-                        rekap_mask = df.columns.str.contains("rekap", case=False, na=False)
-                        if rekap_mask.any():
-                            df = df.loc[:, ~rekap_mask]
-                    except Exception as e:
-                        self._log(f"Warning in '{sheet_name}': Error filtering rekap columns (third pass) - {str(e)}")
-
-                    # Check if this sheet is about MARKA or PAGAR PENGAMAN
-                    is_marka_sheet = "marka" in sheet_name.lower() or any(col for col in df.columns if isinstance(col, str) and "marka" in col.lower())
-                    is_pagar_pengaman_sheet = "pagar pengaman" in sheet_name.lower() or any(col for col in df.columns if isinstance(col, str) and "pagar pengaman" in col.lower())
-
-                    # Find all coordinate columns using the improved function
-                    start_lat_col = self.find_coordinate_columns(df, 'start', 'lat')
-                    start_lon_col = self.find_coordinate_columns(df, 'start', 'lon')
-                    end_lat_col = self.find_coordinate_columns(df, 'end', 'lat')
-                    end_lon_col = self.find_coordinate_columns(df, 'end', 'lon')
-
-                    # Check available coordinate patterns
-                    has_start_coords = start_lat_col is not None and start_lon_col is not None
-                    has_end_coords = end_lat_col is not None and end_lon_col is not None
-
-                    if not has_start_coords:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (No valid start coordinate columns found)")
-                        continue
-                    
-                    # Filter rows where both latitude and longitude values are blank
-                    if has_start_coords:
-                        # Convert coordinates to appropriate types and handle formatting issues
-                        coord_mask = df[start_lat_col].astype(str).str.strip().replace('', np.nan).notna() & \
-                                    df[start_lon_col].astype(str).str.strip().replace('', np.nan).notna()
-                        
-                        if coord_mask.any():
-                            # Only process rows with actual coordinate data
-                            df_with_coords = df[coord_mask].reset_index(drop=True)
-                            df_processed, start_errors = self.process_coordinates(df_with_coords, start_lat_col, start_lon_col, sheet_name, excel_name)
-                            
-                            # Update only the rows that had coordinates
-                            df = df.copy()
-                            df.loc[coord_mask, :] = df_processed
-                            
-                            error_logs.extend(start_errors)
-                        else:
-                            self._log(f"⚠️ No valid start coordinates found in '{sheet_name}'")
-                            continue
+        # Filter rows where both latitude and longitude values are blank
+        if has_start_coords:
+            # Convert coordinates to appropriate types and handle formatting issues
+            coord_mask = df[start_lat_col].astype(str).str.strip().replace('', np.nan).notna() & \
+                        df[start_lon_col].astype(str).str.strip().replace('', np.nan).notna()
 
-                    if has_end_coords:
-                        # Similar filtering for end coordinates
-                        coord_mask = df[end_lat_col].astype(str).str.strip().replace('', np.nan).notna() & \
-                                    df[end_lon_col].astype(str).str.strip().replace('', np.nan).notna()
-                        
-                        if coord_mask.any():
-                            df_with_coords = df[coord_mask].reset_index(drop=True)
-                            df_processed, end_errors = self.process_coordinates(df_with_coords, end_lat_col, end_lon_col, sheet_name, excel_name)
-                            
-                            df.loc[coord_mask, :] = df_processed
-                            error_logs.extend(end_errors)
+            if coord_mask.any():
+                # Only process rows with actual coordinate data
+                df_with_coords = df[coord_mask].reset_index(drop=True)
+                with self.timings.stage("process_coordinates"):
+                    df_processed, start_errors = self.process_coordinates(df_with_coords, start_lat_col, start_lon_col, sheet_name, excel_name)
 
-                    # Check if the end coordinates actually contain valid data
-                    if has_end_coords:
-                        has_valid_end_coords = not df[end_lat_col].isna().all() and not df[end_lon_col].isna().all()
-                        valid_pairs = ((df[start_lat_col].notna() & df[start_lon_col].notna()) & (df[end_lat_col].notna() & df[end_lon_col].notna())).any()
-                    else:
-                        has_valid_end_coords = False
-                        valid_pairs = False
-                    
-                    # Determine geometry type based on available coordinates, actual data, and sheet type
-                    # MARKA sheets should use MultiPoint geometry
-                    if is_marka_sheet:
-                        self._log(f"Processing '{sheet_name}' as MultiPoint (MARKA sheet)")
-
-                        # First check if we have any valid coordinates before applying
-                        has_valid_coords = ((df[start_lat_col].notna() & df[start_lon_col].notna()) | 
-                                            (has_end_coords and df[end_lat_col].notna() & df[end_lon_col].notna())).any()
-                        
-                        if not has_valid_coords:
-                            self._log(f"⚠️ Skipping '{sheet_name}' (No valid coordinates found in MARKA sheet)")
-                            continue
-                            
-                        # Create MultiPoint geometry only for rows with valid coordinates
-                        def create_multipoint(row):
-                            try:
-                                points = []
-                                # Add start point if valid
-                                if pd.notna(row[start_lon_col]) and pd.notna(row[start_lat_col]):
-                                    points.append((float(row[start_lon_col]), float(row[start_lat_col])))
-                                    
-                                # Add end point if valid and available
-                                if has_end_coords and pd.notna(row[end_lon_col]) and pd.notna(row[end_lat_col]):
-                                    points.append((float(row[end_lon_col]), float(row[end_lat_col])))
-                                    
-                                # Return MultiPoint if we have points, else None
-                                return MultiPoint(points) if points else None
-                            except Exception as e:
-                                self._log(f"Error creating MultiPoint for row {row.name}: {str(e)}")
-                                return None
-                        
-                        # Apply the function to create geometry
-                        df["geometry"] = df.apply(create_multipoint, axis=1)
-                        
-                        # Exclude coordinate columns from properties
-                        exclude_cols = [start_lat_col, start_lon_col]
-                        if has_end_coords:
-                            exclude_cols.extend([end_lat_col, end_lon_col])
-                        exclude_cols.append("geometry")
-                        
-                    # PAGAR PENGAMAN sheets with valid start/end coordinates should use LineString
-                    elif is_pagar_pengaman_sheet and has_valid_end_coords and valid_pairs:
-                        self._log(f"Processing '{sheet_name}' as LineString (PAGAR PENGAMAN sheet)")
-                        
-                        # Create LineString geometry with additional debugging and more flexible validation
-                        def create_linestring(row):
-                            try:
-                                # Enhanced debugging
-                                start_lat = row[start_lat_col]
-                                start_lon = row[start_lon_col]
-                                end_lat = row[end_lat_col]
-                                end_lon = row[end_lon_col]
-                                
-                                # Skip processing if all coordinates are blank/NaN
-                                if pd.isna(start_lat) and pd.isna(start_lon) and pd.isna(end_lat) and pd.isna(end_lon):
-                                    return None
-                                    
-                                # First try to parse any string coordinates
-                                if isinstance(start_lat, str):
-                                    start_lat = self.parse_coordinate(start_lat)
-                                if isinstance(start_lon, str):
-                                    start_lon = self.parse_coordinate(start_lon)
-                                if isinstance(end_lat, str):
-                                    end_lat = self.parse_coordinate(end_lat)
-                                if isinstance(end_lon, str):
-                                    end_lon = self.parse_coordinate(end_lon)
-                                
-                                # Create LineString if we have valid coordinates
-                                if (pd.notna(start_lon) and pd.notna(start_lat) and 
-                                    pd.notna(end_lon) and pd.notna(end_lat)):
-                                    return LineString([
-                                        (float(start_lon), float(start_lat)),
-                                        (float(end_lon), float(end_lat))
-                                    ])
-                                else:
-                                    # If one set of coordinates is missing, fall back to Point
-                                    if pd.notna(start_lon) and pd.notna(start_lat):
-                                        offset = 0.0001
-                                        return LineString([
-                                            (float(start_lon), float(start_lat)),
-                                            (float(start_lon) + offset, float(start_lat) + offset)
-                                        ])
-                                    return None
-                            except Exception as e:
-                                self._log(f"Error creating LineString for row {row.name}: {str(e)}")
-                                return None
-                        
-                        df["geometry"] = df.apply(create_linestring, axis=1)
-                        exclude_cols = [start_lat_col, start_lon_col, end_lat_col, end_lon_col, "geometry"]
-                        
-                    else:
-                        # Other sheets use Point geometry (only start coordinates)
-                        self._log(f"Processing '{sheet_name}' as Point geometry (regular sheet)")
-                        
-                        # Create Point geometry with start coordinates, only for rows with valid data
-                        df["geometry"] = df.apply(
-                            lambda row: Point(row[start_lon_col], row[start_lat_col]) 
-                            if pd.notna(row[start_lon_col]) and pd.notna(row[start_lat_col]) else None,
-                            axis=1
-                        )
-                        
-                        # Exclude coordinate columns from properties
-                        exclude_cols = [start_lat_col, start_lon_col]
-                        if has_end_coords:
-                            exclude_cols.extend([end_lat_col, end_lon_col])
-                        exclude_cols.append("geometry")
-
-                    # Drop rows where geometry is None
-                    df = df.dropna(subset=["geometry"]).reset_index(drop=True)
-
-                    # Only create GeoDataFrame if there are valid geometries
-                    if len(df) > 0 and not df["geometry"].isnull().all():
-                        # Filter REKAP columns before creating properties
-                        properties_cols = [col for col in df.columns if col not in exclude_cols]
-                        properties_cols = [col for col in properties_cols if 'rekap' not in str(col).lower()]
-                        
-                        # Create GeoDataFrame with explicit geometry setting
-                        gdf = gpd.GeoDataFrame(df[properties_cols + ["geometry"]], geometry="geometry",crs="EPSG:4326")
-                        
-                        # Verify that the geometry column is properly set
-                        if not gdf.geometry.name == "geometry":
-                            gdf = gdf.set_geometry("geometry")
-                        
-                        gdf.columns = self.clean_column_names(gdf.columns)
+                # Update only the rows that had coordinates
+                df = df.copy()
+                df.loc[coord_mask, :] = df_processed
 
-                        gdf = gdf.loc[:, ~gdf.columns.astype(str).str.contains("rekap", case=False, na=False)]
-                        
-                        gdf = gdf.loc[:, ~gdf.columns.astype(str).str.match(r"^None$|None_", na=False)]
+                error_logs.extend(start_errors)
+            else:
+                self._log(f"⚠️ No valid start coordinates found in '{sheet_name}'")
+                return None
+
+        if has_end_coords:
+            # Similar filtering for end coordinates
+            coord_mask = df[end_lat_col].astype(str).str.strip().replace('', np.nan).notna() & \
+                        df[end_lon_col].astype(str).str.strip().replace('', np.nan).notna()
+
+            if coord_mask.any():
+                df_with_coords = df[coord_mask].reset_index(drop=True)
+                with self.timings.stage("process_coordinates"):
+                    df_processed, end_errors = self.process_coordinates(df_with_coords, end_lat_col, end_lon_col, sheet_name, excel_name)
+
+                df.loc[coord_mask, :] = df_processed
+                error_logs.extend(end_errors)
+
+        # Check if the end coordinates actually contain valid data
+        if has_end_coords:
+            has_valid_end_coords = not df[end_lat_col].isna().all() and not df[end_lon_col].isna().all()
+            valid_pairs = ((df[start_lat_col].notna() & df[start_lon_col].notna()) & (df[end_lat_col].notna() & df[end_lon_col].notna())).any()
+        else:
+            has_valid_end_coords = False
+            valid_pairs = False
 
-                        gdf.columns = gdf.columns.astype(str).str.replace(r"\sNone\b", "", regex=True).str.strip()
+        # Determine geometry type based on available coordinates, actual data, and sheet type
+        # MARKA sheets should use MultiPoint geometry
+        if is_marka_sheet:
+            self._log(f"Processing '{sheet_name}' as MultiPoint (MARKA sheet)", detail=True)
 
-                        # One final check for REKAP columns before saving
-                        if any('rekap' in str(col).lower() for col in gdf.columns):
-                            gdf = gdf.loc[:, ~gdf.columns.astype(str).str.contains("rekap", case=False, na=False)]
-                        
-                        # Add properties Jenis Rambu for GeoJSON properties
-                        if sheet_name.lower() == 'rambu':
-                            # Add the Jenis Rambu property
-                            gdf['Jenis Rambu'] = self.process_jenis_rambu_columns(gdf)
+            # First check if we have any valid coordinates before applying
+            has_valid_coords = ((df[start_lat_col].notna() & df[start_lon_col].notna()) | 
+                                (has_end_coords and df[end_lat_col].notna() & df[end_lon_col].notna())).any()
 
-                        # Define output file path
-                        output_path = os.path.join(output_folder, f"{excel_name}_{sheet_name}.shp").replace(os.path.sep, '/')
-                        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            if not has_valid_coords:
+                self._log(f"⚠️ Skipping '{sheet_name}' (No valid coordinates found in MARKA sheet)")
+                return None
 
-                        # Save as shapefile
-                        self.save_to_shapefile(gdf, output_path, batas_wilayah, qml_folder, jenis_jalan, tipe_jalan)
-                    else:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (No valid geometry found)")
+            # Create MultiPoint geometry only for rows with valid coordinates
+            with self.timings.stage("build_geometry"):
+                df["geometry"] = self.build_multipoint_geometries(df, start_lat_col, start_lon_col,
+                                                                  end_lat_col if has_end_coords else None,
+                                                                  end_lon_col if has_end_coords else None)
+
+        # PAGAR PENGAMAN sheets with valid start/end coordinates should use LineString
+        elif is_pagar_pengaman_sheet and has_valid_end_coords and valid_pairs:
+            self._log(f"Processing '{sheet_name}' as LineString (PAGAR PENGAMAN sheet)", detail=True)
+
+            # Create LineString geometry, rows with only a start point get a short offset segment
+            with self.timings.stage("build_geometry"):
+                df["geometry"] = self.build_linestring_geometries(df, start_lat_col, start_lon_col, end_lat_col, end_lon_col)
+
+        else:
+            # Other sheets use Point geometry (only start coordinates)
+            self._log(f"Processing '{sheet_name}' as Point geometry (regular sheet)", detail=True)
+
+            # Create Point geometry with start coordinates, only for rows with valid data
+            with self.timings.stage("build_geometry"):
+                df["geometry"] = self.build_point_geometries(df, start_lat_col, start_lon_col)
+
+        # Drop rows where geometry is None, the worksheet row of each kept row is remembered for its image links
+        df = df.dropna(subset=["geometry"])
+        self.source_rows = dict(enumerate((df.index + header_index + 5).tolist()))
+        df = df.reset_index(drop=True)
+
+        # Only create GeoDataFrame if there are valid geometries
+        if len(df) == 0 or df["geometry"].isnull().all():
+            self._log(f"⚠️ Skipping '{sheet_name}' (No valid geometry found)")
+            return None
+
+        # Properties (coordinate columns excluded) under their final names, as compiled in the column plan
+        gdf = gpd.GeoDataFrame(df.iloc[:, plan.property_positions], geometry="geometry", crs="EPSG:4326")
+        gdf.columns = plan.property_names
+
+        # Add properties Jenis Rambu for GeoJSON properties
+        if sheet_name.lower() == 'rambu':
+            # Add the Jenis Rambu property
+            gdf['Jenis Rambu'] = self.process_jenis_rambu_columns(gdf)
+
+        return gdf
+
+    def flatten_excel(self, file_path, sinks, excel_name=None, error_logs=None, batas_wilayah=None): # Normalize and join each sheet once and hand the GeoDataFrame to every output sink
+        if error_logs is None:
+            error_logs = []
+        
+        try:
+            # If excel_name is not provided, extract it from the file_path
+            if excel_name is None:
+                excel_name = os.path.splitext(os.path.basename(file_path))[0]
+            
+            # Sheet names from the streaming reader, the full workbook is only loaded for images
+            sheet_names = self.workbook_cache.sheet_names(file_path)
+
+            # Process each sheet
+            for sheet_name in sheet_names:
+                self.cancel_token.check()
+                self.timings.sheet_name = sheet_name
+                try:
+                    gdf = self.normalize_sheet(file_path, sheet_name, excel_name, error_logs)
+                    if gdf is None:
                         continue
+
+                    # The region of each feature is joined once, every sink gets the same joined sheet
+                    gdf = self.join_batas_wilayah(gdf, batas_wilayah)
+
+                    # Extracted images keep their own format in "original" mode, the GeoJSON links follow it
+                    self.link_extensions = {}
+                    if self.image_mode == "original" and "images" in self.formats and "geojson" in self.formats:
+                        self.link_extensions = self.image_link_extensions(file_path, sheet_name, self.source_rows)
+                    for sink in sinks:
+                        sink.write(gdf, excel_name, sheet_name)
                 except Exception as e:
                     self._log(f"❌ Error processing sheet '{sheet_name}': {str(e)}")
+                    self.output_errors += 1
                     import traceback
                     traceback.print_exc()
                     continue
-
-            return error_logs
         except Exception as e:
             self._log(f"❌ Error processing file: {str(e)}")
+            self.output_errors += 1
             import traceback
             traceback.print_exc()
+            # Buffered sheets of a failed file are dropped, the outputs of an earlier run stay as they were
+            for sink in sinks:
+                sink.abort()
             return error_logs
-
-    def process_single_excel_file_shapefile(self,file_path, output_base_folder, qml_folder=None, batas_wilayah_path=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting"): #Process conversion for one Excel file
-        output_folder = os.path.join(output_base_folder, "Extract Shapefile").replace(os.path.sep, '/')
-        os.makedirs(output_folder, exist_ok=True)
-        
-        # Load the city boundaries shapefile if provided
-        batas_wilayah = None
-        if batas_wilayah_path and os.path.exists(batas_wilayah_path):
-            try:
-                batas_wilayah = gpd.read_file(batas_wilayah_path)
-                self._log(f"✅ Loaded city boundaries from: {batas_wilayah_path}")
-            except Exception as e:
-                self._log(f"❌ Error loading city boundaries shapefile: {str(e)}")
-        else:
-            self._log("❌ No city boundaries provided or file not found.")
-        
-        # Check if QML folder exists
-        if qml_folder and os.path.exists(qml_folder):
-            self._log(f"✅ Using QML styles from: {qml_folder}")
-        else:
-            self._log("❌ No QML folder provided or folder not found.")
-            qml_folder = None
-        
-        # Extract file name
-        file_name = os.path.basename(file_path)
-        excel_name = os.path.splitext(file_name)[0]
-        
-        self._log(f"Processing: {file_name}")
-        
-        try:
-            # Initialize error_logs list
-            error_logs = []
+        except BaseException:
+            # A cancelled file writes nothing more, the outputs of an earlier run stay as they were
+            for sink in sinks:
+                sink.abort()
+            raise
+
+        for sink in sinks:
+            sink.close()
+        return error_logs
+
+    def find_image_columns(self, ws): # Image columns of the DOKUMENTASI, RAMBU and RPPJ categories, the Nama Rambu and Jenis Tiang columns and every column name
+        # Step 1: Extract merged column headers from rows 1-5
+        column_names = {}
+        
+        # Get values for rows 1-5 for each column
+        for col in range(1, ws.max_column + 1):
+            col_letter = get_column_letter(col)
+            header_values = []
             
-            wb = load_workbook(file_path, data_only=True)
+            for row in range(1, 6):  # Rows 1-5
+                cell_value = ws[f"{col_letter}{row}"].value
+                if cell_value:
+                    header_values.append(str(cell_value).strip())
             
-            # Process the file (this will handle all sheets)
-            error_logs = self.flatten_excel_to_shapefile(file_path, output_folder, excel_name, batas_wilayah, qml_folder, error_logs, jenis_jalan, tipe_jalan)
+            # Combine the header parts into one name
+            if header_values:
+                column_names[col] = " ".join(header_values)
+            else:
+                column_names[col] = f"Column_{col_letter}"
+        
+        # Step 2: Find columns containing our keywords
+        dokumentasi_columns = {}
+        rambu_columns = {}
+        rppj_columns = {}
+        nama_rambu_column = None
+        jenis_tiang_column = None
+        
+        # First, find all our target columns
+        for col, name in column_names.items():
+            if "DOKUMENTASI" in name.upper():
+                dokumentasi_columns[col] = name
+            elif "RAMBU" in name.upper() and "NAMA RAMBU" not in name.upper():
+                rambu_columns[col] = name
+            elif "RPPJ" in name.upper():
+                rppj_columns[col] = name
             
-            self._log(f"✅ Completed processing: {file_name}")
-            if error_logs:
-                self.log_coordinate_errors(error_logs, output_base_folder)
-        except Exception as e:
-            self._log(f"❌ Error processing {file_name}: {str(e)}")
-            import traceback
-            traceback.print_exc()
-
-        self._update_progress(30)
-
-    def process_excel_folder_shapefile(self,input_folder, output_base_folder, qml_folder=None, batas_wilayah_path=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting"): #Process conversion for all Excel files in a folder
-        output_folder = os.path.join(output_base_folder, "Extract Shapefile").replace(os.path.sep, '/')
-        os.makedirs(output_folder, exist_ok=True)
-        
-        # Load the city boundaries shapefile if provided
-        batas_wilayah = None
-        if batas_wilayah_path and os.path.exists(batas_wilayah_path):
-            try:
-                batas_wilayah = gpd.read_file(batas_wilayah_path)
-                self._log(f"✅ Loaded city boundaries from: {batas_wilayah_path}")
-            except Exception as e:
-                self._log(f"❌ Error loading city boundaries shapefile: {str(e)}")
-        else:
-            self._log("❌ No city boundaries provided or file not found.")
-        
-        # Check if QML folder exists
-        if qml_folder and os.path.exists(qml_folder):
-            self._log(f"✅ Using QML styles from: {qml_folder}")
-        else:
-            self._log("❌ No QML folder provided or folder not found.")
-            qml_folder = None
-        
-        # Get all Excel files in the input folder
-        excel_extensions = ['*.xlsx', '*.xls', '*.xlsm']
-        excel_files = []
-        
-        for ext in excel_extensions:
-            excel_files.extend(glob.glob(os.path.join(input_folder, ext)))
-        
-        # Get total_files to calculate progress step
-        total_files = len(excel_files)
-        progress_step = 30 / total_files if total_files > 0 else 0
-
-        # Initialize error log list
-        all_error_logs = []
-        
-        # Process each Excel file
-        for i, file_path in enumerate(excel_files, 1):
-            file_name = os.path.basename(file_path)
-            excel_name = os.path.splitext(file_name)[0]
-            self._log(f"\n[{i}/{len(excel_files)}] Processing: {file_name}")
+            # Find the specific column for "Nama Rambu"
+            if "NAMA RAMBU" in name.upper():
+                nama_rambu_column = col
             
-            try:
-                # Collect errors from processing this file
-                file_errors = self.flatten_excel_to_shapefile(file_path, output_folder, excel_name, batas_wilayah, qml_folder, [], jenis_jalan, tipe_jalan)
-                all_error_logs.extend(file_errors)
-                self._log(f"✅ Completed processing: {file_name}")
-                if file_errors:
-                    self._log(f"⚠️ Found {len(file_errors)} coordinate errors during processing")
-            except Exception as e:
-                self._log(f"❌ Error processing {file_name}: {str(e)}")
-
-            # Update progress dynamically
-            self._update_progress(int(i * progress_step))
-        
-        # Log all errors
-        if all_error_logs:
-            self.log_coordinate_errors(all_error_logs, output_base_folder)
-        
-        self._log(f"\n🎉 All Excel files processed. Output saved to: {output_folder}")
-        self._update_progress(30)
+            # Find the specific column for "Jenis Tiang"
+            elif "JENIS TIANG" in name.upper():
+                jenis_tiang_column = col
+        
+        return dokumentasi_columns, rambu_columns, rppj_columns, nama_rambu_column, jenis_tiang_column, column_names
+
+    def image_link_extensions(self, file_path, sheet_name, source_rows): # Extension of the image each feature links to, by (category, feature index), as the image extraction writes it
+        wb = self.workbook_cache.get(file_path)
+        if sheet_name not in wb.sheetnames:
+            return {}
+        ws = wb[sheet_name]
+
+        columns = dict(zip(("dokumentasi", "rambu", "rppj"), self.find_image_columns(ws)[:3]))
+        with self.timings.stage("index_images"):
+            image_index = self.build_image_index(ws)
+
+        # A link points at the image of the first column of its category in the feature's row (data starts at row 6),
+        # the format openpyxl read on load gives the extension, the media bytes are read once by the extraction
+        row_extensions = {}
+        for (row, col), image in sorted(image_index.items()):
+            if row < 6:
+                continue
+            for category, category_columns in columns.items():
+                if col in category_columns:
+                    row_extensions.setdefault((category, row), image_extension(image.format, self.image_mode))
+
+        return {
+            (category, index): row_extensions[(category, row)]
+            for index, row in source_rows.items()
+            for category in columns
+            if (category, row) in row_extensions
+        }
+
+    def build_image_index(self, ws): # Map the top-left anchor cell (row, col) of every embedded image of a sheet to the image
+        image_index = {}
+        for image in ws._images:
+            anchor_from = getattr(image.anchor, "_from", None)
+            if anchor_from is None:
+                # Absolute anchors are not attached to any cell
+                continue
+            # Drawing anchors are 0-based, a later image on the same cell replaces the earlier one
+            image_index[(anchor_from.row + 1, anchor_from.col + 1)] = image
+        return image_index
 
-    def process_image_columns(self,ws, image_loader, target_columns, output_folder, file_name_clean, #Process images in specified columns with custom naming logic.
+    def process_image_columns(self,ws, image_index, target_columns, output_folder, file_name_clean, #Process images in specified columns with custom naming logic.
                             safe_sheet_name, category, nama_rambu_column, jenis_tiang_column): 
         
         # Track existing image names (to avoid duplicates for Rambu)
         existing_images = {}
         
-        # Find image cells in target columns
+        # Find image cells in target columns, only the anchored images are visited (data starts at row 6)
         image_cells = {}
-        for col in target_columns:
+        for (row, col), image in image_index.items():
+            if row < 6 or col not in target_columns:
+                continue
             col_letter = get_column_letter(col)
-            column_name = target_columns[col]
             
             # Make column name safe for filename
-            safe_column_name = re.sub(r'[\\/*?:"<>|]', "_", column_name)
+            safe_column_name = re.sub(r'[\\/*?:"<>|]', "_", target_columns[col])
             
-            # Scan rows starting from row 6
-            for row in range(6, ws.max_row + 1):
-                cell_address = f"{col_letter}{row}"
-                if image_loader.image_in(cell_address):
-                    image_cells[(row, col)] = {
-                        'cell_address': cell_address,
-                        'column_name': safe_column_name,
-                        'column_letter': col_letter,
-                        'row_number': row
-                    }
+            image_cells[(row, col)] = {
+                'cell_address': f"{col_letter}{row}",
+                'column_name': safe_column_name,
+                'column_letter': col_letter,
+                'row_number': row,
+                'image': image
+            }
         
         if not image_cells:
             self._log(f"⚠️ No images found in {category.upper()} columns, skipping...")
@@ -1077,14 +1070,15 @@ class ExcelConverter:
             column_name = target_columns[col]
             safe_column_name = re.sub(r'[\\/*?:"<>|]', "_", column_name)
             
-            self._log(f"Processing {len(image_cells_by_column[col])} images in column '{column_name}'")
+            self._log(f"Processing {len(image_cells_by_column[col])} images in column '{column_name}'", detail=True)
             
             # Process rows in order
             for row, cell_info in sorted(image_cells_by_column[col], key=lambda x: x[0]):
+                self.cancel_token.check()
                 cell_address = cell_info['cell_address']
                 try:
-                    # Get the image
-                    img = image_loader.get(cell_address)
+                    # Raw media bytes as stored in the workbook
+                    image_data = cell_info['image']._data()
                     
                     # Generate filename based on category
                     if category == "rambu" and nama_rambu_column is not None:
@@ -1099,12 +1093,12 @@ class ExcelConverter:
                             
                             # Check if this name already exists (to avoid duplicates)
                             if img_filename in existing_images:
-                                self._log(f"  ⚠️ Duplicate 'Nama Rambu' found: {safe_nama_rambu} - Replacing existing image")
+                                self._log(f"  ⚠️ Duplicate 'Nama Rambu' found: {safe_nama_rambu} - Replacing existing image", detail=True)
                             
                             existing_images[img_filename] = True
                         else:
                             # Fallback to default naming if no nama_rambu value
-                            self._log(f"  ⚠️ No 'Nama Rambu' value found for row {row}, using default naming")
+                            self._log(f"  ⚠️ No 'Nama Rambu' value found for row {row}, using default naming", detail=True)
                             row_identifier = f"Row{row}"
                             safe_row_identifier = re.sub(r'[\\/*?:"<>|]', "_", row_identifier)
                             img_filename = f"{file_name_clean}_Sheet_{safe_sheet_name}_Column_{safe_column_name}_{safe_row_identifier}.png"
@@ -1135,18 +1129,20 @@ class ExcelConverter:
                             # For any other category, include the file_name_clean to prevent conflicts
                             img_filename = f"{file_name_clean}_Sheet_{safe_sheet_name}_Column_{safe_column_name}_{safe_row_identifier}.png"
                     
-                    # Save the image
-                    img_path = os.path.join(output_folder, img_filename).replace(os.path.sep, '/')
-                    with io.BytesIO() as img_buffer:
-                        img.save(img_buffer, format="PNG")
-                        img_buffer.seek(0)
+                    # Save the image, only media that is not allowed as-is gets transcoded
+                    with self.timings.stage("export_image"):
+                        data, extension = export_image(image_data, self.image_mode)
+                        img_filename = os.path.splitext(img_filename)[0] + extension
+                        img_path = os.path.join(output_folder, img_filename).replace(os.path.sep, '/')
                         with open(img_path, 'wb') as f:
-                            f.write(img_buffer.read())
+                            f.write(data)
+                    self._record_output(img_path)
                     
                     successful_images += 1
-                    self._log(f"  ✅ Saved: {img_filename}")
+                    self._log(f"  ✅ Saved: {img_filename}", detail=True)
                 except Exception as e:
                     self._log(f"  ❌ Error saving image at {cell_address}: {str(e)}")
+                    self.output_errors += 1
         
         return successful_images
 
@@ -1155,12 +1151,8 @@ class ExcelConverter:
         file_path = os.path.abspath(file_path)
         output_folder = os.path.abspath(output_folder)
             
-        # Extract filename from path for folder creation
-        file_name_clean = re.search(r'([^\\]+)\.xlsx?$', file_path)
-        if file_name_clean:
-            file_name_clean = file_name_clean.group(1)
-        else:
-            file_name_clean = os.path.basename(file_path).replace('.xlsx', '').replace('.xlsm', '')
+        # Extract filename from path for folder creation, on every platform's path separator
+        file_name_clean = os.path.splitext(os.path.basename(file_path))[0]
         
         # Create subdirectories for each category
         dokumentasi_folder = os.path.join(output_folder, "Dokumentasi", file_name_clean).replace(os.path.sep, '/')
@@ -1171,73 +1163,40 @@ class ExcelConverter:
             os.makedirs(folder, exist_ok=True)
         
         try:
-            # Process each sheet independently to prevent file handle issues
-            wb = load_workbook(file_path, data_only=True)
+            # Reuse the workbook already parsed for the Shapefile/GeoJSON passes
+            wb = self.workbook_cache.get(file_path)
             sheet_names = wb.sheetnames.copy()
-            wb.close()
             
             successful_sheets = 0
             total_images_saved = 0
             
             # Process sheets in the order they appear in the workbook
             for sheet_idx, sheet_name in enumerate(sheet_names, 1):
+                self.cancel_token.check()
+                self.timings.sheet_name = sheet_name
                 try:
                     self._log(f"Processing sheet {sheet_idx}/{len(sheet_names)}: {sheet_name}")
                     
                     # Create a safe sheet name for filenames
                     safe_sheet_name = re.sub(r'[\\/*?:"<>|]', "_", sheet_name)
                     
-                    # Open a fresh workbook instance for each sheet
-                    wb = load_workbook(file_path, data_only=True)
                     ws = wb[sheet_name]
                     
-                    # Create a fresh image loader for this sheet
-                    image_loader = SheetImageLoader(ws)
-                    
-                    # Step 1: Extract merged column headers from rows 1-5
-                    column_names = {}
+                    # Find the image columns of each category from the merged column headers
+                    dokumentasi_columns, rambu_columns, rppj_columns, nama_rambu_column, jenis_tiang_column, column_names = self.find_image_columns(ws)
+                    if nama_rambu_column is not None:
+                        print(f"Found 'Nama Rambu' column: {column_names[nama_rambu_column]} (Column {get_column_letter(nama_rambu_column)})")
+                    if jenis_tiang_column is not None:
+                        print(f"Found 'Jenis Tiang' column: {column_names[jenis_tiang_column]} (Column {get_column_letter(jenis_tiang_column)})")
                     
-                    # Get values for rows 1-5 for each column
-                    for col in range(1, ws.max_column + 1):
-                        col_letter = get_column_letter(col)
-                        header_values = []
-                        
-                        for row in range(1, 6):  # Rows 1-5
-                            cell_value = ws[f"{col_letter}{row}"].value
-                            if cell_value:
-                                header_values.append(str(cell_value).strip())
-                        
-                        # Combine the header parts into one name
-                        if header_values:
-                            column_names[col] = " ".join(header_values)
-                        else:
-                            column_names[col] = f"Column_{col_letter}"
-                    
-                    # Step 2: Find columns containing our keywords
-                    dokumentasi_columns = {}
-                    rambu_columns = {}
-                    rppj_columns = {}
-                    nama_rambu_column = None
-                    jenis_tiang_column = None
+                    # Sheets without image columns never touch their drawings
+                    if not (dokumentasi_columns or rambu_columns or rppj_columns):
+                        self._log(f"⚠️ No DOKUMENTASI, RAMBU or RPPJ columns in sheet '{sheet_name}', skipping...")
+                        continue
                     
-                    # First, find all our target columns
-                    for col, name in column_names.items():
-                        if "DOKUMENTASI" in name.upper():
-                            dokumentasi_columns[col] = name
-                        elif "RAMBU" in name.upper() and "NAMA RAMBU" not in name.upper():
-                            rambu_columns[col] = name
-                        elif "RPPJ" in name.upper():
-                            rppj_columns[col] = name
-                        
-                        # Find the specific column for "Nama Rambu"
-                        if "NAMA RAMBU" in name.upper():
-                            nama_rambu_column = col
-                            print(f"Found 'Nama Rambu' column: {name} (Column {get_column_letter(col)})")
-                        
-                        # Find the specific column for "Jenis Tiang"
-                        elif "JENIS TIANG" in name.upper():
-                            jenis_tiang_column = col
-                            print(f"Found 'Jenis Tiang' column: {name} (Column {get_column_letter(col)})")
+                    # Index the sheet images by anchor cell once, shared by every category below
+                    with self.timings.stage("index_images"):
+                        image_index = self.build_image_index(ws)
                     
                     # Track images processed for each category
                     images_by_category = {
@@ -1250,7 +1209,7 @@ class ExcelConverter:
                     # 1. Process DOKUMENTASI columns
                     if dokumentasi_columns:
                         processed = self.process_image_columns(
-                            ws, image_loader, dokumentasi_columns, dokumentasi_folder, 
+                            ws, image_index, dokumentasi_columns, dokumentasi_folder, 
                             file_name_clean, safe_sheet_name, "dokumentasi", None, None
                         )
                         images_by_category["dokumentasi"] += processed
@@ -1261,7 +1220,7 @@ class ExcelConverter:
                             print("⚠️ Warning: 'Nama Rambu' column not found. Using default naming for Rambu images.")
                         
                         processed = self.process_image_columns(
-                            ws, image_loader, rambu_columns, rambu_folder, 
+                            ws, image_index, rambu_columns, rambu_folder, 
                             file_name_clean, safe_sheet_name, "rambu", nama_rambu_column, None
                         )
                         images_by_category["rambu"] += processed
@@ -1272,7 +1231,7 @@ class ExcelConverter:
                             self._log("⚠️ Warning: 'Jenis Tiang' column not found. Using default naming for RPPJ images.")
                         
                         processed = self.process_image_columns(
-                            ws, image_loader, rppj_columns, rppj_folder, 
+                            ws, image_index, rppj_columns, rppj_folder, 
                             file_name_clean, safe_sheet_name, "rppj", None, jenis_tiang_column
                         )
                         images_by_category["rppj"] += processed
@@ -1288,16 +1247,9 @@ class ExcelConverter:
                     
                 except Exception as e:
                     self._log(f"❌ Error processing sheet '{sheet_name}' in file '{file_name_clean}': {str(e)}")
+                    self.output_errors += 1
                     import traceback
                     self._log(traceback.format_exc())
-
-                finally:
-                    # Always close the workbook after processing each sheet
-                    if 'wb' in locals() and wb is not None:
-                        try:
-                            wb.close()
-                        except:
-                            pass
             
             self._log(f"✅ Completed processing file: {file_name_clean}")
             self._log(f"  - {successful_sheets}/{len(sheet_names)} sheets processed")
@@ -1306,95 +1258,9 @@ class ExcelConverter:
             
         except Exception as e:
             self._log(f"❌ Error processing file '{file_path}': {str(e)}")
+            self.output_errors += 1
             return False
     
-    def process_single_excel_file_images(self,file_path, export_folder): #Process a single Excel file and extract images from it.
-
-        # Convert paths to absolute paths
-        file_path = os.path.abspath(file_path)
-        export_folder = os.path.abspath(export_folder)
-
-        # Create "Extract Images" folder within the export directory
-        output_folder = os.path.join(export_folder, "Extract Images").replace(os.path.sep, '/')
-        os.makedirs(output_folder, exist_ok=True)
-        
-        # Process the file
-        file_name = os.path.basename(file_path)
-        self._log(f"\n📊 Processing file: {file_name}")
-        
-        result = self.extract_images_from_excel(file_path, output_folder)
-        
-        # Print summary
-        self._log("\n" + "="*50)
-        self._log("📈 PROCESSING SUMMARY")
-        self._log(f"File: {file_name}")
-        
-        if result:
-            self._log(f"Status: Successfully processed ✅")
-        else:
-            self._log(f"Status: Failed to process ❌")
-        
-        self._log("\n🎉 Processing completed!")
-        self._update_progress(60)
-        
-        return result
-
-    def process_excel_folder_images(self,folder_path, export_folder): #Process all Excel files in a folder and extract images from them.
-
-        # Convert paths to absolute paths
-        # file_path = os.path.abspath(file_path) # Causing unboundlocalerror
-        export_folder = os.path.abspath(export_folder)
-
-        # Create "Extract Images" folder within the export directory
-        output_folder = os.path.join(export_folder, "Extract Images").replace(os.path.sep, '/')
-        os.makedirs(output_folder, exist_ok=True)
-        
-        # Track statistics
-        total_files = 0
-        successful_files = 0
-        failed_files = []
-        
-        # Get all Excel files in the folder - with full paths
-        excel_files = []
-        for file in os.listdir(folder_path):
-            if file.endswith(('.xlsx', '.xlsm')):
-                excel_files.append(os.path.join(folder_path, file).replace(os.path.sep, '/'))
-        
-        if not excel_files:
-            self._log("⚠️ No Excel files found in the specified folder.")
-            return
-        
-        total_files = len(excel_files)  # Fixed variable assignment
-        progress_step = 30 / total_files if total_files > 0 else 0
-        
-        # Process each Excel file
-        for i, file_path in enumerate(excel_files, 1):
-            file_name = os.path.basename(file_path)
-            self._log(f"\n📊 Processing file {i}/{total_files}: {file_name}")
-            
-            if self.extract_images_from_excel(file_path, output_folder):
-                successful_files += 1
-            else:
-                failed_files.append(file_name)
-
-            # Update progress dynamically
-            self._update_progress(int(30 + (i * progress_step)))
-        
-        # Print summary
-        self._log("\n" + "="*50)
-        self._log("📈 PROCESSING SUMMARY")
-        self._log(f"Total files: {total_files}")
-        self._log(f"Successfully processed: {successful_files}")
-        self._log(f"Failed to process: {len(failed_files)}")
-        
-        if failed_files:
-            self._log("\nFiles that could not be processed:")
-            for file in failed_files:
-                self._log(f"- {file}")
-        
-        self._log("\n🎉 All Excel files processing completed!")
-        self._update_progress(60)
-
     def sanitize_for_path(self,text):
         if text is None:
             return "unknown"
@@ -1437,7 +1303,7 @@ class ExcelConverter:
                 "Extract Images",
                 "Dokumentasi",
                 file_name_clean,
-                f"{file_name_clean}_Sheet_{safe_sheet_name}_Column_{safe_column_name}_Row{safe_row_identifier}.png"
+                f"{file_name_clean}_Sheet_{safe_sheet_name}_Column_{safe_column_name}_Row{safe_row_identifier}{self.link_extensions.get(('dokumentasi', idx), '.png')}"
             ).replace(os.path.sep, '/')
             
             # Assign to the dataframe
@@ -1465,7 +1331,7 @@ class ExcelConverter:
                     if nama_rambu_value and nama_rambu_value.lower() != 'nan' and nama_rambu_value.lower() != 'none':
                         # Construct the image path using the Nama Rambu value
                         safe_nama_rambu = self.sanitize_for_path(nama_rambu_value)
-                        image_path = os.path.join(output_base_dir, "Extract Images", "Rambu", f"{safe_nama_rambu}.png").replace(os.path.sep, '/')
+                        image_path = os.path.join(output_base_dir, "Extract Images", "Rambu", f"{safe_nama_rambu}{self.link_extensions.get(('rambu', idx), '.png')}").replace(os.path.sep, '/')
                         
                         # Assign the constructed path to the 'Image Rambu' property
                         gdf.at[idx, 'Image Rambu'] = image_path
@@ -1483,7 +1349,7 @@ class ExcelConverter:
                     output_base_dir,
                     "Extract Images",
                     "RPPJ",
-                    f"{file_name_clean}_Sheet_{safe_sheet_name}_Column_RPPJ_Row{safe_row_identifier}.png"
+                    f"{file_name_clean}_Sheet_{safe_sheet_name}_Column_RPPJ_Row{safe_row_identifier}{self.link_extensions.get(('rppj', idx), '.png')}"
                 ).replace(os.path.sep, '/')
                 
                 # Assign to the dataframe
@@ -1491,58 +1357,52 @@ class ExcelConverter:
         
         return gdf
 
+    def join_batas_wilayah(self, gdf, batas_wilayah=None): # Copy of a sheet GeoDataFrame with the NAMOBJ of the region each feature lies in
+        gdf = gdf.copy()
+
+        # Normalized sheets keep their geometry in a "Geometry" column that is not always the active one
+        geometry = 'geometry' if 'geometry' in gdf.columns else 'Geometry'
+        if isinstance(gdf, gpd.GeoDataFrame):
+            gdf = gdf.set_geometry(geometry)
+        else:
+            gdf = gpd.GeoDataFrame(gdf, geometry=geometry, crs="EPSG:4326")
+        if gdf.crs is None:
+            gdf = gdf.set_crs("EPSG:4326")
+        if batas_wilayah is None:
+            return gdf
+
+        try:
+            # Make sure we have valid geometries
+            gdf = gdf[~gdf.geometry.isna()].copy()
+
+            # Boundaries are already in EPSG:4326 with a built spatial index
+            if not isinstance(batas_wilayah, BoundaryProvider):
+                batas_wilayah = BoundaryProvider(batas_wilayah)
+
+            with self.timings.stage("spatial_join"):
+                gdf = batas_wilayah.join(gdf)
+
+            # Clean up index column created by spatial join
+            if 'index_right' in gdf.columns:
+                gdf = gdf.drop(columns=['index_right'])
+        except Exception as e:
+            self._log(f"Warning: Error during spatial join: {str(e)}")
+        return gdf
+
     def save_to_geojson(self, gdf, output_path, batas_wilayah=None, excel_name=None, sheet_name=None, output_base_dir=None,jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting"):
         try:
-            gdf = gdf.copy()
-            
             # Make sure we have a valid geometry column
             if 'geometry' not in gdf.columns and 'Geometry' not in gdf.columns:
                 self._log(f"❌ Error: No geometry column found in data for {os.path.basename(output_path)}")
+                self.output_errors += 1
                 return
                 
-            # Ensure the GeoDataFrame has a proper geometry column set
-            if not isinstance(gdf, gpd.GeoDataFrame):
-                if 'geometry' in gdf.columns:
-                    gdf = gpd.GeoDataFrame(gdf, geometry='geometry', crs="EPSG:4326")
-                elif 'Geometry' in gdf.columns:
-                    gdf = gpd.GeoDataFrame(gdf, geometry='Geometry', crs="EPSG:4326")
-                else:
-                    self._log(f"❌ Error: Cannot create GeoDataFrame - no geometry column found")
-                    return
-            else:
-                # Explicitly set the geometry column even if it's already a GeoDataFrame
-                if 'geometry' in gdf.columns:
-                    gdf = gdf.set_geometry('geometry')
-                elif 'Geometry' in gdf.columns:
-                    gdf = gdf.set_geometry('Geometry')
-            
-            # Ensure the GeoDataFrame has a valid CRS
-            if gdf.crs is None:
-                gdf = gdf.set_crs("EPSG:4326")
-            
-            # Perform spatial join with batas_wilayah if provided
-            if batas_wilayah is not None:
-                try:                
-                    # Make sure we have valid geometries
-                    gdf = gdf[~gdf.geometry.isna()].copy()
-                    
-                    # Make sure CRS matches for join
-                    if gdf.crs != batas_wilayah.crs:
-                        gdf = gdf.to_crs(batas_wilayah.crs)
-                    
-                    # Perform the spatial join
-                    gdf = gpd.sjoin(gdf, batas_wilayah[['geometry', 'NAMOBJ']], how="left", predicate="intersects")
-                    
-                    # Rename NAMOBJ column to Kota/Kabupaten
-                    if 'NAMOBJ' in gdf.columns:
-                        gdf = gdf.rename(columns={'NAMOBJ': 'Kota/Kabupaten'})
-                    
-                    # Clean up index column created by spatial join
-                    if 'index_right' in gdf.columns:
-                        gdf = gdf.drop(columns=['index_right'])
-                        
-                except Exception as e:
-                    self._log(f"Warning: Error during spatial join: {str(e)}")
+            # Geometry column, CRS and the region of each feature from the boundaries if provided
+            gdf = self.join_batas_wilayah(gdf, batas_wilayah)
+
+            # Rename NAMOBJ column to Kota/Kabupaten
+            if 'NAMOBJ' in gdf.columns:
+                gdf = gdf.rename(columns={'NAMOBJ': 'Kota/Kabupaten'})
             
             # Add the image documentation paths before saving
             if excel_name is not None and sheet_name is not None and output_base_dir is not None:
@@ -1590,487 +1450,235 @@ class ExcelConverter:
 
         except Exception as e:
             self._log(f"❌ Error saving GeoJSON {output_path}: {str(e)}")
+            self.output_errors += 1
             import traceback
             traceback.print_exc()
 
     def clean_geojson(self,gdf,output_path):  # Save GeoDataFrame in a clean format GeoJSON file
 
-        temp_path = output_path.replace(".geojson", "_temp.geojson")
-
         # Drop unnecessary column
         gdf = gdf.drop(columns=[col for col in gdf.columns if 'Column' in col or 'column' in col])
-        gdf.to_file(temp_path, driver="GeoJSON")
-        
-        with open(temp_path, "r", encoding="utf-8") as file:
-            geojson_data = json.load(file)
-        
-        with open(output_path, "w", encoding="utf-8") as file:
-            json.dump(geojson_data, file, indent=4)
-        
-        os.remove(temp_path)
-        self._log(f"✅ Saved: {output_path}")
-
-    def flatten_excel_to_geojson(self,file_path, output_folder, excel_name=None, batas_wilayah=None, error_logs=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting"):
-        if error_logs is None:
-            error_logs = []
-        
-        try:
-            # If excel_name is not provided, extract it from the file_path
-            if excel_name is None:
-                excel_name = os.path.splitext(os.path.basename(file_path))[0]
-            
-            # Create output folder if it doesn't exist
-            os.makedirs(output_folder, exist_ok=True)
-            
-            # Extract the output base directory from output_folder
-            output_base_dir = os.path.dirname(os.path.dirname(output_folder))
-            
-            # Load workbook
-            wb = load_workbook(file_path, data_only=True)
-
-            # Process each sheet
-            for sheet_name in wb.sheetnames:
-                try:
-                    ws = wb[sheet_name]
-
-                    # Unmerge cells and fill values
-                    for merge in list(ws.merged_cells):
-                        ws.unmerge_cells(str(merge))
-                        top_left = ws.cell(merge.min_row, merge.min_col).value
-                        for row in range(merge.min_row, merge.max_row + 1):
-                            for col in range(merge.min_col, merge.max_col + 1):
-                                ws.cell(row, col, top_left)
-
-                    # Convert to DataFrame
-                    data = list(ws.values)
-                    df = pd.DataFrame(data)
-
-                    # Check if DataFrame is empty or has too few rows
-                    if df.empty or len(df) < 3:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (Empty sheet or insufficient data)")
-                        continue
-
-                    # Find rows containing "NO" (safer approach)
-                    try:
-                        header_indices = df[df.apply(lambda x: x.astype(str).str.contains("NO", case=False, na=False)).any(axis=1)].index
-                        if len(header_indices) == 0:
-                            self._log(f"⚠️ Skipping '{sheet_name}' (No header row with 'NO' found)")
-                            continue
-                        header_index = header_indices[0]
-                    except Exception as e:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (Error finding header row: {str(e)})")
-                        continue
-
-                    # Use the identified header row
-                    df.columns = df.iloc[header_index].astype(str).str.strip()
-
-                    # Remove empty columns
-                    df = df.dropna(axis=1, how="all")
 
-                    # First pass of REKAP filtering
-                    try:
-                        rekap_mask = df.columns.astype(str).str.contains("REKAP", case=False, na=False)
-                        if rekap_mask.any():
-                            df = df.loc[:, ~rekap_mask]
-                    except Exception as e:
-                        self._log(f"Warning in '{sheet_name}': Error filtering REKAP columns - {str(e)}")
+        # Features are streamed straight to the final path
+        with self.timings.stage("write_geojson"):
+            self.geojson_writer.write(gdf, output_path)
+        self._record_output(output_path)
+        self._log(f"✅ Saved: {output_path}", detail=True)
 
-                    # Drop rows above and including header, plus the empty row after header
-                    rows_to_drop = list(range(0, header_index + 2))
-                    if len(df) > max(rows_to_drop) + 1:  # Make sure we have enough rows
-                        df = df.drop(index=rows_to_drop).reset_index(drop=True)
-                    else:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (Not enough data rows after header)")
-                        continue
-
-                    # Improved header row merging
-                    if len(df) >= 2:
-                        first_row = df.iloc[0].astype(str).replace('None', '').replace('nan', '')
-                        second_row = df.iloc[1].astype(str).replace('None', '').replace('nan', '')
-                        
-                        # Smart merging to avoid duplication
-                        merged_header = []
-                        for a, b in zip(first_row, second_row):
-                            a = a.strip()
-                            b = b.strip()
-                            
-                            # Skip columns with "REKAP" in the name
-                            if "rekap" in a.lower() or "rekap" in b.lower():
-                                merged_header.append("TO_BE_REMOVED")  # Mark for removal
-                                continue
-                            
-                            if not a and not b:
-                                merged_header.append("Column_" + str(len(merged_header)))
-                            elif not a:
-                                merged_header.append(b)
-                            elif not b:
-                                merged_header.append(a)
-                            else:
-                                if a.lower() in b.lower():
-                                    merged_header.append(b)
-                                elif b.lower() in a.lower():
-                                    merged_header.append(a)
-                                else:
-                                    merged_header.append(f"{a} {b}")
-                        
-                        # Ensure column names are unique
-                        df.columns = self.unique_column_names(merged_header)
-                        
-                        # Remove any columns marked for removal
-                        df = df.loc[:, ~df.columns.str.contains("TO_BE_REMOVED")]
-                        
-                        # Remove the first two rows used for headers
-                        df = df.drop(index=[0, 1]).reset_index(drop=True)
-                    else:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (Not enough rows for headers)")
-                        continue
-
-                    # Second pass of REKAP filtering after merging headers
-                    try:
-                        rekap_mask = df.columns.astype(str).str.contains("REKAP", case=False, na=False)
-                        if rekap_mask.any():
-                            df = df.loc[:, ~rekap_mask]
-                    except Exception as e:
-                        self._log(f"Warning in '{sheet_name}': Error filtering REKAP columns (second pass) - {str(e)}")
-
-                    # Normalize column names for consistent detection
-                    df.columns = [str(col).lower().strip() if col is not None else f"col_{i}" for i, col in enumerate(df.columns)]
-
-                    # Third pass of REKAP filtering after normalizing
-                    try:
-                        rekap_mask = df.columns.str.contains("rekap", case=False, na=False)
-                        if rekap_mask.any():
-                            df = df.loc[:, ~rekap_mask]
-                    except Exception as e:
-                        self._log(f"Warning in '{sheet_name}': Error filtering rekap columns (third pass) - {str(e)}")
-
-                    # Check if this sheet is about MARKA or PAGAR PENGAMAN
-                    is_marka_sheet = "marka" in sheet_name.lower() or any(col for col in df.columns if isinstance(col, str) and "marka" in col.lower())
-                    is_pagar_pengaman_sheet = "pagar pengaman" in sheet_name.lower() or any(col for col in df.columns if isinstance(col, str) and "pagar pengaman" in col.lower())
-
-                    # Find all coordinate columns using the improved function
-                    start_lat_col = self.find_coordinate_columns(df, 'start', 'lat')
-                    start_lon_col = self.find_coordinate_columns(df, 'start', 'lon')
-                    end_lat_col = self.find_coordinate_columns(df, 'end', 'lat')
-                    end_lon_col = self.find_coordinate_columns(df, 'end', 'lon')
-
-                    # Check available coordinate patterns
-                    has_start_coords = start_lat_col is not None and start_lon_col is not None
-                    has_end_coords = end_lat_col is not None and end_lon_col is not None
-
-                    if not has_start_coords:
-                        self._log(f"⚠️ Skipping '{sheet_name}' (No valid start coordinate columns found)")
-                        continue
-                    
-                    # Filter rows where both latitude and longitude values are blank
-                    if has_start_coords:
-                        # Convert coordinates to appropriate types and handle formatting issues
-                        coord_mask = df[start_lat_col].astype(str).str.strip().replace('', np.nan).notna() & \
-                                    df[start_lon_col].astype(str).str.strip().replace('', np.nan).notna()
-                        
-                        if coord_mask.any():
-                            # Only process rows with actual coordinate data
-                            df_with_coords = df[coord_mask].reset_index(drop=True)
-                            df_processed, start_errors = self.process_coordinates(df_with_coords, start_lat_col, start_lon_col, sheet_name, excel_name)
-                            
-                            # Update only the rows that had coordinates
-                            df = df.copy()
-                            df.loc[coord_mask, :] = df_processed
-                            
-                            error_logs.extend(start_errors)
-                        else:
-                            self._log(f"⚠️ No valid start coordinates found in '{sheet_name}'")
-                            continue
-
-                    if has_end_coords:
-                        # Similar filtering for end coordinates
-                        coord_mask = df[end_lat_col].astype(str).str.strip().replace('', np.nan).notna() & \
-                                    df[end_lon_col].astype(str).str.strip().replace('', np.nan).notna()
-                        
-                        if coord_mask.any():
-                            df_with_coords = df[coord_mask].reset_index(drop=True)
-                            df_processed, end_errors = self.process_coordinates(df_with_coords, end_lat_col, end_lon_col, sheet_name, excel_name)
-                            
-                            df.loc[coord_mask, :] = df_processed
-                            error_logs.extend(end_errors)
-
-                    # Check if the end coordinates actually contain valid data
-                    if has_end_coords:
-                        has_valid_end_coords = not df[end_lat_col].isna().all() and not df[end_lon_col].isna().all()
-                        valid_pairs = ((df[start_lat_col].notna() & df[start_lon_col].notna()) & (df[end_lat_col].notna() & df[end_lon_col].notna())).any()
-                    else:
-                        has_valid_end_coords = False
-                        valid_pairs = False
-                    
-                    # Determine geometry type based on available coordinates, actual data, and sheet type
-                    # MARKA sheets should use MultiPoint geometry
-                    if is_marka_sheet:
-                        self._log(f"Processing '{sheet_name}' as MultiPoint (MARKA sheet)")
-
-                        # First check if we have any valid coordinates before applying
-                        has_valid_coords = ((df[start_lat_col].notna() & df[start_lon_col].notna()) | 
-                                            (has_end_coords and df[end_lat_col].notna() & df[end_lon_col].notna())).any()
-                        
-                        if not has_valid_coords:
-                            self._log(f"⚠️ Skipping '{sheet_name}' (No valid coordinates found in MARKA sheet)")
-                            continue
-                            
-                        # Create MultiPoint geometry only for rows with valid coordinates
-                        def create_multipoint(row):
-                            try:
-                                points = []
-                                # Add start point if valid
-                                if pd.notna(row[start_lon_col]) and pd.notna(row[start_lat_col]):
-                                    points.append((float(row[start_lon_col]), float(row[start_lat_col])))
-                                    
-                                # Add end point if valid and available
-                                if has_end_coords and pd.notna(row[end_lon_col]) and pd.notna(row[end_lat_col]):
-                                    points.append((float(row[end_lon_col]), float(row[end_lat_col])))
-                                    
-                                # Return MultiPoint if we have points, else None
-                                return MultiPoint(points) if points else None
-                            except Exception as e:
-                                self._log(f"Error creating MultiPoint for row {row.name}: {str(e)}")
-                                return None
-                        
-                        # Apply the function to create geometry
-                        df["geometry"] = df.apply(create_multipoint, axis=1)
-                        
-                        # Exclude coordinate columns from properties
-                        exclude_cols = [start_lat_col, start_lon_col]
-                        if has_end_coords:
-                            exclude_cols.extend([end_lat_col, end_lon_col])
-                        exclude_cols.append("geometry")
-                        
-                    # PAGAR PENGAMAN sheets with valid start/end coordinates should use LineString
-                    elif is_pagar_pengaman_sheet and has_valid_end_coords and valid_pairs:
-                        self._log(f"Processing '{sheet_name}' as LineString (PAGAR PENGAMAN sheet)")
-                        
-                        # Create LineString geometry with additional debugging and more flexible validation
-                        def create_linestring(row):
-                            try:
-                                # Enhanced debugging
-                                start_lat = row[start_lat_col]
-                                start_lon = row[start_lon_col]
-                                end_lat = row[end_lat_col]
-                                end_lon = row[end_lon_col]
-                                
-                                # Skip processing if all coordinates are blank/NaN
-                                if pd.isna(start_lat) and pd.isna(start_lon) and pd.isna(end_lat) and pd.isna(end_lon):
-                                    return None
-                                    
-                                # First try to parse any string coordinates
-                                if isinstance(start_lat, str):
-                                    start_lat = self.parse_coordinate(start_lat)
-                                if isinstance(start_lon, str):
-                                    start_lon = self.parse_coordinate(start_lon)
-                                if isinstance(end_lat, str):
-                                    end_lat = self.parse_coordinate(end_lat)
-                                if isinstance(end_lon, str):
-                                    end_lon = self.parse_coordinate(end_lon)
-                                
-                                # Create LineString if we have valid coordinates
-                                if (pd.notna(start_lon) and pd.notna(start_lat) and 
-                                    pd.notna(end_lon) and pd.notna(end_lat)):
-                                    return LineString([
-                                        (float(start_lon), float(start_lat)),
-                                        (float(end_lon), float(end_lat))
-                                    ])
-                                else:
-                                    # If one set of coordinates is missing, fall back to Point
-                                    if pd.notna(start_lon) and pd.notna(start_lat):
-                                        offset = 0.0001
-                                        return LineString([
-                                            (float(start_lon), float(start_lat)),
-                                            (float(start_lon) + offset, float(start_lat) + offset)
-                                        ])
-                                    return None
-                            except Exception as e:
-                                self._log(f"Error creating LineString for row {row.name}: {str(e)}")
-                                return None
-                        
-                        df["geometry"] = df.apply(create_linestring, axis=1)
-                        exclude_cols = [start_lat_col, start_lon_col, end_lat_col, end_lon_col, "geometry"]
-                        
-                    else:
-                        # Other sheets use Point geometry (only start coordinates)
-                        self._log(f"Processing '{sheet_name}' as Point geometry (regular sheet)")
-                        
-                        # Create Point geometry with start coordinates, only for rows with valid data
-                        df["geometry"] = df.apply(
-                            lambda row: Point(row[start_lon_col], row[start_lat_col]) 
-                            if pd.notna(row[start_lon_col]) and pd.notna(row[start_lat_col]) else None,
-                            axis=1
-                        )
-                        
-                        # Exclude coordinate columns from properties
-                        exclude_cols = [start_lat_col, start_lon_col]
-                        if has_end_coords:
-                            exclude_cols.extend([end_lat_col, end_lon_col])
-                        exclude_cols.append("geometry")
-
-                    # Drop rows where geometry is None
-                    df = df.dropna(subset=["geometry"]).reset_index(drop=True)
-
-                    # Only create GeoDataFrame if there are valid geometries
-                    if len(df) > 0 and not df["geometry"].isnull().all():
-                        # Filter REKAP columns before creating properties
-                        properties_cols = [col for col in df.columns if col not in exclude_cols]
-                        properties_cols = [col for col in properties_cols if 'rekap' not in str(col).lower()]
-                        
-                        # Create GeoDataFrame with explicit geometry setting
-                        gdf = gpd.GeoDataFrame(df[properties_cols + ["geometry"]], geometry="geometry",crs="EPSG:4326")
-                        
-                        # Verify that the geometry column is properly set
-                        if not gdf.geometry.name == "geometry":
-                            gdf = gdf.set_geometry("geometry")
-                        
-                        gdf.columns = self.clean_column_names(gdf.columns)
-
-                        gdf = gdf.loc[:, ~gdf.columns.astype(str).str.contains("rekap", case=False, na=False)]
-                        
-                        gdf = gdf.loc[:, ~gdf.columns.astype(str).str.match(r"^None$|None_", na=False)]
-
-                        gdf.columns = gdf.columns.astype(str).str.replace(r"\sNone\b", "", regex=True).str.strip()
-
-                        # One final check for REKAP columns before saving
-                        if any('rekap' in str(col).lower() for col in gdf.columns):
-                            gdf = gdf.loc[:, ~gdf.columns.astype(str).str.contains("rekap", case=False, na=False)]
-                        
-                        # Add properties Jenis Rambu for GeoJSON properties
-                        if sheet_name.lower() == 'rambu':
-                            # Add the Jenis Rambu property
-                            gdf['Jenis Rambu'] = self.process_jenis_rambu_columns(gdf)
-
-                        # Define output file path
-                        output_path = os.path.join(output_folder, f"{excel_name}_{sheet_name}.geojson").replace(os.path.sep, '/')
-                        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-                        # Save as GeoJSON with additional parameters for image documentation
-                        self.save_to_geojson(
-                            gdf, 
-                            output_path, 
-                            batas_wilayah,
-                            excel_name=excel_name,
-                            sheet_name=sheet_name,
-                            output_base_dir=output_base_dir,
-                            jenis_jalan=jenis_jalan,
-                            tipe_jalan=tipe_jalan
-                        )
-                
-                    
-                except Exception as e:
-                    self._log(f"❌ Error processing sheet '{sheet_name}': {str(e)}")
-                    import traceback
-                    traceback.print_exc()
-                    continue
-
-            return error_logs
-        except Exception as e:
-            self._log(f"❌ Error processing file: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return error_logs
-
-    def process_single_excel_file_geojson(self,file_path, output_base_folder, batas_wilayah_path=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting"): # Process a single Excel file and convert it to GeoJSON
-        # Create output folder
-        output_folder = os.path.join(output_base_folder, "Extract GeoJSON").replace(os.path.sep, '/')
-        os.makedirs(output_folder, exist_ok=True)
-        
-        # Load the city boundaries shapefile if provided
+    def load_batas_wilayah(self, batas_wilayah_path): # Load the city boundaries shapefile if provided, as a BoundaryProvider shared by every sheet
         batas_wilayah = None
         if batas_wilayah_path and os.path.exists(batas_wilayah_path):
             try:
-                batas_wilayah = gpd.read_file(batas_wilayah_path)
+                with self.timings.stage("load_boundaries"):
+                    batas_wilayah = BoundaryProvider.load(batas_wilayah_path, self.boundary_cache_dir)
                 self._log(f"✅ Loaded city boundaries from: {batas_wilayah_path}")
             except Exception as e:
                 self._log(f"❌ Error loading city boundaries shapefile: {str(e)}")
         else:
             self._log("❌ No city boundaries provided or file not found.")
-        
-        # Get file name
+        return batas_wilayah
+
+    def resolve_qml_folder(self, qml_folder): # Check if QML folder exists
+        if qml_folder and os.path.exists(qml_folder):
+            self._log(f"✅ Using QML styles from: {qml_folder}")
+            return qml_folder
+        self._log("❌ No QML folder provided or folder not found.")
+        return None
+
+    def list_excel_files(self, input_folder): # Get all Excel files in the input folder
+        excel_extensions = ['*.xlsx', '*.xls', '*.xlsm']
+        excel_files = []
+
+        for ext in excel_extensions:
+            excel_files.extend(glob.glob(os.path.join(input_folder, ext)))
+        return excel_files
+
+    def convert_excel_file(self, file_path, output_base_folder, batas_wilayah=None, qml_folder=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting", checkpoints=None): # Produce Shapefile, GeoJSON, GeoPackage, GeoParquet and Images for one Excel file, returns coordinate error logs
+        shapefile_folder = os.path.join(output_base_folder, "Extract Shapefile").replace(os.path.sep, '/')
+        geojson_folder = os.path.join(output_base_folder, "Extract GeoJSON").replace(os.path.sep, '/')
+        geopackage_folder = os.path.join(output_base_folder, "Extract GeoPackage").replace(os.path.sep, '/')
+        geoparquet_folder = os.path.join(output_base_folder, "Extract GeoParquet").replace(os.path.sep, '/')
+        image_folder = os.path.join(os.path.abspath(output_base_folder), "Extract Images").replace(os.path.sep, '/')
+
         file_name = os.path.basename(file_path)
         excel_name = os.path.splitext(file_name)[0]
+        self.output_files = []
+        self.output_errors = 0
+
+        # Stage timers per file, and a cProfile dump of the whole file when asked for
+        self.timings.start_file(file_name)
+        started = time.perf_counter()
+        profiler = start_profile(self.profile)
 
-        error_logs = []
         try:
-            # Process the file
-            error_logs = self.flatten_excel_to_geojson(
-                file_path, 
-                output_folder, 
-                excel_name, 
-                batas_wilayah, 
-                error_logs,
-                jenis_jalan=jenis_jalan,
-                tipe_jalan=tipe_jalan
-            )
-            self._log(f"✅ Completed processing: {file_name}")
+            # A workbook that can not be opened fails the file, callers then report it instead of an empty result
+            self.workbook_cache.sheet_names(file_path)
+
+            # Vector outputs come out of the same normalized sheets, only the selected formats are written
+            sinks = []
+            if "shapefile" in self.formats:
+                sinks.append(ShapefileSink(self, shapefile_folder, qml_folder, jenis_jalan, tipe_jalan))
+            if "geojson" in self.formats:
+                sinks.append(GeoJSONSink(self, geojson_folder, jenis_jalan, tipe_jalan))
+            if "geopackage" in self.formats:
+                sinks.append(GeoPackageSink(self, geopackage_folder, jenis_jalan, tipe_jalan))
+            if "geoparquet" in self.formats:
+                sinks.append(GeoParquetSink(self, geoparquet_folder, jenis_jalan, tipe_jalan, self.geoparquet_lock))
+
+            # Stages finished by an interrupted run are taken from their checkpoint markers
+            error_logs = []
+            vectors_done = checkpoints.completed(file_path, "vectors") if checkpoints is not None and sinks else None
+            if vectors_done is not None:
+                self._log(f"⏭️ Vector outputs of {file_name} already done, resuming")
+                error_logs = vectors_done["error_logs"]
+                self.output_files.extend(vectors_done["outputs"])
+            elif sinks:
+                error_logs = self.flatten_excel(file_path, sinks, excel_name, [], batas_wilayah)
+                # A stage with failed outputs is not marked, resuming writes it again
+                if checkpoints is not None and not self.output_errors:
+                    checkpoints.mark(file_path, "vectors", error_logs, self.output_files)
+
+            images_done = checkpoints.completed(file_path, "images") if checkpoints is not None and "images" in self.formats else None
+            if images_done is not None:
+                self._log(f"⏭️ Images of {file_name} already extracted, resuming")
+                self.output_files.extend(images_done["outputs"])
+            elif "images" in self.formats:
+                # Images, only formats the image loader can read
+                images_start = len(self.output_files)
+                errors_before = self.output_errors
+                if file_path.endswith(('.xlsx', '.xlsm')):
+                    os.makedirs(image_folder, exist_ok=True)
+                    if not self.extract_images_from_excel(file_path, image_folder):
+                        self._log(f"⚠️ Images could not be extracted from {file_name}")
+                if checkpoints is not None and self.output_errors == errors_before:
+                    checkpoints.mark(file_path, "images", outputs=self.output_files[images_start:])
+        finally:
+            # All outputs are done with this workbook, release it before loading the next one
+            self.workbook_cache.evict(file_path)
+            self.timings.end_file(time.perf_counter() - started)
+            if profiler is not None:
+                dump_profile(profiler, os.path.join(output_base_folder, PROFILE_DIR, f"{excel_name}.pstats").replace(os.path.sep, '/'))
+
+        return error_logs
+
+    def check_output_errors(self, output_errors): # Fail a converted file whose outputs were not all written, so it is reported and not recorded as done
+        if output_errors:
+            raise RuntimeError(f"{output_errors} output(s) could not be written, see the errors above")
+
+    def process_single_excel_file(self, file_path, output_base_folder, qml_folder=None, batas_wilayah_path=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting"): # Process all outputs for one Excel file
+        batas_wilayah = self.load_batas_wilayah(batas_wilayah_path)
+        qml_folder = self.resolve_qml_folder(qml_folder)
+
+        file_name = os.path.basename(file_path)
+        self._log(f"Processing: {file_name}")
+
+        try:
+            error_logs = self.convert_excel_file(file_path, output_base_folder, batas_wilayah, qml_folder, jenis_jalan, tipe_jalan)
             if error_logs:
                 self._log(f"⚠️ Found {len(error_logs)} coordinate errors during processing")
+                self.log_coordinate_errors(error_logs, output_base_folder)
+            self.check_output_errors(self.output_errors)
+            self._log(f"✅ Completed processing: {file_name}")
         except Exception as e:
+            self.failed_files.append(file_name)
             self._log(f"❌ Error processing {file_name}: {str(e)}")
             import traceback
             traceback.print_exc()
 
-        self._log(f"\nProcessing: {file_name}")
-        self._log(f"\n🎉 Excel file processed. Output saved to: {output_folder}")
+        self.save_run_report(output_base_folder)
+
+        self._log(f"\n🎉 Excel file processed. Output saved to: {output_base_folder}")
         self._update_progress(100)
 
-    def process_excel_folder_geojson(self,input_folder, output_base_folder, batas_wilayah_path=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting"): # Process a folder contain excel files and convert it to GeoJSON
-        output_folder = os.path.join(output_base_folder, "Extract GeoJSON").replace(os.path.sep, '/')
-        os.makedirs(output_folder, exist_ok=True)
-        
-        # Load the city boundaries shapefile if provided
-        batas_wilayah = None
-        if batas_wilayah_path and os.path.exists(batas_wilayah_path):
-            try:
-                batas_wilayah = gpd.read_file(batas_wilayah_path)
-                self._log(f"✅ Loaded city boundaries from: {batas_wilayah_path}")
-            except Exception as e:
-                self._log(f"❌ Error loading city boundaries shapefile: {str(e)}")
-        else:
-            self._log("❌ No city boundaries provided or file not found.")
-        
-        # Get all Excel files in the input folder
-        excel_extensions = ['*.xlsx', '*.xls', '*.xlsm']
-        excel_files = []
-        
-        for ext in excel_extensions:
-            excel_files.extend(glob.glob(os.path.join(input_folder, ext)))
-        
-        # Calculate total_files to get progress_step
+    def load_run_manifest(self, output_base_folder, batas_wilayah_path=None, qml_folder=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting"): # Manifest of the earlier runs into this output folder, for incremental folder runs
+        options = RunManifest.run_options(self, jenis_jalan, tipe_jalan, batas_wilayah_path, qml_folder)
+        return RunManifest.load(output_base_folder, options)
+
+    def split_unchanged_files(self, manifest, excel_files): # Hash every input, returns {file_path: sha256} to convert and {file_path: error_logs} of the skipped ones
+        pending = {}
+        skipped = {}
+        for file_path in excel_files:
+            digest = file_sha256(file_path)
+            entry = manifest.current_entry(file_path, digest)
+            if entry is None:
+                pending[file_path] = digest
+            else:
+                skipped[file_path] = entry["error_logs"]
+
+        if skipped:
+            self._log(f"⏭️ {len(skipped)} files unchanged since the last run, skipping: {', '.join(os.path.basename(file_path) for file_path in skipped)}")
+        return pending, skipped
+
+    def start_checkpoints(self, output_base_folder, batas_wilayah_path=None, qml_folder=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting", resume=False): # Checkpoint markers of this folder run, kept from an interrupted run when resuming
+        checkpoints = CheckpointStore(output_base_folder, RunManifest.run_options(self, jenis_jalan, tipe_jalan, batas_wilayah_path, qml_folder))
+        if checkpoints.start(resume):
+            self._log("⏭️ Resuming the interrupted run, finished files and stages are skipped")
+        elif resume:
+            self._log("⚠️ No checkpoints of an interrupted run with the same options, starting from the first file")
+        return checkpoints
+
+    def process_excel_folder(self, input_folder, output_base_folder, qml_folder=None, batas_wilayah_path=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting", incremental=False, resume=False): # Process all outputs file by file so each workbook is parsed once
+        batas_wilayah = self.load_batas_wilayah(batas_wilayah_path)
+        qml_folder = self.resolve_qml_folder(qml_folder)
+
+        excel_files = self.list_excel_files(input_folder)
         total_files = len(excel_files)
-        progress_step = 40 / total_files if total_files > 0 else 0
+        progress_step = 100 / total_files if total_files > 0 else 0
+
+        # Incremental runs only convert files that are new or changed since the manifest was written
+        manifest = None
+        skipped = {}
+        if incremental:
+            manifest = self.load_run_manifest(output_base_folder, batas_wilayah_path, qml_folder, jenis_jalan, tipe_jalan)
+            pending, skipped = self.split_unchanged_files(manifest, excel_files)
+
+        # Every finished stage is marked, so an interrupted run can be resumed
+        checkpoints = self.start_checkpoints(output_base_folder, batas_wilayah_path, qml_folder, jenis_jalan, tipe_jalan, resume)
 
-        # Initialize error log list
         all_error_logs = []
-        
-        # Process each Excel file
+        failed_before = len(self.failed_files)
+
         for i, file_path in enumerate(excel_files, 1):
             file_name = os.path.basename(file_path)
-            excel_name = os.path.splitext(file_name)[0]
-            self._log(f"\n[{i}/{len(excel_files)}] Processing: {file_name}")
-            
+
+            if file_path in skipped:
+                # Errors of an unchanged file still belong in this run's error log
+                all_error_logs.extend(skipped[file_path])
+                self._update_progress(int(i * progress_step))
+                continue
+
+            self.cancel_token.check()
+            self._log(f"\n[{i}/{total_files}] Processing: {file_name}")
+
             try:
-                # Collect errors from processing this file
-                file_errors = self.flatten_excel_to_geojson(
-                    file_path, 
-                    output_folder, 
-                    excel_name, 
-                    batas_wilayah, 
-                    [],
-                    jenis_jalan=jenis_jalan,
-                    tipe_jalan=tipe_jalan
-                )
+                file_errors = self.convert_excel_file(file_path, output_base_folder, batas_wilayah, qml_folder, jenis_jalan, tipe_jalan, checkpoints)
                 all_error_logs.extend(file_errors)
-                self._log(f"✅ Completed processing: {file_name}")
                 if file_errors:
                     self._log(f"⚠️ Found {len(file_errors)} coordinate errors during processing")
+                # A file with failed outputs goes down the failed path, the manifest forgets it
+                self.check_output_errors(self.output_errors)
+                self._log(f"✅ Completed processing: {file_name}")
+                if manifest is not None:
+                    manifest.record(file_path, pending[file_path], self.output_files, file_errors)
+                    manifest.save()
             except Exception as e:
+                self.failed_files.append(file_name)
                 self._log(f"❌ Error processing {file_name}: {str(e)}")
+                if manifest is not None:
+                    manifest.forget(file_path)
+                    manifest.save()
 
             # Update progress dynamically
-            self._update_progress(int(60 + (i * progress_step)))
-            
-        self._log(f"\n🎉 All Excel files processed. Output saved to: {output_folder}")
-        self._update_progress(100)
\ No newline at end of file
+            self._update_progress(int(i * progress_step))
+
+        # The batch went through, the next run starts fresh, after failures a resume only redoes the failed files
+        if len(self.failed_files) == failed_before:
+            checkpoints.clear()
+
+        # Log all errors
+        if all_error_logs:
+            self.log_coordinate_errors(all_error_logs, output_base_folder)
+        self.save_run_report(output_base_folder)
+
+        self._log(f"\n🎉 All Excel files processed. Output saved to: {output_base_folder}")
+        self._update_progress(100)
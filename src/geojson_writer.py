@@ -0,0 +1,223 @@
+import os
+import json
+import math
+import datetime
+import numpy as np
+import pandas as pd
+import shapely
+from json.encoder import encode_basestring_ascii
+from shapely.geometry import mapping
+
+# Digits GDAL prints doubles with before trimming round-off, decimals for coordinates, significant digits for properties
+COORDINATE_DECIMALS = 15
+PROPERTY_DIGITS = 15
+PROPERTY_MAX_DIGITS = 17
+
+# Rows encoded at a time, the text of one chunk is all the writer holds on top of the GeoDataFrame
+CHUNK_ROWS = 1000
+
+
+def round_up(text): # Add one unit in the last digit of a decimal text, "0.0999" -> "0.1000"
+    chars = list(text)
+    for i in range(len(chars) - 1, -1, -1):
+        if chars[i] == ".":
+            continue
+        if chars[i] == "-":
+            break
+        if chars[i] != "9":
+            chars[i] = chr(ord(chars[i]) + 1)
+            return "".join(chars)
+        chars[i] = "0"
+    chars.insert(1 if text.startswith("-") else 0, "1")
+    return "".join(chars)
+
+
+def intelliround(text): # GDAL's trimming of a formatted double, "...0000001" and "...9999999" tails come from float round-off
+    length = len(text)
+    if length <= 10 or "." not in text or "e" in text.lower():
+        return text
+    dot = text.index(".")
+    digits_before_dot = dot - 1 - text.startswith("-")
+
+    if all(text[length - k] == "0" for k in range(2, 7)):
+        return text[:-1]
+    if (dot < length - 8 and text[length - 8] == "0" and text[length - 9] == "0"
+            and all(digits_before_dot > k or text[length - k] == "0" for k in range(3, 8))):
+        return text[:-8]
+    if all(text[length - k] == "9" for k in range(2, 7)):
+        return round_up(text[:-6])
+    if (dot < length - 9 and text[length - 8] == "9" and text[length - 9] == "9"
+            and all(digits_before_dot > k or text[length - k] == "9" for k in range(3, 8))):
+        return round_up(text[:-9])
+    return text
+
+
+class GeoJSONWriter:
+    """
+    Streams a GeoDataFrame to a GeoJSON FeatureCollection, CHUNK_ROWS features at a time, into a temporary file that
+    replaces the final path only once it is complete.
+    pretty=True reproduces the indent=4 layout of the former write/re-read/re-dump in clean_geojson, pretty=False
+    writes compact JSON. Coordinates are rounded to precision decimals, None writes the digits the GDAL driver wrote,
+    which also drops float round-off noise.
+    """
+    def __init__(self, pretty=True, precision=None) -> None:
+        self.pretty = pretty
+        self.precision = precision
+
+    def write(self, gdf, output_path, name=None):
+        if name is None:
+            name = os.path.splitext(os.path.basename(output_path))[0]
+
+        header = {"type": "FeatureCollection", "name": name}
+        crs = self.crs_member(gdf.crs)
+        if crs is not None:
+            header["crs"] = crs
+
+        temp_path = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as file:
+                if self.pretty:
+                    file.write(json.dumps(header, indent=4)[:-2] + ',\n    "features": ')
+                else:
+                    file.write(json.dumps(header, separators=(",", ":"))[:-1] + ',"features":')
+
+                # Features are written chunk by chunk, the text of at most CHUNK_ROWS features is held at a time
+                first = True
+                for feature in self.iter_feature_texts(gdf):
+                    file.write(("[" if first else ",") + ("\n" + self._indent(2) if self.pretty else "") + feature)
+                    first = False
+
+                if first:
+                    file.write("[]")
+                else:
+                    file.write("\n" + self._indent(1) + "]" if self.pretty else "]")
+                file.write("\n}" if self.pretty else "}")
+
+            os.replace(temp_path, output_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def iter_feature_texts(self, gdf): # Yield each feature already encoded, properties are converted column by column for each chunk of rows
+        geometry_name = gdf.geometry.name
+        property_cols = [col for col in gdf.columns if col != geometry_name]
+        keys = [encode_basestring_ascii(str(col)) for col in property_cols]
+        # Whether an object column holds datetimes depends on the whole column, not on the rows of a chunk
+        datetime_cols = [self.is_datetime_column(gdf[col]) for col in property_cols]
+
+        for start in range(0, len(gdf), CHUNK_ROWS):
+            chunk = gdf.iloc[start:start + CHUNK_ROWS]
+            columns = [self.column_texts(chunk[col], is_datetime) for col, is_datetime in zip(property_cols, datetime_cols)]
+            geometries = self.round_geometries(chunk.geometry.values)
+
+            for i, geometry in enumerate(geometries):
+                properties = self._object([(key, values[i]) for key, values in zip(keys, columns)], 4)
+                yield self._object([
+                    ('"type"', '"Feature"'),
+                    ('"properties"', properties),
+                    ('"geometry"', self.geometry_text(geometry, 4)),
+                ], 3)
+
+    def _indent(self, level):
+        return "    " * level
+
+    def _object(self, members, level): # Encode pre-encoded (key, value) pairs as a JSON object at the given nesting level
+        if not members:
+            return "{}"
+        if not self.pretty:
+            return "{" + ",".join(f"{key}:{value}" for key, value in members) + "}"
+        inner = ",\n".join(f"{self._indent(level)}{key}: {value}" for key, value in members)
+        return "{\n" + inner + "\n" + self._indent(level - 1) + "}"
+
+    def _array(self, items, level):
+        if not items:
+            return "[]"
+        if not self.pretty:
+            return "[" + ",".join(items) + "]"
+        return "[\n" + ",\n".join(self._indent(level) + item for item in items) + "\n" + self._indent(level - 1) + "]"
+
+    def geometry_text(self, geometry, level):
+        if geometry is None or geometry.is_empty:
+            return "null"
+
+        geom_type = geometry.geom_type
+        if geom_type == "Point":
+            coordinates = self._array([repr(value) for value in geometry.coords[0]], level + 1)
+        elif geom_type in ("LineString", "MultiPoint"):
+            coords = shapely.get_coordinates(geometry).tolist()
+            coordinates = self._array([self._array([repr(value) for value in xy], level + 2) for xy in coords], level + 1)
+        else:
+            # Polygons and collections never come out of the sheets, let the json module lay them out
+            if self.pretty:
+                return json.dumps(mapping(geometry), indent=4).replace("\n", "\n" + self._indent(level - 1))
+            return json.dumps(mapping(geometry), separators=(",", ":"))
+
+        return self._object([('"type"', f'"{geom_type}"'), ('"coordinates"', coordinates)], level)
+
+    def round_geometries(self, geometries): # Apply the coordinate precision to every geometry in one pass
+        geometries = np.asarray(geometries, dtype=object)
+        round_coords = lambda coords: np.array([self.round_coordinate(value) for value in coords.ravel()]).reshape(coords.shape)
+        return shapely.transform(geometries, round_coords)
+
+    def round_coordinate(self, value): # Python round on purpose, np.round is not exact
+        if self.precision is not None:
+            return round(float(value), self.precision)
+
+        # 15 decimals trimmed like the GDAL driver (107.59192499999999 -> 107.591925)
+        return float(intelliround(f"{float(value):.{COORDINATE_DECIMALS}f}"))
+
+    def is_datetime_column(self, series): # Object column whose values are all datetimes, GDAL writes them as such
+        return series.dtype.kind not in "iubfM" and pd.api.types.infer_dtype(series) == "datetime"
+
+    def column_texts(self, series, is_datetime=None): # Encode a column to JSON the way the GDAL GeoJSON driver types it, is_datetime=None infers it from series
+        kind = series.dtype.kind
+        if kind in "iu":
+            return [str(int(value)) for value in series]
+        if kind == "b":
+            return ["true" if value else "false" for value in series]
+        if kind == "f":
+            return [self.float_text(value) for value in series]
+        if kind == "M":
+            return ["null" if pd.isna(value) else f'"{self.format_datetime(value)}"' for value in series]
+
+        # Object columns are written as strings, unless every value is a datetime
+        if is_datetime is None:
+            is_datetime = self.is_datetime_column(series)
+        if is_datetime:
+            return ["null" if self.is_null(value) else f'"{self.format_datetime(value)}"' for value in series]
+        return ["null" if self.is_null(value) else encode_basestring_ascii(value if isinstance(value, str) else str(value)) for value in series]
+
+    def float_text(self, value):
+        value = float(value)
+        if math.isnan(value):
+            return "null"
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+
+        # 15 significant digits when they read back the same double, else 17 trimmed like the coordinates
+        text = f"{value:.{PROPERTY_DIGITS}g}"
+        if float(text) != value:
+            text = intelliround(f"{value:.{PROPERTY_MAX_DIGITS}g}")
+        return repr(float(text))
+
+    def is_null(self, value):
+        return value is None or value is pd.NaT or value is pd.NA or (isinstance(value, float) and math.isnan(value))
+
+    def format_datetime(self, value):
+        text = value.strftime("%Y-%m-%dT%H:%M:%S")
+        if isinstance(value, datetime.datetime) and value.microsecond // 1000:
+            text += f".{value.microsecond // 1000:03d}"
+        return text
+
+    def crs_member(self, crs): # Legacy "crs" member written by GDAL, CRS84 for WGS84
+        if crs is None:
+            return None
+        if crs == "EPSG:4326":
+            urn = "urn:ogc:def:crs:OGC:1.3:CRS84"
+        else:
+            epsg = crs.to_epsg()
+            if epsg is None:
+                return None
+            urn = f"urn:ogc:def:crs:EPSG::{epsg}"
+        return {"type": "name", "properties": {"name": urn}}
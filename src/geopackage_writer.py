@@ -0,0 +1,155 @@
+import os
+import struct
+import sqlite3
+from contextlib import nullcontext
+
+import shapely
+
+# Geometry type of new layers, GEOMETRY takes the points, multipoints and lines of every workbook sheet
+GEOMETRY_TYPE = "Unknown"
+
+# Bytes of the envelope in a GeoPackage geometry blob header, by the envelope indicator of its flags
+ENVELOPE_SIZES = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}
+
+
+def quote_identifier(name): # Table or column name quoted for SQLite
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def geometry_bounds(blob): # (minx, maxx, miny, maxy) of a GeoPackage geometry blob, None for an empty geometry
+    flags = blob[3]
+    if flags & 0x10:
+        return None
+    envelope_size = ENVELOPE_SIZES[(flags >> 1) & 0x07]
+    if envelope_size:
+        return struct.unpack_from("<4d" if flags & 0x01 else ">4d", blob, 8)
+
+    # Points are written without an envelope
+    geometry = shapely.from_wkb(bytes(blob[8:]))
+    if geometry.is_empty:
+        return None
+    minx, miny, maxx, maxy = geometry.bounds
+    return minx, maxx, miny, maxy
+
+
+def geometry_bound(index): # SQL function returning one coordinate of the geometry bounds, as GDAL registers it
+    def bound(blob):
+        if blob is None:
+            return None
+        bounds = geometry_bounds(blob)
+        return None if bounds is None else bounds[index]
+    return bound
+
+
+class GeoPackageWriter:
+    """
+    Replaces the rows one source wrote to the layers of a GeoPackage file, in one transaction per file.
+    GDAL encodes the rows into a staging GeoPackage, then one SQLite transaction removes the rows of an earlier run of
+    the same source from every layer, adds the fields the layers lack and copies the staged rows in. A failed replace
+    leaves the file as it was, except for layers the file did not have yet, which GDAL creates afterwards.
+    Fields are matched by name, fields the frame lacks stay empty. Column names are kept in full.
+    Layers are created with the generic GEOMETRY type, so sheets of one type with points or lines share a layer.
+    lock serializes writers in different processes, SQLite allows one writer per file at a time.
+    """
+    def __init__(self, lock=None) -> None:
+        self.lock = lock
+
+    def replace(self, output_path, layers, source_column=None, source_value=None): # Remove the rows of an earlier run whose source_column equals source_value from every layer, then add the frames of layers ({layer name: gdf})
+        with self.lock if self.lock is not None else nullcontext():
+            existing = self.layer_names(output_path) if os.path.exists(output_path) else []
+            staged = {layer: gdf for layer, gdf in layers.items() if layer in existing}
+
+            if existing and (staged or source_column is not None):
+                staging_path = f"{output_path}.{os.getpid()}.staging.gpkg"
+                try:
+                    for layer, gdf in staged.items():
+                        gdf.to_file(staging_path, layer=layer, driver="GPKG", geometry_type=GEOMETRY_TYPE)
+                    self.merge(staging_path if staged else None, output_path, existing, list(staged), source_column, source_value)
+                finally:
+                    if os.path.exists(staging_path):
+                        os.remove(staging_path)
+
+            # Layers the GeoPackage does not have yet are created by GDAL, once the earlier rows of the source are gone
+            for layer, gdf in layers.items():
+                if layer not in existing:
+                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                    gdf.to_file(output_path, layer=layer, driver="GPKG", geometry_type=GEOMETRY_TYPE)
+
+    def layer_names(self, output_path): # Feature tables registered in the GeoPackage
+        connection = sqlite3.connect(output_path)
+        try:
+            return [row[0] for row in connection.execute("SELECT table_name FROM gpkg_contents WHERE data_type = 'features'")]
+        finally:
+            connection.close()
+
+    def field_names(self, connection, layer, schema="main"): # Attribute columns of a layer in table order, and its geometry column
+        geometry_name = connection.execute(f"SELECT column_name FROM {schema}.gpkg_geometry_columns WHERE table_name = ?", (layer,)).fetchone()[0]
+        columns = connection.execute(f"PRAGMA {schema}.table_info({quote_identifier(layer)})").fetchall()
+        # pk marks the integer primary key GDAL uses as feature id
+        fields = [(column[1], column[2]) for column in columns if not column[5] and column[1].lower() != geometry_name.lower()]
+        return fields, geometry_name
+
+    def connect(self, output_path): # Connection with the SQL functions the rtree triggers of GDAL call
+        connection = sqlite3.connect(output_path, isolation_level=None)
+        connection.create_function("ST_IsEmpty", 1, lambda blob: None if blob is None else int(geometry_bounds(blob) is None))
+        for index, name in enumerate(("ST_MinX", "ST_MaxX", "ST_MinY", "ST_MaxY")):
+            connection.create_function(name, 1, geometry_bound(index))
+        return connection
+
+    def merge(self, staging_path, output_path, layers, staged_layers, source_column=None, source_value=None): # Remove the rows of source_value from layers and move the staged layers in, in one transaction
+        connection = self.connect(output_path)
+        try:
+            if staging_path is not None:
+                connection.execute("ATTACH DATABASE ? AS staging", (staging_path,))
+
+            # BEGIN IMMEDIATE takes the write lock up front, the ALTER TABLE is part of the transaction
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # A sheet removed from the workbook or features moved to another region leave no rows behind
+                if source_column is not None:
+                    for layer in layers:
+                        fields, _ = self.field_names(connection, layer)
+                        column = {name.lower(): name for name, _ in fields}.get(source_column.lower())
+                        if column is not None:
+                            connection.execute(f"DELETE FROM {quote_identifier(layer)} WHERE {quote_identifier(column)} = ?", (source_value,))
+
+                for layer in staged_layers:
+                    self.insert_staged(connection, layer)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        finally:
+            connection.close()
+
+    def insert_staged(self, connection, layer): # Copy the staged rows of layer in, adding the fields the layer lacks
+        fields, geometry_name = self.field_names(connection, layer)
+        staged_fields, staged_geometry = self.field_names(connection, layer, "staging")
+
+        # SQLite column names are case-insensitive, "KONDISI" fills an existing "Kondisi" field
+        existing = {name.lower(): name for name, _ in fields}
+        new_fields = [(name, field_type) for name, field_type in staged_fields if name.lower() not in existing]
+        targets = [existing.get(name.lower(), name) for name, _ in staged_fields]
+
+        table = quote_identifier(layer)
+        columns = ", ".join(quote_identifier(name) for name in [geometry_name] + targets)
+        values = ", ".join(quote_identifier(name) for name in [staged_geometry] + [name for name, _ in staged_fields])
+
+        for name, field_type in new_fields:
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {quote_identifier(name)} {field_type}")
+        connection.execute(f"INSERT INTO {table} ({columns}) SELECT {values} FROM staging.{table}")
+        # Layers written before GEOMETRY was used may carry the type of their first workbook
+        connection.execute("UPDATE gpkg_geometry_columns SET geometry_type_name = 'GEOMETRY' WHERE table_name = ?", (layer,))
+        self.update_extent(connection, layer)
+
+    def update_extent(self, connection, layer): # Grow the layer extent in gpkg_contents by the staged rows
+        staged = connection.execute("SELECT min_x, min_y, max_x, max_y FROM staging.gpkg_contents WHERE table_name = ?", (layer,)).fetchone()
+        current = connection.execute("SELECT min_x, min_y, max_x, max_y FROM gpkg_contents WHERE table_name = ?", (layer,)).fetchone()
+        if staged is None or None in staged:
+            return
+        if current is not None and None not in current:
+            staged = (min(current[0], staged[0]), min(current[1], staged[1]), max(current[2], staged[2]), max(current[3], staged[3]))
+        connection.execute(
+            "UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ?, last_change = strftime('%Y-%m-%dT%H:%M:%fZ', 'now') WHERE table_name = ?",
+            (*staged, layer)
+        )
@@ -0,0 +1,41 @@
+import io
+from PIL import Image
+
+# Leading bytes of the media formats openpyxl keeps untouched inside xl/media
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+]
+
+IMAGE_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "gif": ".gif"}
+
+
+def detect_image_format(data): # Format of raw image bytes from their signature, None when unknown
+    for signature, image_format in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return image_format
+    return None
+
+
+def image_extension(image_format, image_mode="png"): # File extension export_image writes for an image of this format, without reading its bytes
+    # openpyxl keeps gif, jpeg and png media as they are and hands every other format over as PNG
+    if image_mode == "original" and image_format in IMAGE_EXTENSIONS:
+        return IMAGE_EXTENSIONS[image_format]
+    return ".png"
+
+
+def export_image(data, image_mode="png"): # Bytes and file extension to write for one embedded image
+    image_format = detect_image_format(data)
+
+    if image_mode == "original" and image_format is not None:
+        return data, IMAGE_EXTENSIONS[image_format]
+
+    if image_format == "png":
+        return data, ".png"
+
+    # Only media that is not already in the requested format is decoded and re-encoded
+    with Image.open(io.BytesIO(data)) as img, io.BytesIO() as img_buffer:
+        img.save(img_buffer, format="PNG")
+        return img_buffer.getvalue(), ".png"
@@ -0,0 +1,46 @@
+import time
+import threading
+
+# Defaults for the UI: at most 4 log updates per second, and never more than 200 lines in one update
+FLUSH_INTERVAL = 0.25
+MAX_BATCH = 200
+
+
+class BufferedLogSink:
+    """
+    Log callback that collects messages and hands them to its target as one newline-joined batch, at most every
+    interval seconds or once max_batch messages are waiting. Messages left in the buffer are sent by a timer, so a
+    quiet stretch never holds back the last lines. Call close() when the run ends to send the rest.
+    """
+    def __init__(self, target, interval=FLUSH_INTERVAL, max_batch=MAX_BATCH) -> None:
+        self.target = target # Called with one string per batch
+        self.interval = interval
+        self.max_batch = max_batch
+        self._messages = []
+        self._lock = threading.Lock()
+        self._timer = None
+        self._last_flush = time.monotonic()
+
+    def __call__(self, message):
+        with self._lock:
+            self._messages.append(message)
+            due = len(self._messages) >= self.max_batch or time.monotonic() - self._last_flush >= self.interval
+            if not due and self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def flush(self): # Send every waiting message as one batch, under the lock so batches keep their order
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._last_flush = time.monotonic()
+            if self._messages:
+                messages, self._messages = self._messages, []
+                self.target("\n".join(messages))
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,8 @@
+# Output choices, kept free of the conversion libraries so the command line and the UI can list them without loading them
+
+# Outputs convert_excel_file can produce and the ones written when no formats are given
+OUTPUT_FORMATS = ("shapefile", "geojson", "images", "geopackage", "geoparquet")
+DEFAULT_FORMATS = ("shapefile", "geojson", "images")
+
+# "png" writes every image as PNG (the historical output), "original" keeps the media as stored in the workbook
+IMAGE_MODES = ("png", "original")
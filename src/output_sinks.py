@@ -0,0 +1,342 @@
+import os
+import glob
+from contextlib import nullcontext
+import pandas as pd
+import geopandas as gpd
+
+# Provenance columns of the outputs that mix features of several workbooks
+SOURCE_EXCEL = "Source Excel"
+SOURCE_SHEET = "Source Sheet"
+
+# Hive partition keys of the GeoParquet dataset, key=value folders in this order
+PARQUET_PARTITIONS = ("kota_kabupaten", "jenis_jalan", "tipe_jalan")
+PARQUET_COMPRESSION = "zstd"
+
+
+class OutputSink:
+    """
+    Consumes the GeoDataFrame of each sheet produced by ExcelConverter.normalize_sheet, already joined to the region
+    boundaries (NAMOBJ column) when they are provided. The frame is shared by every sink, write() must not modify it.
+    A new output format only needs a sink with write() and, if it buffers, close() and abort().
+    """
+    def __init__(self, converter, output_folder) -> None:
+        self.converter = converter
+        self.output_folder = output_folder
+        os.makedirs(self.output_folder, exist_ok=True)
+
+    def output_path(self, excel_name, sheet_name, extension): # Path the sheet output is saved to before region grouping
+        output_path = os.path.join(self.output_folder, f"{excel_name}_{sheet_name}{extension}").replace(os.path.sep, '/')
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        return output_path
+
+    def write(self, gdf, excel_name, sheet_name):
+        raise NotImplementedError
+
+    def close(self): # Called once all sheets of a file have been written
+        pass
+
+    def abort(self): # Called instead of close() when the file is cancelled or fails, nothing buffered may be written
+        pass
+
+
+class ShapefileSink(OutputSink):
+    def __init__(self, converter, output_folder, qml_folder=None, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting") -> None:
+        super().__init__(converter, output_folder)
+        self.qml_folder = qml_folder
+        self.jenis_jalan = jenis_jalan
+        self.tipe_jalan = tipe_jalan
+
+    def write(self, gdf, excel_name, sheet_name):
+        output_path = self.output_path(excel_name, sheet_name, ".shp")
+        self.converter.save_to_shapefile(gdf, output_path, qml_folder=self.qml_folder, jenis_jalan=self.jenis_jalan, tipe_jalan=self.tipe_jalan)
+
+
+class GeoJSONSink(OutputSink):
+    def __init__(self, converter, output_folder, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting") -> None:
+        super().__init__(converter, output_folder)
+        self.jenis_jalan = jenis_jalan
+        self.tipe_jalan = tipe_jalan
+
+        # Base directory used to build the image paths stored in the features
+        self.output_base_dir = os.path.dirname(os.path.dirname(output_folder))
+
+    def write(self, gdf, excel_name, sheet_name):
+        output_path = self.output_path(excel_name, sheet_name, ".geojson")
+        self.converter.save_to_geojson(
+            gdf,
+            output_path,
+            excel_name=excel_name,
+            sheet_name=sheet_name,
+            output_base_dir=self.output_base_dir,
+            jenis_jalan=self.jenis_jalan,
+            tipe_jalan=self.tipe_jalan
+        )
+
+
+class GeoPackageSink(OutputSink):
+    """
+    Appends the sheets of a workbook to one GeoPackage per region (NAMOBJ of the boundaries, "Unknown Daerah" without
+    them) under <jenis_jalan>/<tipe_jalan>, with one layer per sheet type and full column names.
+    Sheets are collected by write() and written by close(), one transaction per GeoPackage for the whole workbook.
+    Rows a previous run wrote for the same workbook are removed from every layer and GeoPackage of the jenis/tipe
+    folder, also those of sheets the workbook no longer has. A cancelled or failed workbook writes no layer.
+    """
+    def __init__(self, converter, output_folder, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting") -> None:
+        super().__init__(converter, output_folder)
+        self.jenis_jalan = jenis_jalan
+        self.tipe_jalan = tipe_jalan
+        self.excel_name = None
+        self.layers = {} # (GeoPackage path, layer name) -> sheet frames waiting for close()
+
+    def geopackage_path(self, region):
+        output_dir = os.path.join(self.output_folder, self.jenis_jalan, self.tipe_jalan)
+        return os.path.join(output_dir, f"{self.converter.sanitize_for_path(region)}.gpkg").replace(os.path.sep, '/')
+
+    def write(self, gdf, excel_name, sheet_name):
+        self.excel_name = excel_name
+        gdf = gdf.drop(columns=[col for col in gdf.columns if 'Column' in col or 'column' in col])
+        gdf[SOURCE_EXCEL] = excel_name
+        gdf[SOURCE_SHEET] = sheet_name
+
+        # Sheets of the same type share a layer, whatever the case or spacing of their names
+        layer = sheet_name.strip().upper()
+        groups = gdf.groupby('NAMOBJ') if 'NAMOBJ' in gdf.columns else [("Unknown Daerah", gdf)]
+        for region, group in groups:
+            if pd.isna(region):
+                region = "Unknown"
+            self.layers.setdefault((self.geopackage_path(region), layer), []).append(group)
+
+    def close(self):
+        self.converter.timings.sheet_name = None
+        geopackages = {}
+        for (output_path, layer), frames in self.layers.items():
+            gdf = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), geometry=frames[0].geometry.name, crs=frames[0].crs)
+            geopackages.setdefault(output_path, {})[layer] = gdf
+
+        # GeoPackages of other regions lose the rows an earlier run of the workbook wrote there
+        if self.excel_name is not None:
+            output_dir = os.path.join(self.output_folder, self.jenis_jalan, self.tipe_jalan)
+            for output_path in glob.glob(os.path.join(glob.escape(output_dir), "*.gpkg")):
+                # Staging files of other workers are theirs to remove
+                if not output_path.endswith(".staging.gpkg"):
+                    geopackages.setdefault(output_path.replace(os.path.sep, '/'), {})
+
+        for output_path, layers in sorted(geopackages.items()):
+            try:
+                with self.converter.timings.stage("write_geopackage"):
+                    self.converter.geopackage_writer.replace(output_path, layers, SOURCE_EXCEL, self.excel_name)
+                if layers:
+                    self.converter._record_output(output_path)
+                    self.converter._log(f"✅ Saved: {output_path} (layers {', '.join(layers)})", detail=True)
+            except Exception as e:
+                self.converter._log(f"❌ Error saving GeoPackage {output_path}: {str(e)}")
+                self.converter.output_errors += 1
+        self.layers = {}
+
+    def abort(self): # Drop the buffered sheets, the layers keep the rows an earlier run wrote for the workbook
+        self.layers = {}
+
+
+class GeoParquetSink(OutputSink):
+    """
+    Writes the features of a workbook to a GeoParquet dataset partitioned hive-style by kota_kabupaten, jenis_jalan
+    and tipe_jalan, one <excel>.parquet per partition holding every sheet of the workbook. The partition values live
+    in the folder names, so readers can filter on them without opening the files.
+    Attributes match the GeoJSON features plus the "Source Excel"/"Source Sheet" provenance columns. They keep their
+    native types, unified with the files other workbooks wrote to the dataset, only a column whose types conflict (text
+    in a number column) is stored as strings. A rerun replaces the files of its workbook, also removing those left in
+    partitions it no longer writes to.
+    lock serializes the workbooks of parallel workers, each one reads the dataset schemas, rewrites the files of the
+    others and writes its own while holding it.
+    """
+    def __init__(self, converter, output_folder, jenis_jalan="Jalan Prioritas", tipe_jalan="Eksisting", lock=None) -> None:
+        super().__init__(converter, output_folder)
+        self.jenis_jalan = jenis_jalan
+        self.tipe_jalan = tipe_jalan
+        self.lock = lock
+        self.excel_name = None
+        self.partitions = {} # Partition folder -> sheet frames waiting for close()
+
+        # Base directory used to build the image paths, the same as for the GeoJSON features
+        self.output_base_dir = os.path.dirname(os.path.dirname(output_folder))
+
+    def partition_folder(self, region):
+        values = (region, self.jenis_jalan, self.tipe_jalan)
+        parts = [f"{key}={self.converter.sanitize_for_path(value)}" for key, value in zip(PARQUET_PARTITIONS, values)]
+        return os.path.join(self.output_folder, *parts).replace(os.path.sep, '/')
+
+    def write(self, gdf, excel_name, sheet_name):
+        self.excel_name = excel_name
+        # The image paths are added in place, on a copy of the shared frame
+        gdf = gdf.rename(columns={'NAMOBJ': 'Kota/Kabupaten'})
+        gdf = self.converter.add_image_documentation_paths(gdf, excel_name, sheet_name, self.output_base_dir)
+        gdf = self.converter.add_image_paths(gdf, excel_name, sheet_name, self.output_base_dir)
+        gdf = gdf.drop(columns=[col for col in gdf.columns if 'Column' in col or 'column' in col])
+        gdf[SOURCE_EXCEL] = excel_name
+        gdf[SOURCE_SHEET] = sheet_name
+
+        groups = gdf.groupby('Kota/Kabupaten') if 'Kota/Kabupaten' in gdf.columns else [("Unknown Daerah", gdf)]
+        for region, group in groups:
+            if pd.isna(region):
+                region = "Unknown"
+            # The region is the partition value, it is not repeated inside the file
+            group = group.drop(columns=['Kota/Kabupaten'], errors='ignore')
+            self.partitions.setdefault(self.partition_folder(region), []).append(group)
+
+    def file_name(self):
+        return f"{self.converter.sanitize_for_path(self.excel_name)}.parquet"
+
+    def temp_path(self, folder): # Readers skip files starting with a dot, a half-written file never shows up in the dataset
+        return os.path.join(folder, f".{self.file_name()}.{os.getpid()}.tmp").replace(os.path.sep, '/')
+
+    def remove_stale_files(self, folders): # Remove the files an earlier run of the workbook left in partitions it no longer writes
+        pattern = os.path.join(glob.escape(self.output_folder), "**", glob.escape(self.file_name()))
+        for path in glob.glob(pattern, recursive=True):
+            path = path.replace(os.path.sep, '/')
+            if os.path.dirname(path) in folders:
+                continue
+            try:
+                os.remove(path)
+                self.converter.parquet_schemas.pop(path, None)
+                self.converter._log(f"✅ Removed stale {path}", detail=True)
+            except Exception as e:
+                self.converter._log(f"❌ Error removing stale GeoParquet {path}: {str(e)}")
+                self.converter.output_errors += 1
+
+    def dataset_schemas(self): # {path: schema} of the files other workbooks wrote to the dataset, a footer is only read again once its file changed
+        import pyarrow.parquet as pq
+
+        schemas = {}
+        for path in glob.glob(os.path.join(glob.escape(self.output_folder), "**", "*.parquet"), recursive=True):
+            file_name = os.path.basename(path)
+            if file_name.startswith(".") or file_name == self.file_name():
+                continue
+            path = path.replace(os.path.sep, '/')
+            try:
+                stat = os.stat(path)
+                stamp = (stat.st_size, stat.st_mtime_ns)
+                cached = self.converter.parquet_schemas.get(path)
+                if cached is None or cached[0] != stamp:
+                    cached = (stamp, pq.read_schema(path))
+                    self.converter.parquet_schemas[path] = cached
+                schemas[path] = cached[1]
+            except Exception as e:
+                self.converter._log(f"⚠️ Could not read the schema of {path}: {str(e)}")
+        return schemas
+
+    def column_types(self, gdfs, dataset_schemas): # Arrow type of every attribute column, unified over the workbook and the dataset
+        import pyarrow as pa
+
+        types = {}
+        for gdf in gdfs:
+            for col in gdf.columns:
+                if col == gdf.geometry.name:
+                    continue
+                try:
+                    arrow_type = pa.array(gdf[col], from_pandas=True).type
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    # Numbers and text mixed in one column of the workbook
+                    arrow_type = pa.string()
+                types.setdefault(col, []).append(arrow_type)
+        for schema in dataset_schemas.values():
+            for field in schema:
+                if field.name in types:
+                    types[field.name].append(field.type)
+
+        # Permissive promotion widens int to double and null to any type, the remaining conflicts are stored as text
+        unified = {}
+        for col, arrow_types in types.items():
+            try:
+                unified[col] = pa.unify_schemas([pa.schema([pa.field(col, arrow_type)]) for arrow_type in arrow_types], promote_options="permissive").field(col).type
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                unified[col] = pa.string()
+        return unified
+
+    def align_dataset(self, dataset_schemas, column_types): # Rewrite the files of other workbooks whose column types changed, so the dataset keeps one schema
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        for path, schema in dataset_schemas.items():
+            changes = {field.name: column_types[field.name] for field in schema if field.name in column_types and field.type != column_types[field.name]}
+            if not changes:
+                continue
+
+            temp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp").replace(os.path.sep, '/')
+            try:
+                table = pq.read_table(path)
+                for name, arrow_type in changes.items():
+                    index = table.schema.get_field_index(name)
+                    table = table.set_column(index, pa.field(name, arrow_type), pc.cast(table.column(index), arrow_type))
+                # The pandas metadata still names the old dtypes, readers fall back to the Arrow types
+                table = table.replace_schema_metadata({key: value for key, value in (table.schema.metadata or {}).items() if key != b"pandas"})
+                pq.write_table(table, temp_path, compression=PARQUET_COMPRESSION)
+                os.replace(temp_path, path)
+                self.converter._log(f"✅ Retyped {', '.join(changes)} in {path}", detail=True)
+            except Exception as e:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                self.converter._log(f"❌ Error retyping GeoParquet {path}: {str(e)}")
+                self.converter.output_errors += 1
+
+    def conform(self, gdf, column_types): # Cast the columns to the pandas dtypes that are written as their unified Arrow types
+        import pyarrow as pa
+
+        for col, arrow_type in column_types.items():
+            if col not in gdf.columns:
+                continue
+            values = gdf[col]
+            # Nullable dtypes, so a column with empty cells keeps its type and an empty text column is not null typed
+            if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+                gdf[col] = values.map(lambda value: None if pd.isna(value) else str(value)).astype("string")
+            elif pa.types.is_integer(arrow_type):
+                gdf[col] = values.astype("Int64")
+            elif pa.types.is_floating(arrow_type):
+                gdf[col] = values.astype("float64")
+            elif pa.types.is_boolean(arrow_type):
+                gdf[col] = values.astype("boolean")
+            elif pa.types.is_timestamp(arrow_type):
+                gdf[col] = pd.to_datetime(values)
+        return gdf
+
+    def close(self):
+        self.converter.timings.sheet_name = None
+        gdfs = {folder: gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), geometry=frames[0].geometry.name, crs=frames[0].crs) for folder, frames in self.partitions.items()}
+        if gdfs:
+            # Another worker never rewrites a file between the footer read and the write of this workbook
+            with self.lock if self.lock is not None else nullcontext():
+                self.write_dataset(gdfs)
+        self.partitions = {}
+
+    def write_dataset(self, gdfs): # Unify the column types with the dataset, retype the files of other workbooks and write the files of this one
+        self.remove_stale_files(gdfs)
+        dataset_schemas = self.dataset_schemas()
+        column_types = self.column_types(gdfs.values(), dataset_schemas)
+        with self.converter.timings.stage("write_geoparquet"):
+            self.align_dataset(dataset_schemas, column_types)
+        for folder, gdf in gdfs.items():
+            output_path = os.path.join(folder, self.file_name()).replace(os.path.sep, '/')
+            if gdf.geometry.name != "geometry":
+                gdf = gdf.rename_geometry("geometry")
+
+            temp_path = self.temp_path(folder)
+            try:
+                os.makedirs(folder, exist_ok=True)
+                with self.converter.timings.stage("write_geoparquet"):
+                    gdf = self.conform(gdf, column_types)
+                    gdf.to_parquet(temp_path, compression=PARQUET_COMPRESSION, index=False)
+                os.replace(temp_path, output_path)
+                self.converter._record_output(output_path)
+                self.converter._log(f"✅ Saved: {output_path}", detail=True)
+            except Exception as e:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                self.converter._log(f"❌ Error saving GeoParquet {output_path}: {str(e)}")
+                self.converter.output_errors += 1
+
+    def abort(self): # Drop the buffered sheets, the file an earlier run wrote for the workbook stays in place
+        for folder in self.partitions:
+            temp_path = self.temp_path(folder)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.partitions = {}
@@ -0,0 +1,119 @@
+import os
+import json
+import glob
+import hashlib
+import numpy as np
+
+MANIFEST_NAME = "run_manifest.json"
+
+# Bump when the manifest layout changes, older manifests are then ignored
+MANIFEST_VERSION = 1
+
+# Files that make up a shapefile layer, all of them change the boundaries used for the join
+BOUNDARY_PARTS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+
+def file_sha256(file_path, chunk_size=1 << 20): # Content hash of a file, read in chunks
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def files_sha256(file_paths): # One hash over several files, names included so a renamed part counts as a change
+    digest = hashlib.sha256()
+    for file_path in sorted(file_paths):
+        digest.update(os.path.basename(file_path).encode("utf-8"))
+        digest.update(file_sha256(file_path).encode("ascii"))
+    return digest.hexdigest()
+
+
+def json_value(value): # Error log values as plain JSON types
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+class RunManifest:
+    """
+    Record of a folder run kept in the output folder (run_manifest.json): per input file its sha256, the options it
+    was converted with and the outputs and coordinate errors it produced.
+    An input whose hash and options are unchanged and whose outputs still exist is skipped by the next run.
+    """
+    def __init__(self, output_folder, options) -> None:
+        self.path = os.path.join(output_folder, MANIFEST_NAME).replace(os.path.sep, '/')
+        self.output_folder = output_folder
+        self.options = options
+        self.files = {}
+
+    @classmethod
+    def load(cls, output_folder, options): # Manifest of the output folder, empty when missing, unreadable or from another version
+        manifest = cls(output_folder, options)
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") == MANIFEST_VERSION:
+                manifest.files = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+        return manifest
+
+    @staticmethod
+    def run_options(converter, jenis_jalan, tipe_jalan, batas_wilayah_path=None, qml_folder=None): # Everything besides the input file that changes the outputs
+        boundary_hash = None
+        if batas_wilayah_path and os.path.exists(batas_wilayah_path):
+            base = os.path.splitext(batas_wilayah_path)[0]
+            parts = [base + ext for ext in BOUNDARY_PARTS if os.path.exists(base + ext)] or [batas_wilayah_path]
+            boundary_hash = files_sha256(parts)
+
+        qml_hash = None
+        if qml_folder and os.path.exists(qml_folder):
+            qml_hash = files_sha256(glob.glob(os.path.join(qml_folder, "*.qml")))
+
+        return {
+            "jenis_jalan": jenis_jalan,
+            "tipe_jalan": tipe_jalan,
+            "batas_wilayah": boundary_hash,
+            "qml_folder": os.path.abspath(qml_folder).replace(os.path.sep, '/') if qml_folder else None,
+            "qml_files": qml_hash,
+            "geojson_pretty": converter.geojson_writer.pretty,
+            "geojson_precision": converter.geojson_writer.precision,
+            "image_mode": converter.image_mode,
+            "formats": list(converter.formats),
+        }
+
+    def _key(self, file_path):
+        return os.path.abspath(file_path).replace(os.path.sep, '/')
+
+    def current_entry(self, file_path, digest): # Recorded entry if the file can be skipped, None if it has to be converted
+        entry = self.files.get(self._key(file_path))
+        if entry is None or entry.get("sha256") != digest or entry.get("options") != self.options:
+            return None
+
+        # Outputs deleted since the last run are produced again
+        for output in entry.get("outputs", []):
+            if not os.path.exists(os.path.join(self.output_folder, output)):
+                return None
+        return entry
+
+    def record(self, file_path, digest, outputs, error_logs): # Store the result of a converted file, outputs relative to the output folder
+        output_folder = os.path.abspath(self.output_folder)
+        self.files[self._key(file_path)] = {
+            "sha256": digest,
+            "options": self.options,
+            "outputs": sorted({os.path.relpath(os.path.abspath(output), output_folder).replace(os.path.sep, '/') for output in outputs}),
+            "error_logs": [{key: json_value(value) for key, value in error.items()} for error in error_logs],
+        }
+
+    def forget(self, file_path): # Drop a file so the next run converts it again
+        self.files.pop(self._key(file_path), None)
+
+    def save(self): # Written to a temporary file first so an interrupted run never leaves a truncated manifest
+        os.makedirs(self.output_folder, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, file, indent=4)
+        os.replace(temp_path, self.path)
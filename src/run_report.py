@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import cProfile
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Folder of the optional per-file cProfile dumps, inside the output folder
+PROFILE_DIR = "Run Profiles"
+
+
+def stage(timings, name): # Timer of an optional RunTimings, a no-op when there is none
+    return timings.stage(name) if timings is not None else nullcontext()
+
+
+def start_profile(enabled=True): # Enabled cProfile profiler, None when profiling is off
+    if not enabled:
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def dump_profile(profiler, output_path): # Stop the profiler and write its pstats file, open with pstats.Stats or snakeviz
+    profiler.disable()
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    profiler.dump_stats(output_path)
+
+
+class RunTimings:
+    """
+    Wall time spent in each conversion stage (workbook loading, merged-cell filling, coordinates, geometry, spatial
+    join, writes, image export), summed per file and per sheet.
+    The converter sets the current file and sheet, stage() adds the time of the enclosed block to both. Stages do not
+    nest, so the time of a file not covered by any stage is the rest of its total.
+    """
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages = {} # Stages outside of any file, e.g. loading the boundaries
+        self.files = {}
+        self.file_name = None
+        self.sheet_name = None
+
+    def _add(self, stages, name, seconds):
+        entry = stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+        entry["seconds"] += seconds
+        entry["calls"] += 1
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            file_entry = self.files.get(self.file_name)
+            if file_entry is None:
+                self._add(self.stages, name, seconds)
+            else:
+                self._add(file_entry["stages"], name, seconds)
+                if self.sheet_name is not None:
+                    self._add(file_entry["sheets"].setdefault(self.sheet_name, {}), name, seconds)
+
+    def start_file(self, file_name):
+        self.file_name = file_name
+        self.sheet_name = None
+        self.files[file_name] = {"seconds": 0.0, "stages": {}, "sheets": {}}
+
+    def end_file(self, seconds):
+        if self.file_name in self.files:
+            self.files[self.file_name]["seconds"] = seconds
+        self.file_name = None
+        self.sheet_name = None
+
+    def add_file(self, file_name, file_entry): # Timings of a file converted elsewhere, e.g. in a pool worker
+        if file_entry is not None:
+            self.files[file_name] = file_entry
+
+    def stage_totals(self): # Every stage summed over the run, slowest first
+        totals = {}
+        for stages in [self.stages] + [file_entry["stages"] for file_entry in self.files.values()]:
+            for name, entry in stages.items():
+                total = totals.setdefault(name, {"seconds": 0.0, "calls": 0})
+                total["seconds"] += entry["seconds"]
+                total["calls"] += entry["calls"]
+        return dict(sorted(totals.items(), key=lambda item: item[1]["seconds"], reverse=True))
+
+    def to_dict(self):
+        def rounded(stages):
+            return {name: {"seconds": round(entry["seconds"], 4), "calls": entry["calls"]} for name, entry in stages.items()}
+
+        return {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - self.started, 4),
+            "stages": rounded(self.stage_totals()),
+            "files": {
+                file_name: {
+                    "seconds": round(file_entry["seconds"], 4),
+                    "stages": rounded(file_entry["stages"]),
+                    "sheets": {sheet_name: rounded(stages) for sheet_name, stages in file_entry["sheets"].items()},
+                }
+                for file_name, file_entry in self.files.items()
+            },
+        }
+
+    def save(self, output_folder): # Write Run_Report_<timestamp>.json next to the coordinate error log, returns its path
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_path = os.path.join(output_folder, f"Run_Report_{timestamp}.json").replace(os.path.sep, '/')
+        os.makedirs(output_folder, exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=4)
+        return report_path
+
+    def summary_lines(self, limit=8): # Slowest stages of the run for the log
+        lines = [f"⏱️ {len(self.files)} files in {time.perf_counter() - self.started:.2f}s, slowest stages:"]
+        for name, entry in list(self.stage_totals().items())[:limit]:
+            lines.append(f"  - {name}: {entry['seconds']:.2f}s ({entry['calls']} calls)")
+        return lines
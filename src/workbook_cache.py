@@ -0,0 +1,134 @@
+import os
+import re
+from collections import OrderedDict
+import numpy as np
+from openpyxl import load_workbook
+from openpyxl.worksheet.cell_range import CellRange
+from src.run_report import stage
+
+# <mergeCell ref="A1:B2"/> elements of a worksheet XML part, with or without a namespace prefix
+MERGE_CELL = re.compile(rb'<(?:\w+:)?mergeCell\b[^>]*?\sref="([^"]+)"')
+
+
+def read_merged_ranges(ws, chunk_size=1 << 20): # Merged ranges of a read-only worksheet, scanned from the raw XML of its part
+    merged_ranges = []
+    pending = b""
+    with ws._get_source() as src:
+        while True:
+            chunk = src.read(chunk_size)
+            buffer = pending + chunk
+            # Tags never contain "<", so everything before the last one holds only complete tags
+            cut = buffer.rfind(b"<") if chunk else len(buffer)
+            if cut < 0:
+                cut = len(buffer)
+            merged_ranges.extend(CellRange(ref.decode("ascii")) for ref in MERGE_CELL.findall(buffer, 0, cut))
+            pending = buffer[cut:]
+            if not chunk:
+                return merged_ranges
+
+
+class WorkbookCache:
+    """
+    Keeps parsed workbooks in memory so the Shapefile, GeoJSON and image passes share one load.
+    Sheet values are streamed from a read-only workbook, the full workbook (cells, styles, drawings) is only
+    loaded when the image pass asks for it.
+    Entries are keyed by (absolute path, mtime, size), so a file edited between passes is reloaded.
+    """
+    def __init__(self, max_entries=1, timings=None) -> None:
+        self.max_entries = max_entries
+        self.timings = timings # Optional RunTimings, workbook loads and sheet reads are timed into it
+        self._entries = OrderedDict()
+
+    def _key(self, file_path):
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        return (file_path, stat.st_mtime_ns, stat.st_size)
+
+    def _get_entry(self, file_path):
+        key = self._key(file_path)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            # Drop stale versions of the same file before loading the new one
+            self.evict(file_path)
+            entry = {"path": key[0], "workbook": None, "reader": None, "values": {}}
+            self._entries[key] = entry
+
+            # Keep memory bounded, oldest workbook goes first
+            while len(self._entries) > self.max_entries:
+                _, old_entry = self._entries.popitem(last=False)
+                self._close(old_entry)
+        else:
+            self._entries.move_to_end(key)
+
+        return entry
+
+    def get(self, file_path): # Return the shared full workbook, loading it only on first use
+        entry = self._get_entry(file_path)
+        if entry["workbook"] is None:
+            with stage(self.timings, "load_workbook"):
+                entry["workbook"] = load_workbook(entry["path"], data_only=True)
+        return entry["workbook"]
+
+    def reader(self, file_path): # Return the shared read-only workbook used for values
+        entry = self._get_entry(file_path)
+        if entry["reader"] is None:
+            with stage(self.timings, "load_workbook"):
+                entry["reader"] = load_workbook(entry["path"], read_only=True, data_only=True)
+        return entry["reader"]
+
+    def sheet_names(self, file_path):
+        return self.reader(file_path).sheetnames.copy()
+
+    def sheet_values(self, file_path, sheet_name): # Return the sheet values with merged ranges filled from their top-left cell
+        entry = self._get_entry(file_path)
+
+        if sheet_name not in entry["values"]:
+            ws = self.reader(file_path)[sheet_name]
+
+            # The <dimension> element written by some tools is wider than the cells actually stored, read the
+            # real rows instead so the grid has the same extent as a full load
+            with stage(self.timings, "read_rows"):
+                ws.reset_dimensions()
+                rows = [list(row) for row in ws.values]
+                while rows and not rows[-1]:
+                    rows.pop()
+
+            with stage(self.timings, "fill_merged_cells"):
+                merged_ranges = read_merged_ranges(ws)
+
+                # Keep the grid rectangular even if a merged range reaches past the sheet dimensions
+                n_rows = max([len(rows)] + [merge.max_row for merge in merged_ranges])
+                n_cols = max([len(row) for row in rows] + [merge.max_col for merge in merged_ranges] + [0])
+                grid = np.full((n_rows, n_cols), None, dtype=object)
+                for i, row in enumerate(rows):
+                    grid[i, :len(row)] = row
+
+                # Fill merged ranges as blocks of the value grid, the workbooks are never modified
+                for merge in merged_ranges:
+                    grid[merge.min_row - 1:merge.max_row, merge.min_col - 1:merge.max_col] = grid[merge.min_row - 1, merge.min_col - 1]
+
+                # Plain rows, so the DataFrame still infers its column types from the values
+                rows = grid.tolist()
+            entry["values"][sheet_name] = rows
+
+        return entry["values"][sheet_name]
+
+    def evict(self, file_path): # Release every cached version of a file
+        file_path = os.path.abspath(file_path)
+        for key in [key for key in self._entries if key[0] == file_path]:
+            self._close(self._entries.pop(key))
+
+    def clear(self):
+        for entry in self._entries.values():
+            self._close(entry)
+        self._entries.clear()
+
+    def _close(self, entry):
+        # The read-only workbook keeps its archive open until it is closed
+        for name in ("reader", "workbook"):
+            try:
+                if entry[name] is not None:
+                    entry[name].close()
+            except Exception:
+                pass
@@ -0,0 +1,22 @@
+import pytest
+
+
+class SheetRows:
+    """Workbook cache stand-in serving the sheet values from memory."""
+    def __init__(self) -> None:
+        self.sheets = {}
+
+    def sheet_values(self, file_path, sheet_name):
+        return self.sheets[(file_path, sheet_name)]
+
+
+@pytest.fixture
+def sheet_rows():
+    return SheetRows()
+
+
+@pytest.fixture(scope="module")
+def converter(tmp_path_factory):
+    # Imported here, the start-up import test runs without the conversion libraries loaded
+    from src.converter_worker import ExcelConverter
+    return ExcelConverter(str(tmp_path_factory.mktemp("out")))
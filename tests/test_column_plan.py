@@ -0,0 +1,85 @@
+"""
+Column plans compiled from small fixed survey templates: the columns kept, the coordinate roles, the final property
+names and the data rows a plan selects.
+"""
+import pandas as pd
+import pytest
+
+from src.column_plan import ColumnPlan
+
+HEADER_INDEX = 1
+
+
+def survey_frame(header_row, groups, sub_headers, rows): # Title row, header row, empty row, the two merged header rows and the data rows
+    width = len(header_row)
+    return pd.DataFrame([["SURVEY"] + [None] * (width - 1), header_row, [None] * width, groups, sub_headers] + rows)
+
+
+def compile_plan(df, converter):
+    return ColumnPlan.compile(ColumnPlan.fingerprint(df, HEADER_INDEX, df.notna().any().tolist()), converter)
+
+
+@pytest.fixture
+def rambu_sheet():
+    # REKAP in the header row (5), an empty column (6), REKAP in the column groups (7) and a "None" sub-header part (8)
+    return survey_frame(
+        ["NO", "NAMA", "KOORDINAT", "KOORDINAT", "KONDISI", "REKAP", None, "X", "X"],
+        ["NO", "NAMA RAMBU", "KOORDINAT AWAL", "KOORDINAT AWAL", "KONDISI", "TOTAL", None, "Rekap Kondisi", "KETERANGAN"],
+        ["NO", None, "LATITUDE", "LONGITUDE", "KONDISI JALAN", "BAIK", None, "BAIK", "Data None"],
+        [
+            [1, "Larangan", -6.9, 107.6, "BAIK", 3, None, 2, "ok"],
+            [2, "Peringatan", -6.8, 107.5, "RUSAK", 1, None, 1, "-"],
+        ],
+    )
+
+
+@pytest.fixture
+def marka_sheet():
+    return survey_frame(
+        ["NO", "KOORDINAT", "KOORDINAT", "KOORDINAT", "KOORDINAT", "JENIS"],
+        ["NO", "KOORDINAT AWAL", "KOORDINAT AWAL", "KOORDINAT AKHIR", "KOORDINAT AKHIR", "JENIS MARKA"],
+        [None, "LATITUDE", "LONGITUDE", "LATITUDE", "LONGITUDE", None],
+        [[1, -6.9, 107.6, -6.91, 107.61, "Garis Utuh"]],
+    )
+
+
+def test_compile_drops_rekap_and_empty_columns_and_merges_headers(rambu_sheet, converter):
+    plan = compile_plan(rambu_sheet, converter)
+    assert plan.positions == [0, 1, 2, 3, 4, 8]
+    assert plan.columns == ["no", "nama rambu", "koordinat awal latitude", "koordinat awal longitude", "kondisi jalan", "keterangan data none"]
+
+
+def test_compile_finds_start_coordinates(rambu_sheet, converter):
+    plan = compile_plan(rambu_sheet, converter)
+    assert plan.roles == {"start_lat": "koordinat awal latitude", "start_lon": "koordinat awal longitude", "end_lat": None, "end_lon": None}
+    assert plan.has_start_coords
+    assert not plan.has_end_coords
+
+
+def test_compile_finds_end_coordinates(marka_sheet, converter):
+    plan = compile_plan(marka_sheet, converter)
+    assert plan.roles == {
+        "start_lat": "koordinat awal latitude",
+        "start_lon": "koordinat awal longitude",
+        "end_lat": "koordinat akhir latitude",
+        "end_lon": "koordinat akhir longitude",
+    }
+    assert plan.has_end_coords
+
+
+def test_resolve_properties_leaves_coordinates_out_and_cleans_names(rambu_sheet, marka_sheet, converter):
+    plan = compile_plan(rambu_sheet, converter)
+    assert plan.resolve_properties(converter) == ([0, 1, 4, 5, 6], ["No", "Nama Rambu", "Kondisi Jalan", "Keterangan Data", "Geometry"])
+
+    # End coordinates are left out too
+    plan = compile_plan(marka_sheet, converter)
+    assert plan.resolve_properties(converter) == ([0, 5, 6], ["No", "Jenis Marka", "Geometry"])
+
+
+def test_select_returns_the_data_rows_of_the_kept_columns(rambu_sheet, converter):
+    df = compile_plan(rambu_sheet, converter).select(rambu_sheet, HEADER_INDEX)
+    assert list(df.columns) == ["no", "nama rambu", "koordinat awal latitude", "koordinat awal longitude", "kondisi jalan", "keterangan data none"]
+    assert df.values.tolist() == [
+        [1, "Larangan", -6.9, 107.6, "BAIK", "ok"],
+        [2, "Peringatan", -6.8, 107.5, "RUSAK", "-"],
+    ]
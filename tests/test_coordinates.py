@@ -0,0 +1,135 @@
+"""
+Randomized equivalence checks of the vectorized coordinate parsing against the scalar helpers it replaced:
+parse_coordinate_column against parse_coordinate, fix_coordinate_columns against fix_coordinates.
+"""
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SEEDS = range(10)
+COLUMNS_PER_SEED = 20
+VALUES_PER_COLUMN = 40
+
+# Pieces of the coordinate text found in survey sheets, including the broken ones the parser must survive
+HEMISPHERES = ["", "N", "S", "E", "W", "s", "w"]
+GARBAGE = ["", " ", "-", "abc", "nan", "NaN", "-nan", "7°O5'12.30\"S", "°", "6°'", "'", "1,2,3", "12.5.6", "N", "S"]
+
+
+def random_number(rng): # Decimal degrees, scaled integers as typed without separator, or out of range values
+    kind = rng.randrange(4)
+    if kind == 0:
+        return round(rng.uniform(-10, 10), rng.randrange(0, 10))
+    if kind == 1:
+        return round(rng.uniform(95, 141), rng.randrange(0, 10))
+    if kind == 2:
+        return int(rng.uniform(-9, 9) * 10 ** rng.randrange(3, 10))
+    return rng.uniform(-2e9, 2e9)
+
+
+def random_dms(rng): # DMS text with optional minutes, seconds, quotes and hemisphere
+    text = f"{rng.randrange(0, 181)}°"
+    if rng.random() < 0.8:
+        text += f"{rng.randrange(0, 60)}'"
+        if rng.random() < 0.8:
+            text += f"{rng.uniform(0, 60):.{rng.randrange(0, 4)}f}"
+            if rng.random() < 0.5:
+                text += '"'
+    text += rng.choice(HEMISPHERES)
+    return rng.choice(["", " "]) + text + rng.choice(["", " "])
+
+
+def random_value(rng): # One cell value as openpyxl returns it
+    kind = rng.randrange(9)
+    if kind == 0:
+        return None
+    if kind == 1:
+        return float("nan")
+    if kind == 2:
+        return rng.choice([True, False])
+    if kind in (3, 4):
+        return random_number(rng)
+    if kind == 5:
+        # Decimal comma, apostrophe prefix and padding
+        text = str(random_number(rng))
+        if rng.random() < 0.5:
+            text = text.replace(".", ",")
+        if rng.random() < 0.3:
+            text = "'" + text
+        return rng.choice(["", " "]) + text + rng.choice(["", " "])
+    if kind in (6, 7):
+        return random_dms(rng)
+    return rng.choice(GARBAGE)
+
+
+def random_column(rng): # A column of one kind of values, or of mixed kinds
+    if rng.random() < 0.2:
+        return [random_number(rng) if rng.random() < 0.9 else None for _ in range(VALUES_PER_COLUMN)]
+    return [random_value(rng) for _ in range(VALUES_PER_COLUMN)]
+
+
+def scalar_parse(converter, values): # parse_coordinate value by value, pd.NA as NaN
+    parsed = [converter.parse_coordinate(value) for value in values]
+    return np.array([np.nan if pd.isna(value) else value for value in parsed], dtype=float)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_parse_coordinate_column_matches_parse_coordinate(converter, seed):
+    rng = random.Random(seed)
+    for _ in range(COLUMNS_PER_SEED):
+        values = random_column(rng)
+        expected = scalar_parse(converter, values)
+        result = converter.parse_coordinate_column(pd.Series(values, dtype=object)).to_numpy(dtype=float)
+        np.testing.assert_array_equal(result, expected, err_msg=f"values: {values}")
+
+
+@pytest.mark.parametrize("values", [
+    [None, None],
+    [float("nan"), None],
+    [6.5, -107.25, 3],
+    ["-6,123", "'107.5", " 6.5 "],
+    ["107°18'40.74\"E", "6°17'23.45\"S", "6°17'S", "6°S", "6°"],
+    ["abc", "", " ", "7°O5'12.30\"S"],
+])
+def test_parse_coordinate_column_edge_cases(converter, values):
+    result = converter.parse_coordinate_column(pd.Series(values, dtype=object)).to_numpy(dtype=float)
+    np.testing.assert_array_equal(result, scalar_parse(converter, values))
+
+
+def random_magnitude(rng): # Coordinates with the decimal separator lost at any position, or missing
+    if rng.random() < 0.1:
+        return float("nan")
+    value = rng.uniform(-1, 1) * 10 ** rng.randrange(0, 11)
+    return float(int(value)) if rng.random() < 0.5 else value
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_fix_coordinate_columns_matches_fix_coordinates(converter, seed):
+    rng = random.Random(seed)
+    df = pd.DataFrame({
+        "lat": [random_magnitude(rng) for _ in range(COLUMNS_PER_SEED * VALUES_PER_COLUMN)],
+        "lon": [random_magnitude(rng) for _ in range(COLUMNS_PER_SEED * VALUES_PER_COLUMN)],
+    })
+    expected = df.apply(converter.fix_coordinates, axis=1, args=("lat", "lon"))
+    lat, lon = converter.fix_coordinate_columns(df["lat"], df["lon"])
+
+    for column, result in ((0, lat), (1, lon)):
+        expected_values = expected[column].astype(float).to_numpy()
+        np.testing.assert_array_equal(result.to_numpy(dtype=float), expected_values)
+
+
+@pytest.mark.parametrize("lat, lon", [
+    (-6448977, 1075919250),
+    (-64489770, 10759192),
+    (-6448, 107591),
+    (6.5, 107.5),
+    (-91, 181),
+    (1_000_000, 10_000_000),
+])
+def test_fix_coordinate_columns_edge_cases(converter, lat, lon):
+    expected = converter.fix_coordinates(pd.Series({"lat": lat, "lon": lon}), "lat", "lon")
+    result_lat, result_lon = converter.fix_coordinate_columns(pd.Series([lat]), pd.Series([lon]))
+    assert math.isclose(result_lat.iloc[0], expected[0], rel_tol=0, abs_tol=0)
+    assert math.isclose(result_lon.iloc[0], expected[1], rel_tol=0, abs_tol=0)
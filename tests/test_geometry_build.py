@@ -0,0 +1,119 @@
+"""
+Randomized equivalence checks of the shapely array geometry builders against the row-wise builders they replaced.
+The reference builders below are the DataFrame.apply functions normalize_sheet used before, inputs are coordinate
+columns as process_coordinates leaves them (floats, NaN, None, and raw text in PAGAR PENGAMAN end columns).
+"""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point, LineString, MultiPoint
+
+SEEDS = range(10)
+ROWS = 400
+
+COLUMNS = ["start_lat", "start_lon", "end_lat", "end_lon"]
+
+
+def reference_point(row): # Point of the start coordinates
+    if pd.notna(row["start_lon"]) and pd.notna(row["start_lat"]):
+        return Point(row["start_lon"], row["start_lat"])
+    return None
+
+
+def reference_multipoint(row, has_end_coords): # Start point and optional end point
+    try:
+        points = []
+        if pd.notna(row["start_lon"]) and pd.notna(row["start_lat"]):
+            points.append((float(row["start_lon"]), float(row["start_lat"])))
+        if has_end_coords and pd.notna(row["end_lon"]) and pd.notna(row["end_lat"]):
+            points.append((float(row["end_lon"]), float(row["end_lat"])))
+        return MultiPoint(points) if points else None
+    except Exception:
+        return None
+
+
+def reference_linestring(converter, row, offset=0.0001): # Start to end segment, or a short offset segment without end point
+    try:
+        start_lat, start_lon, end_lat, end_lon = (row[column] for column in COLUMNS)
+        if pd.isna(start_lat) and pd.isna(start_lon) and pd.isna(end_lat) and pd.isna(end_lon):
+            return None
+
+        if isinstance(start_lat, str):
+            start_lat = converter.parse_coordinate(start_lat)
+        if isinstance(start_lon, str):
+            start_lon = converter.parse_coordinate(start_lon)
+        if isinstance(end_lat, str):
+            end_lat = converter.parse_coordinate(end_lat)
+        if isinstance(end_lon, str):
+            end_lon = converter.parse_coordinate(end_lon)
+
+        if pd.notna(start_lon) and pd.notna(start_lat) and pd.notna(end_lon) and pd.notna(end_lat):
+            return LineString([(float(start_lon), float(start_lat)), (float(end_lon), float(end_lat))])
+        if pd.notna(start_lon) and pd.notna(start_lat):
+            return LineString([(float(start_lon), float(start_lat)), (float(start_lon) + offset, float(start_lat) + offset)])
+        return None
+    except Exception:
+        return None
+
+
+def random_coordinate(rng, text=False): # Parsed coordinate, a gap, or raw text left in the end columns
+    kind = rng.randrange(10)
+    if kind == 0:
+        return None
+    if kind == 1:
+        return np.nan
+    if text and kind == 2:
+        return rng.choice([f"{rng.uniform(-7, -6):.6f}".replace(".", ","), "6°17'23.45\"S", "107°18'40.74\"E", "abc"])
+    return rng.uniform(-7, -6) if kind % 2 else rng.uniform(106, 108)
+
+
+def random_frame(rng, text_end=False): # Coordinate columns of one sheet, some rows fully empty
+    rows = []
+    for _ in range(ROWS):
+        if rng.random() < 0.05:
+            rows.append([None] * 4)
+            continue
+        rows.append([random_coordinate(rng), random_coordinate(rng), random_coordinate(rng, text_end), random_coordinate(rng, text_end)])
+    return pd.DataFrame(rows, columns=COLUMNS, dtype=object)
+
+
+def assert_same_geometries(result, expected):
+    assert len(result) == len(expected)
+    for i, (geometry, reference) in enumerate(zip(result, expected)):
+        if reference is None:
+            assert geometry is None, f"row {i}: expected None, got {geometry}"
+        else:
+            assert geometry is not None, f"row {i}: expected {reference}, got None"
+            assert geometry.wkb == reference.wkb, f"row {i}: expected {reference}, got {geometry}"
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_build_point_geometries(converter, seed):
+    df = random_frame(random.Random(seed))
+    expected = df.apply(reference_point, axis=1)
+    assert_same_geometries(converter.build_point_geometries(df, "start_lat", "start_lon"), expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("has_end_coords", [True, False])
+def test_build_multipoint_geometries(converter, seed, has_end_coords):
+    df = random_frame(random.Random(seed))
+    expected = df.apply(reference_multipoint, axis=1, args=(has_end_coords,))
+    end_columns = ("end_lat", "end_lon") if has_end_coords else (None, None)
+    assert_same_geometries(converter.build_multipoint_geometries(df, "start_lat", "start_lon", *end_columns), expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_build_linestring_geometries(converter, seed):
+    df = random_frame(random.Random(seed), text_end=True)
+    expected = df.apply(lambda row: reference_linestring(converter, row), axis=1)
+    assert_same_geometries(converter.build_linestring_geometries(df, "start_lat", "start_lon", "end_lat", "end_lon"), expected)
+
+
+def test_build_geometries_without_valid_rows(converter):
+    df = pd.DataFrame([[None] * 4, [np.nan] * 4], columns=COLUMNS, dtype=object)
+    assert list(converter.build_point_geometries(df, "start_lat", "start_lon")) == [None, None]
+    assert list(converter.build_multipoint_geometries(df, "start_lat", "start_lon", "end_lat", "end_lon")) == [None, None]
+    assert list(converter.build_linestring_geometries(df, "start_lat", "start_lon", "end_lat", "end_lon")) == [None, None]
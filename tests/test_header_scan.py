@@ -0,0 +1,74 @@
+"""
+Checks of the bounded header-row scan against the full-sheet search it replaced, and of the column plan cache
+shared by the sheets of one template.
+"""
+import random
+
+import pandas as pd
+import pytest
+
+from src.column_plan import ColumnPlan
+from src.converter_worker import HEADER_SCAN_ROWS
+
+SEEDS = range(20)
+
+TEXT = ["DATA", "SURVEY", "KODE", "X", "", 12, 3.5]
+HEADER_TEXT = ["NO", "No.", "nomor", "KONDISI NO", None]
+
+
+def full_scan_header_row(df): # Header search before the scan was bounded
+    header_indices = df[df.apply(lambda x: x.astype(str).str.contains("NO", case=False, na=False)).any(axis=1)].index
+    return header_indices[0] if len(header_indices) else None
+
+
+def random_sheet(rng, header_index, rows): # Rows without "NO" above header_index, any cell below it
+    width = rng.randrange(1, 8)
+    data = [[rng.choice(TEXT) for _ in range(width)] for _ in range(header_index)]
+    data.append([rng.choice(TEXT) for _ in range(width - 1)] + [rng.choice(HEADER_TEXT)])
+    data += [[rng.choice(TEXT + HEADER_TEXT) for _ in range(width)] for _ in range(rows)]
+    return pd.DataFrame(data)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_find_header_row_matches_full_scan(converter, seed):
+    rng = random.Random(seed)
+    df = random_sheet(rng, rng.randrange(HEADER_SCAN_ROWS), rng.randrange(0, 200))
+    assert converter.find_header_row(df) == full_scan_header_row(df)
+
+
+def test_find_header_row_below_scan_limit(converter):
+    df = random_sheet(random.Random(0), HEADER_SCAN_ROWS, 5)
+    assert full_scan_header_row(df) == HEADER_SCAN_ROWS
+    assert converter.find_header_row(df) is None
+
+
+def test_find_header_row_without_header(converter):
+    assert converter.find_header_row(pd.DataFrame([["DATA", 1], ["X", 2.5]])) is None
+
+
+def survey_sheet(rows): # Title row taken as header row, empty row, column groups and their sub-headers, data rows
+    sheet = [
+        ["DATA PJU", None, None, None],
+        [None, None, None, None],
+        ["NO", "KOORDINAT AWAL", "KOORDINAT AWAL", "KONDISI"],
+        [None, "LATITUDE", "LONGITUDE", None],
+    ]
+    return sheet + [[i + 1, -6.9 + i * 0.001, 107.6 + i * 0.001, "BAIK"] for i in range(rows)]
+
+
+def test_sheets_of_one_template_share_their_column_plan(converter, sheet_rows, monkeypatch):
+    # The shared converter reads these sheets from memory and starts without compiled plans
+    monkeypatch.setattr(converter, "workbook_cache", sheet_rows)
+    monkeypatch.setattr(converter, "column_plans", {})
+    compiled = []
+    compile_plan = ColumnPlan.compile.__func__
+    monkeypatch.setattr(ColumnPlan, "compile", classmethod(lambda cls, *args: compiled.append(args[0]) or compile_plan(cls, *args)))
+
+    for name, rows in (("PJU", 3), ("PJU 2", 10), ("APILL", 1)):
+        converter.workbook_cache.sheets[("book.xlsx", name)] = survey_sheet(rows)
+        gdf = converter.normalize_sheet("book.xlsx", name, "book", [])
+        assert len(gdf) == rows
+        assert list(gdf.columns[:2]) == ["No", "Kondisi"]
+
+    assert len(compiled) == 1
+    assert len(converter.column_plans) == 1
@@ -0,0 +1,77 @@
+"""
+GeoJSON image links against the extracted images: in "original" mode a link carries the extension of the media
+anchored in its feature's row, in "png" mode every link and image is a .png.
+"""
+import glob
+import json
+import os
+
+import pytest
+
+from benchmarks.generate_workbooks import build_workbook
+from src.converter_worker import ExcelConverter
+from src.image_export import image_extension
+
+# Data rows of the generated sheets start at worksheet row 5, the row of feature "No" n is n + 4
+FIRST_DATA_ROW = 5
+
+
+@pytest.fixture(scope="module")
+def workbook(tmp_path_factory):
+    path = os.path.join(str(tmp_path_factory.mktemp("in")), "Survey.xlsx").replace(os.path.sep, '/')
+    build_workbook(path, sheets=("RAMBU", "RPPJ", "PJU"), rows=12, images=8, image_size=(16, 16))
+    return path
+
+
+def convert(workbook, output_folder, image_mode): # GeoJSON features by sheet and the extracted Dokumentasi images by name
+    converter = ExcelConverter(output_folder, log_callback=lambda message: None, formats=("geojson", "images"), image_mode=image_mode)
+    converter.process_single_excel_file(workbook, output_folder)
+    assert converter.failed_files == []
+
+    features = {}
+    for path in glob.glob(os.path.join(output_folder, "Extract GeoJSON", "**", "*.geojson"), recursive=True):
+        sheet_name = os.path.splitext(os.path.basename(path))[0][len("Survey_"):]
+        with open(path, encoding="utf-8") as f:
+            features[sheet_name] = json.load(f)["features"]
+    images = {os.path.basename(path) for path in glob.glob(os.path.join(output_folder, "Extract Images", "Dokumentasi", "**", "*.*"), recursive=True)}
+    return features, images
+
+
+def test_image_extension():
+    assert image_extension("jpeg", "original") == ".jpg"
+    assert image_extension("gif", "original") == ".gif"
+    assert image_extension("png", "original") == ".png"
+    assert image_extension("bmp", "original") == ".png"
+    assert image_extension("jpeg", "png") == ".png"
+
+
+def test_original_mode_links_carry_the_extracted_extension(workbook, tmp_path):
+    features, images = convert(workbook, str(tmp_path), "original")
+    assert {os.path.splitext(name)[1] for name in images} == {".png", ".jpg"}
+
+    checked = 0
+    for sheet_name, sheet_features in features.items():
+        for feature in sheet_features:
+            properties = feature["properties"]
+            row = int(properties["No"]) + FIRST_DATA_ROW - 1
+            extracted = [name for name in images if os.path.splitext(name)[0] == f"Sheet_{sheet_name}_Column_DOKUMENTASI_Row{row}"]
+            link_extension = os.path.splitext(properties["Image Dokumentasi"])[1]
+            if extracted:
+                assert link_extension == os.path.splitext(extracted[0])[1], (sheet_name, row)
+                checked += 1
+            else:
+                assert link_extension == ".png", (sheet_name, row)
+
+            # Rambu and RPPJ photos of the same row follow the same media
+            for key in ("Image Rambu", "Image RPPJ"):
+                if properties.get(key) and extracted:
+                    assert os.path.splitext(properties[key])[1] == link_extension, (sheet_name, row, key)
+    assert checked > 0
+
+
+def test_png_mode_links_stay_png(workbook, tmp_path):
+    features, images = convert(workbook, str(tmp_path), "png")
+    assert {os.path.splitext(name)[1] for name in images} == {".png"}
+    for sheet_features in features.values():
+        for feature in sheet_features:
+            assert feature["properties"]["Image Dokumentasi"].endswith(".png")
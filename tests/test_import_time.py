@@ -0,0 +1,13 @@
+"""
+Start-up import check: the modules the GUI and the command line import before a conversion starts must not load
+the conversion libraries. Each module is imported in a fresh interpreter by benchmarks/import_time.measure.
+"""
+import pytest
+
+from benchmarks.import_time import STARTUP_MODULES, measure
+
+
+@pytest.mark.parametrize("module", STARTUP_MODULES)
+def test_startup_imports_no_conversion_library(module):
+    _, heavy = measure(module)
+    assert heavy == [], f"{module} imports {', '.join(heavy)} at start-up"
@@ -0,0 +1,79 @@
+"""
+Reruns of an edited workbook: the GeoPackage and GeoParquet outputs, which mix workbooks, keep none of the rows the
+earlier run wrote for a removed sheet or a region the features left, they end up as a fresh conversion.
+"""
+import glob
+import os
+import sqlite3
+
+import pytest
+
+from benchmarks.generate_workbooks import build_boundaries, build_workbook
+from src.converter_worker import ExcelConverter
+
+
+@pytest.fixture(scope="module")
+def boundaries(tmp_path_factory):
+    return build_boundaries(os.path.join(str(tmp_path_factory.mktemp("boundaries")), "batas_wilayah.shp").replace(os.path.sep, '/'))
+
+
+def convert(workbook, output_folder, boundaries, formats):
+    converter = ExcelConverter(output_folder, log_callback=lambda message: None, formats=formats)
+    converter.process_single_excel_file(workbook, output_folder, batas_wilayah_path=boundaries)
+    assert converter.failed_files == []
+
+
+def geopackage_rows(output_folder): # (GeoPackage file name, layer) -> row count
+    rows = {}
+    for path in glob.glob(os.path.join(output_folder, "Extract GeoPackage", "**", "*.gpkg"), recursive=True):
+        connection = sqlite3.connect(path)
+        try:
+            for (layer,) in connection.execute("SELECT table_name FROM gpkg_contents WHERE data_type = 'features'").fetchall():
+                count = connection.execute(f'SELECT COUNT(*) FROM "{layer}"').fetchone()[0]
+                if count:
+                    rows[(os.path.basename(path), layer)] = count
+        finally:
+            connection.close()
+    return rows
+
+
+def geoparquet_rows(output_folder): # Dataset file relative to "Extract GeoParquet" -> row count
+    import pyarrow.parquet as pq
+
+    dataset = os.path.join(output_folder, "Extract GeoParquet")
+    return {
+        os.path.relpath(path, dataset).replace(os.path.sep, '/'): pq.read_metadata(path).num_rows
+        for path in glob.glob(os.path.join(dataset, "**", "*.parquet"), recursive=True)
+    }
+
+
+def test_geopackage_rerun_drops_the_rows_of_a_removed_sheet(tmp_path, boundaries):
+    workbook = os.path.join(str(tmp_path), "in", "Survey.xlsx").replace(os.path.sep, '/')
+    output_folder = str(tmp_path / "out")
+    build_workbook(workbook, sheets=("PJU", "APILL"), rows=6, images=0)
+    convert(workbook, output_folder, boundaries, ("geopackage",))
+    assert {layer for _, layer in geopackage_rows(output_folder)} == {"PJU", "APILL"}
+
+    build_workbook(workbook, sheets=("PJU",), rows=6, images=0)
+    convert(workbook, output_folder, boundaries, ("geopackage",))
+
+    fresh_folder = str(tmp_path / "fresh")
+    convert(workbook, fresh_folder, boundaries, ("geopackage",))
+    assert geopackage_rows(output_folder) == geopackage_rows(fresh_folder)
+
+
+def test_geoparquet_rerun_drops_the_files_of_partitions_no_longer_written(tmp_path, boundaries):
+    pytest.importorskip("pyarrow")
+    workbook = os.path.join(str(tmp_path), "in", "Survey.xlsx").replace(os.path.sep, '/')
+    output_folder = str(tmp_path / "out")
+    build_workbook(workbook, sheets=("PJU", "APILL"), rows=6, images=0)
+    convert(workbook, output_folder, boundaries, ("geoparquet",))
+    assert not any(path.startswith("kota_kabupaten=Unknown Daerah/") for path in geoparquet_rows(output_folder))
+
+    # Without the boundaries every feature moves to the Unknown Daerah partition
+    build_workbook(workbook, sheets=("PJU",), rows=6, images=0)
+    convert(workbook, output_folder, None, ("geoparquet",))
+
+    fresh_folder = str(tmp_path / "fresh")
+    convert(workbook, fresh_folder, None, ("geoparquet",))
+    assert geoparquet_rows(output_folder) == geoparquet_rows(fresh_folder)